@@ -1,10 +1,12 @@
 import os
+import threading
 import time
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableParallel, RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnableParallel, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.callbacks import BaseCallbackHandler
 
 # ============================================================================
 # RunnableParallel: 여러 작업을 동시에 병렬로 실행하기
@@ -16,54 +18,156 @@ from langchain_core.output_parsers import StrOutputParser
 # load env
 load_dotenv()
 
-# LLM
-llm = ChatOpenAI(model="gpt-4o-mini")
+# LLM (streaming=True: invoke로 호출해도 토큰 단위 콜백이 발생해 첫 토큰 시간을 잴 수 있다)
+llm = ChatOpenAI(model="gpt-4o-mini", streaming=True)
 output_parser = StrOutputParser()
 
-# 시간 측정 및 로깅을 위한 래퍼 함수
-def log_execution_time(chain_name):
-    def wrapper(input_data):
-        start_time = time.time()
-        print(f"🚀 [{chain_name}] 시작: {time.strftime('%H:%M:%S')}")
-        
-        # 실제 체인 실행 (여기서는 단순 호출을 흉내내기 위해 input_data를 그대로 넘김)
-        # 실제로는 이 래퍼가 체인 내부에서 사용된다.
-        return input_data
-    return wrapper
+# ============================================================================
+# 브랜치별 시간 측정: 콜백 핸들러
+# ============================================================================
+# 체인 앞뒤에 print용 RunnableLambda를 끼우는 대신, LangChain 콜백으로 각 브랜치의 실행을 관찰한다.
+# - 각 브랜치 체인에 with_config(run_name=...)으로 이름을 붙이고,
+# - 핸들러는 run_id → parent_run_id 관계를 따라 하위 실행(프롬프트, LLM 등)이 어느 브랜치 소속인지 찾는다.
+#
+# 측정 항목 (모두 병렬 체인 시작 시점 기준)
+# - queue: 병렬 체인 시작 → 브랜치 시작 (스레드 풀에서 실행을 기다린 시간)
+# - ttft: LLM 요청 → 첫 토큰 (time to first token, streaming=True 필요)
+# - llm: LLM 요청 → 응답 완료
+# - total: 브랜치 시작 → 종료
+# 요약: 가장 늦게 끝난 브랜치(critical path)가 전체 지연 시간을 결정한다.
+
+class BranchTimingHandler(BaseCallbackHandler):
+    """
+    RunnableParallel 브랜치별 시작/종료/대기/TTFT를 기록하는 콜백 핸들러
+
+    branches: 측정할 브랜치 run_name 목록
+    verbose: 브랜치 시작/완료 시점에 로그 출력
+    """
+
+    def __init__(self, branches, verbose=True):
+        self.branches = set(branches)
+        self.verbose = verbose
+        self.origin = None  # 최상위 실행(병렬 체인) 시작 시각
+        self.finished = None  # 최상위 실행 종료 시각
+        self.timings = {}  # 브랜치 이름 -> {"start", "end", "llm_start", "first_token", "llm_end"}
+        self._branch_of = {}  # run_id -> 브랜치 이름 (하위 실행 포함)
+        self._lock = threading.Lock()
+
+    def _register(self, run_id, parent_run_id, name):
+        now = time.perf_counter()
+        with self._lock:
+            if parent_run_id is None:
+                self.origin, self.finished, self.timings = now, None, {}
+                self._branch_of = {}
+            elif name in self.branches and parent_run_id not in self._branch_of:
+                self._branch_of[run_id] = name
+                self.timings[name] = {"start": now}
+                if self.verbose:
+                    print(f"🚀 [{name}] 시작 (+{now - self.origin:.2f}s)")
+            elif parent_run_id in self._branch_of:
+                self._branch_of[run_id] = self._branch_of[parent_run_id]
+        return now
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._register(run_id, parent_run_id, kwargs.get("name"))
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        now = time.perf_counter()
+        with self._lock:
+            if parent_run_id is None:
+                self.finished = now
+            branch = self._branch_of.get(run_id)
+            if branch and parent_run_id not in self._branch_of:  # 브랜치 최상위 실행의 종료
+                self.timings[branch]["end"] = now
+                if self.verbose:
+                    print(f"✅ [{branch}] 완료 (+{now - self.origin:.2f}s)")
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self.on_chain_end(None, run_id=run_id, parent_run_id=parent_run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        now = self._register(run_id, parent_run_id, kwargs.get("name"))
+        branch = self._branch_of.get(run_id)
+        if branch:
+            self.timings[branch]["llm_start"] = now
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        branch = self._branch_of.get(run_id)
+        if branch and "first_token" not in self.timings[branch]:
+            self.timings[branch]["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        branch = self._branch_of.get(run_id)
+        if branch:
+            self.timings[branch]["llm_end"] = time.perf_counter()
+
+    def summary(self) -> dict:
+        """브랜치별 구간(초)과 critical path / 겹친 시간 요약"""
+        def span(t, a, b):
+            return t[b] - t[a] if a in t and b in t else None
+
+        branches = {
+            name: {
+                "queue": t["start"] - self.origin,
+                "ttft": span(t, "llm_start", "first_token"),
+                "llm": span(t, "llm_start", "llm_end"),
+                "total": span(t, "start", "end"),
+                "finished_at": t["end"] - self.origin if "end" in t else None,
+            }
+            for name, t in self.timings.items()
+        }
+        wall = (self.finished or time.perf_counter()) - self.origin
+        done = {name: b for name, b in branches.items() if b["finished_at"] is not None}
+        critical = max(done, key=lambda name: done[name]["finished_at"]) if done else None
+
+        # 2개 이상 브랜치가 동시에 실행 중이던 시간 (구간 스윕)
+        events = sorted([(b["queue"], 1) for b in done.values()] + [(b["finished_at"], -1) for b in done.values()])
+        overlapped, running, last = 0.0, 0, 0.0
+        for at, delta in events:
+            if running >= 2:
+                overlapped += at - last
+            running, last = running + delta, at
+
+        busy = sum(b["total"] for b in done.values())
+        return {
+            "branches": branches,
+            "wall": wall,
+            "critical_path": critical,
+            "sequential_sum": busy,
+            "overlapped": overlapped,
+            "saved": busy - wall,
+        }
+
+    def print_summary(self) -> None:
+        report = self.summary()
+
+        def fmt(value):
+            return f"{value:6.2f}s" if value is not None else "     - "
+
+        print(f"\n{'브랜치':<7} {'queue':>7} {'ttft':>7} {'llm':>7} {'total':>7} {'완료':>5}")
+        for name, b in sorted(report["branches"].items(), key=lambda item: item[1]["finished_at"] or 0):
+            marker = " ⬅ critical path" if name == report["critical_path"] else ""
+            print(f"{name:<10} {fmt(b['queue'])} {fmt(b['ttft'])} {fmt(b['llm'])} {fmt(b['total'])} "
+                  f"{fmt(b['finished_at'])}{marker}")
+        print(f"\n⏱️ 전체 {report['wall']:.2f}s = critical path '{report['critical_path']}' 가 결정")
+        print(f"   순차 실행했다면 {report['sequential_sum']:.2f}s → 병렬로 {report['saved']:.2f}s 절약 "
+              f"(2개 이상 동시 실행 구간 {report['overlapped']:.2f}s)")
+
 
 # 1. 개별 체인 정의
-# 각 체인의 실행 시간을 확인하기 위해 RunnableLambda를 사용하여 로깅 추가
+# 각 체인에 run_name을 붙여 콜백 핸들러가 브랜치를 구분할 수 있게 한다.
 
 # 체인 A: 주제에 대한 '장점' 분석
 pros_prompt = ChatPromptTemplate.from_template("{topic}의 장점을 3가지 요약해줘.")
-# 로깅을 위해 커스텀 함수 추가
-pros_chain = (
-    RunnableLambda(lambda x: (print(f"🚀 [장점 분석] 시작: {time.strftime('%H:%M:%S')}"), x)[1])
-    | pros_prompt 
-    | llm 
-    | output_parser
-    | RunnableLambda(lambda x: (print(f"✅ [장점 분석] 완료: {time.strftime('%H:%M:%S')}"), x)[1])
-)
+pros_chain = (pros_prompt | llm | output_parser).with_config(run_name="pros")
 
 # 체인 B: 주제에 대한 '단점' 분석
 cons_prompt = ChatPromptTemplate.from_template("{topic}의 단점을 3가지 요약해줘.")
-cons_chain = (
-    RunnableLambda(lambda x: (print(f"🚀 [단점 분석] 시작: {time.strftime('%H:%M:%S')}"), x)[1])
-    | cons_prompt 
-    | llm 
-    | output_parser
-    | RunnableLambda(lambda x: (print(f"✅ [단점 분석] 완료: {time.strftime('%H:%M:%S')}"), x)[1])
-)
+cons_chain = (cons_prompt | llm | output_parser).with_config(run_name="cons")
 
 # 체인 C: 주제로 '시' 작성
 poem_prompt = ChatPromptTemplate.from_template("{topic}를 주제로 짧은 시를 써줘.")
-poem_chain = (
-    RunnableLambda(lambda x: (print(f"🚀 [시  작성] 시작: {time.strftime('%H:%M:%S')}"), x)[1])
-    | poem_prompt 
-    | llm 
-    | output_parser
-    | RunnableLambda(lambda x: (print(f"✅ [시  작성] 완료: {time.strftime('%H:%M:%S')}"), x)[1])
-)
+poem_chain = (poem_prompt | llm | output_parser).with_config(run_name="poem")
 
 # 2. 병렬 체인 구성 (RunnableParallel)
 # 딕셔너리 형태로 각 작업의 키와 실행할 체인을 지정
@@ -88,14 +192,16 @@ print("="*60)
 
 start_total = time.time()
 
-# invoke 한 번으로 3가지 작업이 병렬 실행됨
-result = parallel_chain.invoke({"topic": topic})
+# invoke 한 번으로 3가지 작업이 병렬 실행됨 (콜백 핸들러로 브랜치별 시간 측정)
+timing_handler = BranchTimingHandler(branches=["pros", "cons", "poem"])
+result = parallel_chain.invoke({"topic": topic}, config={"callbacks": [timing_handler]})
 
 end_total = time.time()
 
 print("\n" + "="*60)
 print(f"전체 완료 시간: {time.strftime('%H:%M:%S')}")
 print(f"총 소요 시간: {end_total - start_total:.2f}초")
+timing_handler.print_summary()
 print("="*60)
 
 # 결과 출력
@@ -1,6 +1,16 @@
+import asyncio
+import inspect
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError as FutureCancelledError, Future
+from operator import itemgetter
+from pathlib import Path
+
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda, RunnablePick
 from langchain_core.output_parsers import StrOutputParser
@@ -27,13 +37,17 @@ load_dotenv()
 llm = ChatOpenAI(model="gpt-4o-mini")
 output_parser = StrOutputParser()
 
-# 🔍 디버깅 헬퍼: 체인 중간 데이터 확인용
-def debug_step(step_name):
-    def _print_data(x):
-        print(f"\n👀 [Debug] {step_name}")
-        print(f"   데이터: {x}")
-        return x
-    return RunnableLambda(_print_data)
+# 🔍 트레이싱: 체인 중간 데이터 확인용 (2.Langchain/lc_15_tracing.py)
+# 체인 사이에 print 단계를 끼우지 않고, invoke(..., config=tracer.config())로 단계별 span을 기록한다.
+# - TRACE_SAMPLE_RATE: 기록할 요청 비율 (운영에서는 0.01 등, 0이면 콜백 없음)
+# - TRACE_PAYLOADS=1: 중간 데이터 내용까지 기록 (디버깅용, 기본은 크기만)
+from lc_15_tracing import JSONLExporter, SpanTracer, print_trace
+
+tracer = SpanTracer(
+    JSONLExporter(Path(__file__).resolve().parent / ".index" / "traces.jsonl"),
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+    capture_payloads=os.getenv("TRACE_PAYLOADS", "0") == "1",
+)
 
 # ------------------------------------------------------------------
 # 1. 기본: RunnablePassthrough.assign() - "데이터 누적하기"
@@ -45,23 +59,198 @@ print("="*60)
 print("1. RunnablePassthrough.assign() - 데이터 누적 예제")
 print("="*60)
 
-def get_user_info(input_dict):
-    # DB에서 사용자 정보를 가져오는 것을 가정
-    return "VIP_Member" if input_dict.get("user_id") == "user_123" else "Standard_Member"
+class LookupCache:
+    """
+    assign 단계의 조회 함수(DB, API 등)용 캐시
+
+    - TTL: 키마다 ttl초 동안 결과를 재사용
+    - 부정 캐시(negative cache): "없음" 결과(is_negative)도 negative_ttl초 동안 캐시
+      (없는 user_id로 반복 조회할 때마다 DB에 가지 않도록, 대신 짧게 유지)
+    - single-flight: 같은 키를 동시에 N개 요청하면 백엔드 호출은 1번, 나머지는 그 결과를 기다린다.
+    - 동기/비동기 함수 모두 지원 (invoke/batch/ainvoke/abatch 어느 쪽으로 실행해도 같은 캐시 공유)
+    - 예외는 캐시하지 않는다. (기다리던 요청들은 같은 예외를 받음)
+    - 먼저 호출한 요청이 취소되면(asyncio 취소, wait_for 시간 초과, Ctrl+C) 진행 중 표시를 지우고,
+      기다리던 요청 중 하나가 다시 호출한다. (같은 키가 영원히 멈추지 않도록)
+    """
+
+    def __init__(self, func, key, ttl=300, negative_ttl=30, is_negative=lambda value: value is None, maxsize=10_000):
+        self.func = func
+        self.key = key
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative
+        self.maxsize = maxsize
+        self._store = OrderedDict()  # key -> (만료 시각, 값)
+        self._inflight = {}          # key -> Future (백엔드 호출 진행 중)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _lookup(self, input_dict):
+        key = self.key(input_dict)
+        with self._lock:
+            entry = self._store.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._store.move_to_end(key)
+                self.stats["hits"] += 1
+                return key, "hit", entry[1]
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return key, "wait", future
+            future = self._inflight[key] = Future()
+            self.stats["misses"] += 1
+            return key, "lead", future
+
+    def _finish(self, key, future, value=None, error=None, abandoned=False):
+        with self._lock:
+            del self._inflight[key]
+            if abandoned:
+                pass
+            elif error is None:
+                ttl = self.negative_ttl if self.is_negative(value) else self.ttl
+                if ttl > 0:
+                    self._store[key] = (time.monotonic() + ttl, value)
+                    self._store.move_to_end(key)
+                    while len(self._store) > self.maxsize:
+                        self._store.popitem(last=False)
+            else:
+                self.stats["errors"] += 1
+        if future.done():
+            return
+        if abandoned:
+            future.cancel()  # 기다리던 요청들은 다시 _lookup부터 (그중 하나가 새로 호출)
+        elif error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def _call(self, input_dict):
+        while True:
+            key, state, value = self._lookup(input_dict)
+            if state == "hit":
+                return value
+            if state == "lead":
+                break
+            try:
+                return value.result()
+            except FutureCancelledError:  # 먼저 호출한 요청이 취소됨 → 다시 시도
+                continue
+        future, settled = value, False
+        try:
+            result = self.func(input_dict)
+            self._finish(key, future, result)
+            settled = True
+            return result
+        except Exception as e:
+            self._finish(key, future, error=e)
+            settled = True
+            raise
+        finally:
+            if not settled:  # KeyboardInterrupt 등 BaseException
+                self._finish(key, future, abandoned=True)
+
+    async def _acall(self, input_dict):
+        while True:
+            key, state, value = self._lookup(input_dict)
+            if state == "hit":
+                return value
+            if state == "lead":
+                break
+            try:
+                # shield: 이 요청이 취소돼도 공유 Future는 취소하지 않는다.
+                return await asyncio.shield(asyncio.wrap_future(value))
+            except asyncio.CancelledError:
+                if value.cancelled():  # 먼저 호출한 요청이 취소됨 → 다시 시도
+                    continue
+                raise
+        future, settled = value, False
+        try:
+            if inspect.iscoroutinefunction(self.func):
+                result = await self.func(input_dict)
+            else:  # 동기 함수는 스레드에서 (이벤트 루프를 막지 않도록)
+                result = await asyncio.get_running_loop().run_in_executor(None, self.func, input_dict)
+            self._finish(key, future, result)
+            settled = True
+            return result
+        except Exception as e:
+            self._finish(key, future, error=e)
+            settled = True
+            raise
+        finally:
+            if not settled:  # 취소(CancelledError), wait_for 시간 초과 등
+                self._finish(key, future, abandoned=True)
+
+    def invalidate(self, key=None) -> None:
+        """key 하나 또는 전체(None) 삭제 (예: 사용자 등급이 바뀌었을 때)"""
+        with self._lock:
+            if key is None:
+                self._store.clear()
+            else:
+                self._store.pop(key, None)
+
+    def as_runnable(self):
+        if inspect.iscoroutinefunction(self.func):
+            return RunnableLambda(self._acall, name=self.func.__name__)
+        return RunnableLambda(self._call, afunc=self._acall, name=self.func.__name__)
+
+
+def cached_lookup(key, ttl=300, negative_ttl=30, **kwargs):
+    """조회 함수를 LookupCache로 감싸는 데코레이터"""
+    def decorator(func):
+        return LookupCache(func, key, ttl=ttl, negative_ttl=negative_ttl, **kwargs)
+    return decorator
+
+
+USER_DB = {"user_123": "VIP_Member", "user_456": "Standard_Member"}
+
+
+@cached_lookup(key=itemgetter("user_id"), ttl=300, negative_ttl=30)
+def find_user(input_dict):
+    # DB에서 사용자 정보를 가져오는 것을 가정 (조회 1번에 50ms, 없는 사용자는 None → 부정 캐시)
+    time.sleep(0.05)
+    return USER_DB.get(input_dict.get("user_id"))
+
+
+# 등급이 없는(DB에 없는) 사용자는 기존처럼 "Standard_Member"
+# (기본값은 캐시 밖에서 채운다. 캐시에는 "없음"(None)이 그대로 남아 부정 캐시 TTL을 받는다.)
+get_user_info = find_user.as_runnable() | RunnableLambda(lambda grade: grade or "Standard_Member", name="default_grade")
 
 # 체인 구성
 # 1. 입력: {"user_id": "...", "query": "..."}
 # 2. assign: 입력값은 그대로 두고, 'user_grade'라는 필드만 계산해서 추가함
-chain_with_assign = (
-    debug_step("1. 초기 입력 데이터")
-    | RunnablePassthrough.assign(user_grade=get_user_info)
-    | debug_step("2. assign('user_grade') 실행 후 데이터")
-)
+#    (find_user는 캐시를 거친다. 같은 user_id는 5분간, 없는 user_id는 30초간 DB를 다시 조회하지 않음)
+chain_with_assign = RunnablePassthrough.assign(user_grade=get_user_info)
 
 # 실행
 print(">>> 실행 결과:")
-result = chain_with_assign.invoke({"user_id": "user_123", "query": "환불 규정이 어떻게 되나요?"})
+result = chain_with_assign.invoke({"user_id": "user_123", "query": "환불 규정이 어떻게 되나요?"}, config=tracer.config())
 # 결과 딕셔너리에 user_id, query는 그대로 있고 user_grade가 추가됨
+print_trace(tracer.last_trace)
+
+# 동시 요청 60개 (같은 사용자 50개 + 없는 사용자 10개) → DB 조회는 최대 2번
+lookups = [{"user_id": "user_456", "query": "배송 조회"}] * 50 + [{"user_id": "user_999", "query": "가입"}] * 10
+start = time.perf_counter()
+asyncio.run(chain_with_assign.abatch(lookups))
+print(f"\n⚡ 동시 요청 {len(lookups)}개: {(time.perf_counter() - start) * 1000:.0f}ms, 캐시 통계 {find_user.stats}")
+
+
+# 먼저 호출한 요청이 시간 초과로 취소돼도, 같은 키의 다음 요청은 멈추지 않고 다시 조회한다.
+@cached_lookup(key=itemgetter("user_id"), ttl=60)
+async def get_user_profile(input_dict):
+    await asyncio.sleep(0.3)  # 느린 API라고 가정
+    return {"user_id": input_dict["user_id"], "grade": USER_DB.get(input_dict["user_id"])}
+
+
+async def check_cancellation():
+    try:
+        await asyncio.wait_for(get_user_profile._acall({"user_id": "user_123"}), timeout=0.1)
+    except asyncio.TimeoutError:
+        pass
+    return await asyncio.wait_for(get_user_profile._acall({"user_id": "user_123"}), timeout=2)
+
+
+assert asyncio.run(check_cancellation())["grade"] == "VIP_Member"
+print(f"✅ 취소 후 재조회 정상, 캐시 통계 {get_user_profile.stats}")
 
 
 # ------------------------------------------------------------------
@@ -75,10 +264,23 @@ print("\n" + "="*60)
 print("2. 실전 응용: RAG 패턴 (질문 보존 + 문서 추가)")
 print("="*60)
 
-# 가상의 문서 검색 함수 (Retriever)
-def fake_retriever(query):
-    print(f"   (시스템: '{query}'에 대한 문서를 검색합니다...)")
-    return "랭체인(LangChain)은 LLM 애플리케이션 개발을 위한 프레임워크입니다."
+# 문서 검색기 (Retriever): data/ 문서에 대해 BM25 + 벡터 검색을 병렬로 실행하고 RRF로 결합
+# 자세한 구현은 3.RAG/rag_1_hybrid_retriever.py 참고
+sys.path.append(str(Path(__file__).resolve().parents[1] / "3.RAG"))
+from rag_1_hybrid_retriever import build_hybrid_retriever, load_corpus, format_docs
+from rag_2_bm25_index import KoreanBM25Index
+from rag_9_context_packing import ContextPacker
+
+corpus = load_corpus()
+bm25_index = KoreanBM25Index()  # 조사("경복궁은" vs "경복궁")를 처리하는 한국어 BM25 (3.RAG/rag_2_bm25_index.py)
+bm25_index.add_documents(corpus)
+hybrid_retriever = build_hybrid_retriever(corpus, OpenAIEmbeddings(), k=8, bm25=bm25_index.as_retriever(k=10))
+retriever = hybrid_retriever.as_runnable()
+
+# 컨텍스트 패커: 후보 8개 중 중복을 빼고 600 토큰 안에서 관련도 합이 최대인 청크만 남긴다.
+# (3.RAG/rag_9_context_packing.py) 토큰 수는 색인 시점에 미리 계산해 둔다.
+packer = ContextPacker(token_budget=600)
+packer.warm(corpus)
 
 # 프롬프트: 변수 2개 필요
 rag_prompt = ChatPromptTemplate.from_template(
@@ -86,24 +288,26 @@ rag_prompt = ChatPromptTemplate.from_template(
 )
 
 # RAG 체인 구성
-# input: {"question": "LangChain이 뭐야?"}
+# input: {"question": "경복궁은 어떤 곳이야?"}
 # step 1: assign(context=...) -> question은 유지하고, context 키에 검색 결과 추가
+#         (검색 → 토큰 예산 패킹 → 문자열 변환)
 #         결과: {"question": "...", "context": "검색된 내용"}
 # step 2: prompt -> 완성된 딕셔너리가 프롬프트의 {question}, {context}에 매핑됨
 rag_chain = (
-    debug_step("1. 초기 질문 데이터")
-    | RunnablePassthrough.assign(context=lambda x: fake_retriever(x["question"]))
-    | debug_step("2. assign('context') 실행 후 (프롬프트 입력값)")
+    RunnablePassthrough.assign(context=itemgetter("question") | retriever | packer.as_runnable() | format_docs)
     | rag_prompt 
     | llm 
     | output_parser
 )
 
 # 실행
-query = "LangChain이 뭐야?"
+query = "경복궁은 어떤 곳이야?"
 print(f"질문: {query}")
-rag_result = rag_chain.invoke({"question": query})
+rag_result = rag_chain.invoke({"question": query}, config=tracer.config())
+print_trace(tracer.last_trace)
 print(f"답변: {rag_result}")
+print(f"검색 단계별 지연(ms): { {k: round(v, 1) for k, v in hybrid_retriever.timings[-1].items()} }")
+print(f"컨텍스트 패킹: {packer.last_stats}")
 
 
 # ------------------------------------------------------------------
@@ -128,16 +332,11 @@ complex_output = {
 
 # 체인: 전체 데이터 -> 'content' 추출 -> 그 안에서 'answer' 추출
 # 딕셔너리 접근법: complex_output["content"]["answer"] 와 같음
-pick_chain = (
-    debug_step("1. 원본 데이터")
-    | RunnablePick("content") 
-    | debug_step("2. Pick('content') 실행 후")
-    | RunnablePick("answer")
-    | debug_step("3. Pick('answer') 실행 후 (최종 결과)")
-)
+pick_chain = RunnablePick("content") | RunnablePick("answer")
 
 # 실행
 # invoke에 들어가는 값이 위에서 정의한 딕셔너리라고 가정
-result_pick = pick_chain.invoke(complex_output)
+result_pick = pick_chain.invoke(complex_output, config=tracer.config())
+print_trace(tracer.last_trace)
 print(f"원본 데이터 키: {complex_output.keys()}")
 print(f"Pick 결과: {result_pick}")
@@ -0,0 +1,243 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langchain_core.output_parsers import StrOutputParser
+
+# ============================================================================
+# Adaptive Batch: 동시 실행 수를 스스로 조절하며 대량 입력 처리하기
+# ============================================================================
+# chain.batch(inputs, config={"max_concurrency": N}) 의 N은 고정값이다.
+# - 너무 작으면: API가 여유 있어도 느리게 처리한다.
+# - 너무 크면: 429(Rate Limit) 에러가 쏟아지고, 재시도가 겹쳐 오히려 더 느려진다.
+#
+# AIMD (Additive Increase, Multiplicative Decrease) - TCP 혼잡 제어와 같은 방식
+# - 동시 실행 수(limit)만큼 연속으로 성공하면 limit + 1   (조금씩 늘림)
+# - 429를 받거나 지연 시간이 목표(target_latency_s)를 넘으면 limit × 0.5   (크게 줄임)
+#   (이미 실행 중이던 요청들의 429로 여러 번 줄이지 않도록, 줄인 뒤 시작한 요청의 신호만 반영)
+#
+# 그 밖에
+# - 결과는 입력 순서대로 반환한다. (완료 순서와 무관)
+# - 항목 하나가 실패해도 나머지는 계속 처리하고, 실패한 자리에는 Exception 객체를 넣는다.
+#   (chain.batch(..., return_exceptions=True)와 같은 규칙)
+# - 429는 Retry-After 헤더(없으면 지수 백오프)만큼 기다렸다가 max_retries번까지 다시 시도한다.
+#
+# 주의: ChatOpenAI는 기본적으로 내부에서 429를 재시도해 신호를 숨긴다. → max_retries=0 으로 만든다.
+# ============================================================================
+
+# load env
+load_dotenv()
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """429 / RateLimitError 인지 판별 (openai, httpx, requests 예외 공통)"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveBatchExecutor:
+    """
+    LCEL Runnable을 AIMD로 동시 실행 수를 조절하며 대량 입력에 실행하는 실행기
+
+    runnable: invoke(input)를 가진 LCEL Runnable
+    initial_concurrency / min_concurrency / max_concurrency: 동시 실행 수 시작값 / 하한 / 상한
+    target_latency_s: 항목 지연 시간 목표 (넘으면 혼잡으로 보고 줄임, None이면 429만 반영)
+    max_retries: 429 재시도 횟수
+    backoff_s: 429 재시도 기본 대기 시간 (시도마다 2배 + 무작위 지터)
+    """
+
+    def __init__(self, runnable, initial_concurrency=4, min_concurrency=1, max_concurrency=64,
+                 target_latency_s=None, max_retries=5, backoff_s=1.0):
+        self.runnable = runnable
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency_s = target_latency_s
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.stats = {}
+
+    def _run_one(self, item, config):
+        start = time.perf_counter()
+        try:
+            return True, self.runnable.invoke(item, config=config), start, time.perf_counter()
+        except Exception as e:
+            return False, e, start, time.perf_counter()
+
+    def run(self, inputs, config=None) -> list:
+        """
+        모든 입력을 처리해 입력 순서대로 결과(실패한 항목은 Exception)를 반환한다.
+        처리 통계는 self.stats에 남는다.
+        """
+        inputs = list(inputs)
+        results = [None] * len(inputs)
+        pending = deque((i, 0, 0.0) for i in range(len(inputs)))  # (입력 번호, 재시도 횟수, 실행 가능 시각)
+        limit = self.initial_concurrency
+        successes_since_change = 0
+        last_decrease = 0.0
+        history = [(0.0, limit)]
+        counts = {"succeeded": 0, "failed": 0, "rate_limited": 0, "slow": 0}
+        latencies = []
+
+        started = time.perf_counter()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while pending or running:
+                # 동시 실행 수(limit)만큼 채운다. 재시도 대기 중인 항목은 시간이 될 때까지 건너뛴다.
+                now = time.perf_counter()
+                for _ in range(len(pending)):
+                    if len(running) >= limit:
+                        break
+                    index, attempt, not_before = pending.popleft()
+                    if not_before > now:
+                        pending.append((index, attempt, not_before))
+                        continue
+                    running[executor.submit(self._run_one, inputs[index], config)] = (index, attempt)
+
+                if not running:
+                    time.sleep(max(0.0, min(p[2] for p in pending) - time.perf_counter()))
+                    continue
+
+                done, _ = wait(running, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, attempt = running.pop(future)
+                    ok, value, start, end = future.result()
+                    congested = False
+
+                    if ok:
+                        results[index] = value
+                        counts["succeeded"] += 1
+                        latencies.append(end - start)
+                        if self.target_latency_s and end - start > self.target_latency_s:
+                            counts["slow"] += 1
+                            congested = True
+                    elif is_rate_limited(value) and attempt < self.max_retries:
+                        counts["rate_limited"] += 1
+                        delay = retry_after_seconds(value) or self.backoff_s * 2 ** attempt * (0.5 + random.random())
+                        pending.appendleft((index, attempt + 1, time.perf_counter() + delay))
+                        congested = True
+                    else:
+                        results[index] = value
+                        counts["failed"] += 1
+
+                    # AIMD: 줄인 뒤에 시작한 요청의 혼잡 신호만 반영한다.
+                    if congested and start > last_decrease:
+                        limit = max(self.min_concurrency, int(limit * 0.5))
+                        last_decrease = time.perf_counter()
+                        successes_since_change = 0
+                        history.append((last_decrease - started, limit))
+                    elif ok and not congested:
+                        successes_since_change += 1
+                        if successes_since_change >= limit and limit < self.max_concurrency:
+                            limit += 1
+                            successes_since_change = 0
+                            history.append((time.perf_counter() - started, limit))
+
+        elapsed = time.perf_counter() - started
+        limits = [limit for _, limit in history]
+        self.stats = {
+            "items": len(inputs),
+            **counts,
+            "elapsed_s": elapsed,
+            "items_per_s": len(inputs) / elapsed if elapsed else None,
+            "latency_p50_s": sorted(latencies)[len(latencies) // 2] if latencies else None,
+            "concurrency": {"min": min(limits), "max": max(limits), "final": limits[-1]},
+            "history": history,
+        }
+        return results
+
+    def as_runnable(self):
+        """list[input] -> list[output] Runnable (체인에 | 로 연결 가능)"""
+        return RunnableLambda(self.run, name="adaptive_batch")
+
+
+def print_stats(stats: dict) -> None:
+    print(f"  처리 {stats['items']}건: 성공 {stats['succeeded']}, 실패 {stats['failed']}, "
+          f"429 재시도 {stats['rate_limited']}, 지연 초과 {stats['slow']}")
+    print(f"  {stats['elapsed_s']:.2f}초, {stats['items_per_s']:.1f}건/초, "
+          f"동시 실행 수 {stats['concurrency']}")
+
+
+# ============================================================================
+# 실행 예제 1: 가상의 Rate Limit API (API 키 없이 AIMD 동작 확인)
+# ============================================================================
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeLimitedService:
+    """동시 요청이 capacity를 넘으면 429를 내는 가상 API (요청당 0.1초)"""
+
+    def __init__(self, capacity=12):
+        self.capacity = capacity
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, text):
+        with self.lock:
+            self.active += 1
+            over = self.active > self.capacity
+        try:
+            if over:
+                raise FakeRateLimitError("429 Too Many Requests")
+            if text == "bad":
+                raise ValueError("잘못된 입력")
+            time.sleep(0.1)
+            return text.upper()
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+print("=" * 60)
+print("1. 가상 API (동시 12개까지 허용) - 고정 동시 실행 수 vs AIMD")
+print("=" * 60)
+
+items = [f"item-{i}" for i in range(200)]
+items[7] = "bad"  # 실패 항목 하나 (나머지 처리에 영향 없음)
+service = RunnableLambda(FakeLimitedService(capacity=12))
+
+for label, executor in [
+    ("고정 2개 (너무 소심)", AdaptiveBatchExecutor(service, initial_concurrency=2, max_concurrency=2, backoff_s=0.2)),
+    ("고정 40개 (너무 공격적)", AdaptiveBatchExecutor(service, initial_concurrency=40, min_concurrency=40,
+                                                  max_concurrency=40, backoff_s=0.2)),
+    ("AIMD (4개에서 시작)", AdaptiveBatchExecutor(service, initial_concurrency=4, max_concurrency=64, backoff_s=0.2)),
+]:
+    outputs = executor.run(items)
+    print(f"\n▶ {label}")
+    print_stats(executor.stats)
+    print(f"  순서 유지: {outputs[:3]} ... outputs[7]={outputs[7]!r}")
+
+
+# ============================================================================
+# 실행 예제 2: 실제 LLM 체인
+# ============================================================================
+
+print("\n" + "=" * 60)
+print("2. LLM 체인 - 여러 주제를 한 번에 요약")
+print("=" * 60)
+
+llm = ChatOpenAI(model="gpt-4o-mini", max_retries=0)  # 429를 실행기가 직접 보도록 내부 재시도 끔
+chain = ChatPromptTemplate.from_template("{topic}을(를) 한 문장으로 설명해줘.") | llm | StrOutputParser()
+
+topics = ["재택근무", "전기차", "블록체인", "기후 변화", "인공지능", "메타버스", "양자 컴퓨터", "우주 관광"]
+executor = AdaptiveBatchExecutor(chain, initial_concurrency=2, max_concurrency=16, target_latency_s=10)
+answers = executor.run([{"topic": topic} for topic in topics])
+for topic, answer in zip(topics, answers):
+    print(f"- {topic}: {answer}")
+print_stats(executor.stats)
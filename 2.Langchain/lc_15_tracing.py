@@ -0,0 +1,278 @@
+import json
+import random
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+
+# ============================================================================
+# Tracing: 체인 구조를 바꾸지 않고 각 단계의 실행을 span으로 기록하기
+# ============================================================================
+# 체인 사이에 print용 RunnableLambda(debug_step)를 끼우면
+# - 운영 배포 전에 지웠다가 디버깅할 때 다시 넣어야 하고 (체인 구조가 바뀜)
+# - 매 호출마다 중간 데이터 전체를 문자열로 만들어 출력한다.
+#
+# SpanTracer: LangChain 콜백으로 체인/LLM/검색기/도구 실행마다 span 하나를 남긴다.
+# - 체인은 그대로 두고 invoke(..., config=tracer.config())로만 붙인다.
+# - 샘플링: config()가 요청마다 sample_rate 확률로 콜백을 붙일지 결정한다.
+#   뽑히지 않은 요청과 enabled=False일 때는 콜백 자체가 없으므로 추가 비용이 0이다.
+# - 기본은 중간 데이터 대신 크기(input_bytes, output_bytes)만 기록한다.
+#   capture_payloads=True일 때만 내용을 잘라서(payload_chars) 같이 남긴다. (디버깅용)
+# - 요청(trace) 하나가 끝나면 span들을 한꺼번에 exporter로 보낸다.
+#   JSONLExporter: 한 줄에 span 하나 / OTLPExporter: OpenTelemetry Collector, Jaeger 등으로 전송
+# ============================================================================
+
+
+def payload_size(value) -> int:
+    """중간 데이터의 대략적인 크기 (UTF-8 바이트, 직렬화하지 않고 문자열 길이만 합산)"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, Document):
+        return payload_size(value.page_content)
+    if isinstance(value, BaseMessage):
+        return payload_size(value.content)
+    if isinstance(value, dict):
+        return sum(payload_size(k) + payload_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(v) for v in value)
+    return len(str(value))
+
+
+def payload_preview(value, limit) -> str:
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= limit else text[:limit] + f"...(+{len(text) - limit})"
+
+
+class SpanTracer(BaseCallbackHandler):
+    """
+    체인 단계별 span을 기록하는 콜백 핸들러
+
+    exporter: export(spans)를 가진 객체 (None이면 last_trace에만 보관)
+    sample_rate: 요청 중 기록할 비율 (0.0 ~ 1.0)
+    capture_payloads: True면 입출력 내용도 payload_chars자까지 기록
+    enabled: False면 config()가 항상 빈 설정을 돌려준다.
+    """
+
+    def __init__(self, exporter=None, sample_rate=1.0, capture_payloads=False, payload_chars=500, enabled=True):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.capture_payloads = capture_payloads
+        self.payload_chars = payload_chars
+        self.enabled = enabled
+        self.last_trace = []
+        self._spans = {}  # run_id -> span (진행 중)
+        self._traces = {}  # 최상위 run_id -> 완료된 span 리스트
+        self._trace_of = {}  # run_id -> 최상위 run_id
+        self._lock = threading.Lock()
+
+    def config(self, **config) -> dict:
+        """invoke/stream/batch에 넘길 config. 샘플링에서 빠지면 콜백 없이 그대로 반환"""
+        if self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate):
+            config["callbacks"] = [*config.get("callbacks", []), self]
+        return config
+
+    # ------------------------------------------------------------------
+    # span 시작 / 종료
+    # ------------------------------------------------------------------
+    def _start(self, kind, name, run_id, parent_run_id, payload, tags=None):
+        span = {
+            "trace_id": None,
+            "span_id": run_id.hex,
+            "parent_id": parent_run_id.hex if parent_run_id else None,
+            "name": name or kind,
+            "kind": kind,
+            "start_ns": time.time_ns(),
+            "input_bytes": payload_size(payload),
+        }
+        if tags:
+            span["tags"] = tags
+        if self.capture_payloads:
+            span["input"] = payload_preview(payload, self.payload_chars)
+        with self._lock:
+            root = self._trace_of.get(parent_run_id, run_id) if parent_run_id else run_id
+            self._trace_of[run_id] = root
+            span["trace_id"] = root.hex
+            self._spans[run_id] = span
+            if root == run_id:
+                self._traces[root] = []
+
+    def _end(self, run_id, payload=None, error=None, **attributes):
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+            if span is None:
+                return
+            root = self._trace_of.pop(run_id)
+            span["end_ns"] = time.time_ns()
+            span["duration_ms"] = (span["end_ns"] - span["start_ns"]) / 1e6
+            span["output_bytes"] = payload_size(payload)
+            span["status"] = "error" if error else "ok"
+            if error:
+                span["error"] = f"{type(error).__name__}: {error}"
+            if self.capture_payloads and payload is not None:
+                span["output"] = payload_preview(payload, self.payload_chars)
+            span.update(attributes)
+            spans = self._traces[root]
+            spans.append(span)
+            finished = root == run_id
+            if finished:
+                del self._traces[root]
+        if finished:
+            spans.sort(key=lambda s: s["start_ns"])
+            self.last_trace = spans
+            if self.exporter:
+                self.exporter.export(spans)
+
+    # ------------------------------------------------------------------
+    # 콜백
+    # ------------------------------------------------------------------
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start("chain", kwargs.get("name"), run_id, parent_run_id, inputs, tags)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, outputs)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start("llm", kwargs.get("name"), run_id, parent_run_id, messages, tags)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start("llm", kwargs.get("name"), run_id, parent_run_id, prompts, tags)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        texts = [g.text for generations in response.generations for g in generations]
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end(run_id, texts, prompt_tokens=usage.get("prompt_tokens"),
+                  completion_tokens=usage.get("completion_tokens"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start("retriever", kwargs.get("name"), run_id, parent_run_id, query, tags)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self._start("tool", kwargs.get("name") or (serialized or {}).get("name"), run_id, parent_run_id, input_str, tags)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+
+def print_trace(spans) -> None:
+    """span 목록을 호출 트리 모양으로 출력"""
+    depth = {}
+    for span in spans:
+        depth[span["span_id"]] = depth.get(span["parent_id"], -1) + 1
+        line = (f"{'  ' * depth[span['span_id']]}{'❌' if span['status'] == 'error' else '•'} "
+                f"{span['name']} [{span['kind']}] {span['duration_ms']:.1f}ms "
+                f"in={span['input_bytes']}B out={span['output_bytes']}B")
+        print(line)
+        for key in ("input", "output", "error"):
+            if key in span:
+                print(f"{'  ' * depth[span['span_id']]}    {key}: {span[key]}")
+
+
+# ============================================================================
+# Exporter
+# ============================================================================
+
+class JSONLExporter:
+    """trace 하나의 span들을 JSONL 파일에 이어 쓴다. (한 줄 = span 하나)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> None:
+        lines = "".join(json.dumps(span, ensure_ascii=False) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class OTLPExporter:
+    """
+    span을 OpenTelemetry OTLP(HTTP)로 전송한다. (Collector, Jaeger, Tempo 등)
+    pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http
+
+    endpoint: 예) http://localhost:4318/v1/traces (None이면 OTEL_EXPORTER_OTLP_ENDPOINT 환경 변수)
+    """
+
+    def __init__(self, endpoint=None, service_name="langchain-app"):
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        self._trace = trace
+        self.provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        self.provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self.tracer = self.provider.get_tracer("lc_15_tracing")
+
+    def export(self, spans) -> None:
+        otel_spans = {}
+        for span in spans:  # 시작 순서대로 → 부모가 항상 먼저 만들어진다.
+            parent = otel_spans.get(span["parent_id"])
+            context = self._trace.set_span_in_context(parent) if parent else None
+            otel_span = self.tracer.start_span(span["name"], context=context, start_time=span["start_ns"])
+            for key, value in span.items():
+                if key not in ("name", "start_ns", "end_ns", "trace_id", "span_id", "parent_id") and value is not None:
+                    otel_span.set_attribute(f"langchain.{key}", value if isinstance(value, (str, int, float, bool)) else str(value))
+            if span["status"] == "error":
+                otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.get("error")))
+            otel_spans[span["span_id"]] = otel_span
+        for span in reversed(spans):
+            otel_spans[span["span_id"]].end(end_time=span["end_ns"])
+
+    def shutdown(self) -> None:
+        self.provider.shutdown()
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+    chain = (
+        RunnablePassthrough.assign(length=RunnableLambda(lambda x: len(x["text"]), name="count_chars"))
+        | RunnableLambda(lambda x: x["text"].upper(), name="upper")
+    )
+    trace_path = Path(__file__).resolve().parent / ".index" / "traces.jsonl"
+
+    # 1. 디버깅: 모든 요청을 내용까지 기록 (debug_step 대신)
+    tracer = SpanTracer(JSONLExporter(trace_path), sample_rate=1.0, capture_payloads=True)
+    chain.invoke({"text": "경복궁은 조선의 법궁이다."}, config=tracer.config())
+    print("🔎 디버깅 모드 (내용 포함)")
+    print_trace(tracer.last_trace)
+
+    # 2. 운영: 10%만 크기 위주로 기록
+    tracer = SpanTracer(JSONLExporter(trace_path), sample_rate=0.1)
+    n_requests = 2000
+    for label, make_config in [("콜백 없음", dict), ("전체 기록", SpanTracer(JSONLExporter(trace_path)).config),
+                               ("샘플링 10%", tracer.config),
+                               ("비활성화", SpanTracer(enabled=False).config)]:
+        start = time.perf_counter()
+        for i in range(n_requests):
+            chain.invoke({"text": f"요청 {i}"}, config=make_config())
+        print(f"⏱️ {label}: 요청당 {(time.perf_counter() - start) / n_requests * 1e6:.0f}µs")
+    print(f"\n📝 {trace_path}")
@@ -1,9 +1,18 @@
+import hashlib
 import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
 
 from dotenv import load_dotenv
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 # ============================================================================
 # Multi-Chain: 여러 체인을 연결하여 첫 번째 체인의 출력을 두 번째 체인의 입력으로 사용
 # ============================================================================
@@ -21,7 +30,9 @@ llm = ChatOpenAI(model="gpt-4o-mini", api_key=api_key)
 output_parser = StrOutputParser()
 
 # prompt
-prompt1 = ChatPromptTemplate.from_template("translates {korean_word} to English.")
+prompt1 = ChatPromptTemplate.from_template(
+    "Translate the Korean word {korean_word} to English. Reply with the English word only."
+)
 prompt2 = ChatPromptTemplate.from_template("explain {english_word} using oxford dictionary to me in Korean.")
 
 
@@ -31,7 +42,283 @@ chain1 = prompt1 | llm | output_parser
 chain2 = ({"english_word": chain1} | prompt2 | llm | output_parser)
 
 # execute
+start = time.perf_counter()
 result = chain2.invoke({"korean_word": "미래"})
 
 # print result
-print(result)
\ No newline at end of file
+print(result)
+print(f"⏱️ 순차 실행: {time.perf_counter() - start:.2f}초\n")
+
+
+# ============================================================================
+# Pipelining: 앞 체인의 출력이 "충분히" 나오면 바로 다음 체인을 시작
+# ============================================================================
+# 위 chain2는 chain1의 응답이 끝까지(마지막 토큰 + 응답 종료) 와야 prompt2를 만든다.
+# 하지만 필요한 것은 번역어 한 줄뿐이다. ("future", "ice cream", "evening glow")
+# → chain1을 stream으로 받다가 번역어가 끝나는 순간(줄바꿈/문장부호) 스트림을 닫고(남은 생성 중단) 다음 체인으로 넘긴다.
+#   공백에서 끊으면 여러 단어 번역이 잘리므로("Ice"+" cream" → "Ice") 공백은 끝으로 보지 않는다.
+#
+# 서로 의존하지 않는 앞 단계들은 dict(RunnableParallel)에 같이 넣으면 동시에 실행된다.
+#   {"english_word": ..., "synonyms": ...} | prompt2   → 두 체인이 병렬로 돌고, 둘 다 끝나면 prompt2
+# → 전체 지연 시간: sum(단계) 대신 max(앞 단계들) + 뒤 단계
+# ============================================================================
+
+PHRASE_END_PATTERN = re.compile(r"^\s*([^\n.,!?;:]*)[\n.,!?;:]")
+
+
+def first_phrase(text: str, done: bool):
+    """
+    스트리밍 중인 텍스트에서 첫 번역어(구)가 끝났으면 반환, 아직이면 None
+    (줄바꿈/문장부호가 나와야 끝, 스트림이 끝났으면 남은 텍스트 전체. 공백에서는 끊지 않는다)
+    """
+    match = PHRASE_END_PATTERN.match(text)
+    if match:
+        phrase = match.group(1)
+    elif done:
+        phrase = text
+    else:
+        return None
+    return phrase.strip().strip("\"'*").strip() or None
+
+
+def stream_until(chain, extract, name="stream_until"):
+    """
+    chain을 스트리밍으로 실행하다가 extract(지금까지의 텍스트, done)가 값을 돌려주는 즉시 반환하는 Runnable
+    스트림을 닫아 나머지 토큰 생성(과 그 비용)을 중단한다.
+    """
+
+    def _run(inputs, config):
+        text = ""
+        stream = chain.stream(inputs, config)
+        try:
+            for chunk in stream:
+                text += chunk
+                value = extract(text, False)
+                if value is not None:
+                    return value
+        finally:
+            stream.close()
+        return extract(text, True)
+
+    async def _arun(inputs, config):
+        text = ""
+        stream = chain.astream(inputs, config)
+        try:
+            async for chunk in stream:
+                text += chunk
+                value = extract(text, False)
+                if value is not None:
+                    return value
+        finally:
+            await stream.aclose()
+        return extract(text, True)
+
+    return RunnableLambda(_run, afunc=_arun, name=name)
+
+
+# chain1의 번역어가 끝나자마자 chain2 시작
+pipelined_chain = (
+    {"english_word": stream_until(chain1, first_phrase, name="translate")}
+    | prompt2
+    | llm
+    | output_parser
+)
+
+start = time.perf_counter()
+print("🚀 파이프라인 실행:")
+for chunk in pipelined_chain.stream({"korean_word": "미래"}):
+    print(chunk, end="", flush=True)
+print(f"\n⏱️ 파이프라인 실행: {time.perf_counter() - start:.2f}초")
+
+
+# ============================================================================
+# Glossary Cache: 번역 결과를 디스크에 저장해 두고 chain1 호출 자체를 건너뛰기
+# ============================================================================
+# 단어 조회는 소수의 단어가 대부분을 차지한다. (미래, 사랑, 시간 ...)
+# 같은 단어를 번역하려고 매번 LLM을 왕복하는 대신:
+# 1. SQLite 파일에 한국어 → 영어를 저장 (프로세스를 재시작해도 유지, 여러 프로세스가 같이 읽기 가능)
+# 2. 자주 쓰는 단어는 메모리(LRU)에도 올려 두어 디스크 조회도 생략
+# 3. preload_tsv(): 검수된 용어집(TSV)을 한 번에 넣어 미리 데워 둔다. (LLM 결과보다 우선)
+# 4. LLM 번역은 source에 "llm:<프롬프트/모델 버전>"으로 저장하고, 조회할 때 현재 버전만 인정한다.
+#    (프롬프트나 모델을 바꾸면 예전 번역은 자동으로 무시되고 다시 번역된다)
+# 5. invalidate(): 잘못된 번역을 지우거나, 예전 버전의 LLM 결과를 한꺼번에 지운다.
+# 적중(hit)하면 chain1을 호출하지 않고 바로 prompt2로 넘어간다.
+# 캐시에는 중간에 끊은 스트림이 아니라 응답 전체를 정리한 값을 저장한다. (한 번 저장하면 계속 재사용되므로)
+# ============================================================================
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+GLOSSARY_PATH = Path(__file__).resolve().parent / ".index" / "glossary.sqlite"
+
+
+def normalize_word(word: str) -> str:
+    """조회 키 정규화 (NFC: macOS 등에서 자모가 분리된 문자열도 같은 키로)"""
+    return unicodedata.normalize("NFC", word).strip()
+
+
+def clean_translation(text: str) -> str:
+    """번역 응답 전체에서 앞뒤 공백/따옴표/마침표만 정리한다. (여러 단어 번역도 그대로)"""
+    return text.strip().splitlines()[0].strip().strip(".\"'*").strip() if text.strip() else ""
+
+
+def prompt_version(prompt, model) -> str:
+    """프롬프트 문구 + 모델 이름 → 짧은 버전 문자열 (둘 중 하나가 바뀌면 달라진다)"""
+    return hashlib.sha256(f"{model.model_name}\0{prompt.pretty_repr()}".encode("utf-8")).hexdigest()[:12]
+
+
+class GlossaryCache:
+    """
+    한국어 → 영어 번역 캐시 (SQLite + 메모리)
+
+    path: SQLite 파일 경로
+    memory_size: 메모리에 올려 둘 최대 단어 수 (가장 오래 안 쓴 단어부터 제거)
+    version: LLM 번역의 프롬프트/모델 버전 (source = "llm:<version>", 다른 버전의 LLM 번역은 무시)
+    """
+
+    def __init__(self, path=GLOSSARY_PATH, memory_size=10_000, version="v1"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_size = memory_size
+        self.llm_source = f"llm:{version}"
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"hits": 0, "misses": 0}
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS glossary ("
+                " korean TEXT PRIMARY KEY, english TEXT NOT NULL,"
+                " source TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        """스레드마다 연결 하나 (sqlite3 연결은 스레드 간 공유 불가)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")  # 쓰는 중에도 다른 프로세스가 읽을 수 있다.
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, korean, english):
+        with self._lock:
+            self._memory[korean] = english
+            self._memory.move_to_end(korean)
+            if len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)  # 가장 오래 안 쓴 단어 제거
+
+    def get(self, korean_word: str):
+        korean = normalize_word(korean_word)
+        with self._lock:
+            english = self._memory.get(korean)
+            if english is not None:
+                self._memory.move_to_end(korean)  # LRU: 적중한 단어는 뒤로
+        if english is None:
+            row = self._connect().execute(
+                "SELECT english FROM glossary WHERE korean = ? AND source IN ('tsv', ?)",
+                (korean, self.llm_source),
+            ).fetchone()
+            if row:
+                english = row[0]
+                self._remember(korean, english)
+        self.stats["hits" if english is not None else "misses"] += 1
+        return english
+
+    def put(self, korean_word: str, english_word: str, source=None) -> None:
+        """source: None이면 현재 버전의 LLM 번역 ("llm:<version>")"""
+        source = source or self.llm_source
+        korean = normalize_word(korean_word)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO glossary VALUES (?, ?, ?, ?)",
+                (korean, english_word, source, time.time()),
+            )
+        self._remember(korean, english_word)
+
+    def preload_tsv(self, tsv_path) -> int:
+        """
+        "한국어\t영어" 형식의 TSV를 한 번의 트랜잭션으로 넣는다. (# 으로 시작하는 줄은 무시)
+        Returns:
+            넣은 단어 수
+        """
+        rows = []
+        now = time.time()
+        with open(tsv_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                korean, _, english = line.rstrip("\n").partition("\t")
+                if korean.strip() and english.strip():
+                    rows.append((normalize_word(korean), english.strip(), "tsv", now))
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO glossary VALUES (?, ?, ?, ?)", rows)
+        with self._lock:
+            self._memory.clear()
+        return len(rows)
+
+    def invalidate(self, korean_word=None, source=None) -> int:
+        """
+        캐시 삭제
+        - korean_word: 그 단어만
+        - source: 출처별 ("llm"이면 모든 버전의 LLM 번역, "llm:<version>"이면 그 버전만 지우고 TSV 용어집은 유지)
+        - 둘 다 None: 전체
+        Returns:
+            지운 단어 수
+        """
+        query, params = "DELETE FROM glossary WHERE 1=1", []
+        if korean_word is not None:
+            query += " AND korean = ?"
+            params.append(normalize_word(korean_word))
+        if source is not None:
+            query += " AND (source = ? OR source LIKE ?)"
+            params.extend([source, f"{source}:%"])
+        with self._connect() as conn:
+            deleted = conn.execute(query, params).rowcount
+        with self._lock:
+            self._memory.clear()
+        return deleted
+
+    def cached(self, translate, input_key="korean_word"):
+        """
+        translate 체인 앞에 캐시를 붙인 Runnable
+        적중하면 translate를 호출하지 않고, 놓치면 translate 결과를 저장한 뒤 반환한다.
+        translate는 응답 전체(정리된 번역)를 돌려줘야 한다. 잘라 낸 값을 넣으면 그대로 굳어 버린다.
+        """
+
+        def _run(inputs, config):
+            english = self.get(inputs[input_key])
+            if english is None:
+                english = translate.invoke(inputs, config)
+                if english:
+                    self.put(inputs[input_key], english)
+            return english
+
+        async def _arun(inputs, config):
+            english = self.get(inputs[input_key])
+            if english is None:
+                english = await translate.ainvoke(inputs, config)
+                if english:
+                    self.put(inputs[input_key], english)
+            return english
+
+        return RunnableLambda(_run, afunc=_arun, name="glossary_cache")
+
+
+glossary = GlossaryCache(version=prompt_version(prompt1, llm))
+print(f"\n📖 용어집 미리 적재: {glossary.preload_tsv(DATA_DIR / 'glossary.tsv')}개")
+
+# 놓친 단어는 스트림을 끊지 않고 응답 전체를 정리해 저장한다. (단어당 한 번뿐이라 파이프라이닝 이득보다 정확도가 중요)
+cached_chain = (
+    {"english_word": glossary.cached(chain1 | RunnableLambda(clean_translation, name="clean_translation"))}
+    | prompt2
+    | llm
+    | output_parser
+)
+
+for korean_word in ["미래", "미래", "노을"]:  # 용어집 적중 → 적중 → LLM 번역 후 저장
+    start = time.perf_counter()
+    result = cached_chain.invoke({"korean_word": korean_word})
+    print(f"⏱️ {korean_word}: {time.perf_counter() - start:.2f}초 {glossary.stats}")
+print(result)
+
+# 프롬프트나 모델을 바꾸면 버전이 달라져 예전 LLM 번역은 자동으로 무시된다. 공간을 비우려면
+# glossary.invalidate(source="llm")
\ No newline at end of file
@@ -1,13 +1,17 @@
+import asyncio
+import logging
 import os
+import re
+import sys
+import threading
+import time
+import traceback
 
 from dotenv import load_dotenv
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
-import nest_asyncio
-import asyncio
-
 # ============================================================================
 # Runnable: LangChain의 모든 컴포넌트가 공통으로 구현하는 인터페이스 (invoke, batch, stream, ainvoke)
 # Runnable이어야 체인에 연결 가능하다.
@@ -48,22 +52,193 @@ chain = prompt | llm | output_parser
 # --------------------------------------------------------------------
 # stream: 실시간 스트리밍으로 토큰 단위 응답 받기
 # --------------------------------------------------------------------
-stream = chain.stream({"topic": "지진"}) # LLM의 응답을 한 글자/토큰 단위로 실시간 스트리밍 시작
-print("stream 결과:")
-for chunk in stream: # 응답을 순차적으로 받아 출력
-    print(chunk, end="", flush=True) # 줄바꿈 없이 계속 출력되도록 함
-#    chunk: LLM이 스트리밍으로 보내온 문자열 (보통 한 단어/문장 또는 토큰)
-#    end="" : 기본값 "\n" → 줄바꿈 발생 → ""으로 지정하면 줄바꿈 없이 이어서 출력
-#    flush=True : 	버퍼에 남아 있는 내용을 즉시 콘솔에 출력 → 지연 없이 타자 치듯 출력됨
-print()
+# stream = chain.stream({"topic": "지진"}) # LLM의 응답을 한 글자/토큰 단위로 실시간 스트리밍 시작
+# print("stream 결과:")
+# for chunk in stream: # 응답을 순차적으로 받아 출력
+#     print(chunk, end="", flush=True) # 줄바꿈 없이 계속 출력되도록 함
+# #    chunk: LLM이 스트리밍으로 보내온 문자열 (보통 한 단어/문장 또는 토큰)
+# #    end="" : 기본값 "\n" → 줄바꿈 발생 → ""으로 지정하면 줄바꿈 없이 이어서 출력
+# #    flush=True : 	버퍼에 남아 있는 내용을 즉시 콘솔에 출력 → 지연 없이 타자 치듯 출력됨
+# print()
 
-# --------------------------------------------------------------------
-# async method: 비동기 실행 (ainvoke)
-# --------------------------------------------------------------------
-# nest_asyncio.apply()
+# ============================================================================
+# async 우선 실행: 하나의 이벤트 루프에서 ainvoke / astream / abatch
+# ============================================================================
+# 예전에는 nest_asyncio.apply()로 이미 돌고 있는 루프 안에서 다시 루프를 돌렸다. (주피터 등)
+# - 루프를 패치하므로 매 호출마다 오버헤드가 생기고,
+# - 루프 안에서 동기 호출(chain.invoke, requests.get, time.sleep ...)을 해도 그냥 동작해 버려
+#   "루프가 멈춰 있는" 문제를 숨긴다. → 동시 요청 수천 개가 한 요청씩 줄을 서게 된다.
 #
-# async def run_async():
-#     result = await chain.ainvoke({"topic": "해류"})
-#     print("ainvoke 결과:", result[:50], "...")
+# 이제는 프로그램 진입점에서 asyncio.run(main()) 한 번만 호출하고, 그 안에서는 a- 메서드만 쓴다.
+# (주피터처럼 이미 루프가 도는 환경에서는 asyncio.run 대신 셀에서 바로 await main())
 #
-# asyncio.run(run_async())
\ No newline at end of file
+# BlockingCallDetector: 루프 안에서 루프를 막는 동기 호출을 찾아낸다.
+# 1. loop.set_debug(True) + slow_callback_duration: 한 번에 threshold 이상 실행된 콜백/태스크 단계를
+#    asyncio가 로그로 남긴다. → 로그를 가로채 기록
+# 2. 감시(watchdog) 스레드: 루프 안의 하트비트 코루틴이 주기적으로 시각을 갱신한다.
+#    threshold 이상 갱신이 없으면 루프 스레드의 현재 스택을 떠서 "어디서 막혔는지" 기록
+# 같은 멈춤을 두 쪽이 모두 잡으면 이벤트 하나로 합친다. (watchdog의 스택 + asyncio의 정확한 실행 시간)
+# (디버그 모드는 루프를 느리게 하므로 개발/부하 테스트에서만 켠다)
+# ============================================================================
+
+
+class BlockingCallDetector:
+    """
+    이벤트 루프를 threshold초 이상 막은 동기 호출을 찾아 기록한다.
+
+    async with BlockingCallDetector(threshold=0.1) as detector:
+        ...
+    detector.report()
+
+    threshold: 이 시간 이상 루프가 멈추면 블로킹으로 본다. (초)
+    """
+
+    def __init__(self, threshold=0.1):
+        self.threshold = threshold
+        self.events = []  # {"source": "watchdog"/"asyncio"/"watchdog+asyncio", "blocked_s", "where", "beat"}
+        self._events_lock = threading.Lock()  # watchdog 스레드와 루프 스레드가 같이 쓴다.
+        self._heartbeat = None
+        self._stop = threading.Event()
+        self._log_handler = None
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._previous_debug = (loop.get_debug(), loop.slow_callback_duration)
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold
+
+        detector = self
+
+        class _SlowCallbackHandler(logging.Handler):
+            def emit(self, record):
+                message = record.getMessage()
+                if message.startswith("Executing"):  # "Executing <Task ...> took 0.312 seconds"
+                    detector._record_slow_callback(message)
+
+        self._log_handler = _SlowCallbackHandler()
+        logging.getLogger("asyncio").addHandler(self._log_handler)
+
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        await asyncio.sleep(0)  # 디버그 모드는 다음 실행 단계부터 적용되므로 한 번 양보
+        return self
+
+    async def __aexit__(self, *exc):
+        self._stop.set()
+        self._heartbeat_task.cancel()
+        await asyncio.to_thread(self._watchdog.join)  # join()도 루프를 막는 호출이므로 스레드에서 기다린다.
+        logging.getLogger("asyncio").removeHandler(self._log_handler)
+        loop = asyncio.get_running_loop()
+        loop.set_debug(self._previous_debug[0])
+        loop.slow_callback_duration = self._previous_debug[1]
+
+    async def _beat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.threshold / 4)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat  # 같은 멈춤은 한 번만 기록
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.extract_stack(frame)[-4:] if frame else []
+            where = " <- ".join(f"{f.name}({os.path.basename(f.filename)}:{f.lineno})" for f in reversed(stack))
+            with self._events_lock:
+                self.events.append({"source": "watchdog", "blocked_s": blocked, "where": where, "beat": beat})
+
+    def _record_slow_callback(self, message):
+        """
+        asyncio의 느린 콜백 로그를 기록한다. 같은 멈춤을 watchdog이 이미 기록했다면
+        (그 멈춤이 이 콜백 실행 구간 안에서 시작됐다면) 새 이벤트 대신 그 이벤트에 합친다.
+        """
+        match = re.search(r"took ([\d.]+) seconds", message)
+        took = float(match.group(1)) if match else None
+        with self._events_lock:
+            last = self.events[-1] if self.events else None
+            # 마지막 하트비트는 멈춤 시작보다 하트비트 간격(threshold / 4) + 스케줄링 지연만큼 앞설 수 있다.
+            started = time.monotonic() - (took or 0) - self.threshold / 2
+            if last and last["source"] == "watchdog" and last["beat"] >= started:
+                last.update(source="watchdog+asyncio", blocked_s=took or last["blocked_s"], asyncio=message)
+            else:
+                self.events.append({"source": "asyncio", "blocked_s": took, "where": message, "beat": None})
+
+    def report(self):
+        if not self.events:
+            print(f"✅ 블로킹 호출 없음 (기준 {self.threshold * 1000:.0f}ms)")
+            return
+        print(f"🚨 이벤트 루프 블로킹 {len(self.events)}건 (기준 {self.threshold * 1000:.0f}ms)")
+        for event in self.events:
+            if event["blocked_s"] is None:
+                blocked = ""
+            elif event["source"] == "watchdog":  # 감시 주기 단위로 잰 하한
+                blocked = f"{event['blocked_s'] * 1000:.0f}ms 이상"
+            else:
+                blocked = f"{event['blocked_s'] * 1000:.0f}ms"
+            print(f"  [{event['source']}] {blocked} {event['where'][:200]}")
+
+
+# --------------------------------------------------------------------
+# ainvoke / astream / abatch
+# --------------------------------------------------------------------
+async def run_async():
+    # ainvoke: 단일 입력 (await 하는 동안 루프는 다른 요청을 처리한다)
+    result = await chain.ainvoke({"topic": "해류"})
+    print("ainvoke 결과:", result[:50], "...")
+
+    # astream: 비동기 스트리밍
+    print("astream 결과:")
+    async for chunk in chain.astream({"topic": "지진"}):
+        print(chunk, end="", flush=True)
+    print()
+
+    # abatch: 여러 입력을 동시에 (max_concurrency로 동시 요청 수 제한)
+    topics = ["지구 공전", "화산 활동", "대륙 이동"]
+    results = await chain.abatch([{"topic": t} for t in topics], config={"max_concurrency": 3})
+    for topic, text in zip(topics, results):
+        print(f"{topic} 설명: {text[:50]}...")
+
+
+# --------------------------------------------------------------------
+# 한 루프에서 동시 요청 수천 개 처리
+# --------------------------------------------------------------------
+async def serve_many(n_requests=1000, max_in_flight=200):
+    """
+    요청마다 태스크 하나. 스레드 없이 루프 하나가 모두 처리한다.
+    Semaphore로 동시에 나가는 API 요청 수를 제한한다. (rate limit / 커넥션 풀 크기에 맞춤)
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def handle(i):
+        async with semaphore:
+            return await chain.ainvoke({"topic": f"지층 {i}번"})
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(handle(i) for i in range(n_requests)), return_exceptions=True)
+    failed = sum(isinstance(r, Exception) for r in results)
+    elapsed = time.perf_counter() - start
+    print(f"요청 {n_requests}개 / 실패 {failed}개, {elapsed:.1f}초 ({n_requests / elapsed:.1f}건/초)")
+
+
+async def main():
+    # 잘못된 예: 루프 안에서 동기 호출 → 그동안 다른 모든 요청이 멈춘다.
+    async def blocking_handler():
+        time.sleep(0.3)           # requests.get(...), chain.invoke(...)도 마찬가지
+        # await asyncio.sleep(0.3)  # 올바른 예: 기다리는 동안 루프를 양보
+        # await asyncio.to_thread(time.sleep, 0.3)  # 바꿀 수 없는 동기 함수는 스레드로
+
+    async with BlockingCallDetector(threshold=0.1) as detector:
+        await blocking_handler()
+        await run_async()
+        # await serve_many(n_requests=1000, max_in_flight=200)
+    detector.report()
+
+
+asyncio.run(main())
@@ -1,6 +1,20 @@
+import asyncio
+import html
+import json
 import os
+import re
+import threading
+import time
+import unicodedata
 import requests
+import tiktoken
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
@@ -9,7 +23,6 @@ from langchain_core.runnables import RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import ToolMessage
 from langchain_openai import ChatOpenAI
-from langchain_community.tools import TavilySearchResults
 
 # load env
 load_dotenv()
@@ -27,6 +40,252 @@ naver_client_secret = os.getenv("NAVER_CLIENT_SECRET")
 # LLM이 필요시 자동으로 Tool을 호출하여 외부 기능(검색, 계산 등)을 사용
 # 
 # description을 상세히 작성해야 LLM이 이 함수를 언제 사용할지 알 수 있다.
+# ============================================================================
+
+# ============================================================================
+# 도구 런타임: 커넥션 풀 + 타임아웃 + 검색 결과 캐시
+# ============================================================================
+# 검색 도구는 에이전트가 답하기 전 매번 거치는 경로(critical path)다.
+# - requests.get()은 호출마다 새 TCP/TLS 연결을 맺는다. → 호스트별 Session을 공유해 연결을 재사용
+# - timeout이 없으면 응답 없는 서버에서 영원히 기다린다. → (연결, 읽기) 타임아웃 기본 적용
+# - 같은 검색어를 짧은 시간에 반복 검색한다. → 검색어를 정규화해 TTL 캐시
+#   동시에 들어온 같은 검색은 한 번만 호출하고 나머지는 그 결과를 기다린다. (single-flight)
+# - Tavily도 TavilySearchResults(내부에서 timeout 없는 requests.post) 대신 같은 풀로 /search API를 직접 호출
+# ============================================================================
+
+HTTP_TIMEOUT = (3.05, 10)  # (연결, 읽기) 초
+
+
+class HttpPool:
+    """
+    호스트별 requests.Session (커넥션 풀) 관리
+
+    pool_maxsize: 호스트당 유지할 최대 연결 수 (동시 요청 수에 맞춤)
+    timeout: 기본 (연결, 읽기) 타임아웃
+    retries: 연결 실패 / 502·503·504 응답 재시도 횟수 (GET만)
+    """
+
+    def __init__(self, pool_maxsize=16, timeout=HTTP_TIMEOUT, retries=2):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, url) -> requests.Session:
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                retry = Retry(total=self.retries, read=0, backoff_factor=0.3,
+                              status_forcelist=(502, 503, 504), allowed_methods={"GET"})
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+        return session
+
+    def get(self, url, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session(url).get(url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session(url).post(url, **kwargs)  # POST는 재시도하지 않는다. (Retry allowed_methods)
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 검색어 정규화: NFC, 소문자, 공백 정리 ("맥켈란  12년" == "맥켈란 12년")"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", query)).strip().lower()
+
+
+class SearchCache:
+    """
+    (도구 이름, 정규화된 검색어) → 결과 TTL 캐시 + single-flight
+
+    ttl: 결과 유지 시간(초)
+    maxsize: 최대 항목 수 (오래 안 쓴 것부터 제거)
+    """
+
+    def __init__(self, ttl=600, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._store = OrderedDict()  # key -> (만료 시각, 결과)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def get_or_fetch(self, tool_name, query, fetch):
+        key = (tool_name, normalize_query(query))
+        with self._lock:
+            entry = self._store.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._store.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fetch()
+        except Exception as e:  # 실패는 캐시하지 않는다.
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            self._store[key] = (time.monotonic() + self.ttl, result)
+            self._store.move_to_end(key)
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._store.clear()
+
+
+http_pool = HttpPool()
+search_cache = SearchCache(ttl=600)
+
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+
+def tavily_request(query: str, max_results=3) -> list[dict]:
+    """Tavily /search API 호출 (http_pool: 커넥션 재사용 + (연결, 읽기) 타임아웃)"""
+    response = http_pool.post(TAVILY_SEARCH_URL, json={
+        "api_key": os.getenv("TAVILY_API_KEY"),
+        "query": query,
+        "max_results": max_results,
+        "search_depth": "advanced",
+    })
+    response.raise_for_status()  # 오류 응답은 캐시하지 않도록 예외로
+    return response.json()["results"]
+
+
+# ============================================================================
+# 도구 결과 압축: LLM에 다시 넣기 전에 필요한 것만 남기기
+# ============================================================================
+# 도구 결과는 두 번째 LLM 호출의 프롬프트가 된다. 그대로 넣으면
+# - naver_search: 블로그 10개의 원본 JSON (태그, 블로거 정보, 링크 등 포함)
+# - tavily_search: 결과 dict 전체를 str()로 변환한 문자열
+# → 프롬프트 토큰이 몇 배로 늘어난다. (비용 + 지연 시간 증가)
+#
+# 1. 필드 추출: 제목 / 요약(snippet) / 날짜 / URL만 남긴다.
+# 2. HTML 제거: <b>맥켈란</b>, &quot; 같은 태그와 엔티티 정리
+# 3. 순위: 검색어와 겹치는 글자(2-gram)가 많은 결과부터
+# 4. 토큰 예산: 도구별 예산(TOOL_TOKEN_BUDGETS)을 넘기 전까지만 담고, 마지막 결과는 요약을 잘라서 맞춘다.
+#    (토큰 경계가 한글 글자 중간일 수 있으므로, 잘린 마지막 글자는 버린다)
+# 원본 토큰 수(통계용)는 원본 전체를 토큰화해야 하므로 기본은 바이트 수로 어림한다. (EXACT_RAW_TOKENS=1이면 정확히)
+# ============================================================================
+
+TOOL_TOKEN_BUDGETS = {"tavily_search": 700, "naver_search": 500}
+compaction_stats = {}  # 도구 이름 -> {"raw_tokens", "raw_exact", "compact_tokens", "results"} (마지막 호출)
+EXACT_RAW_TOKENS = os.getenv("EXACT_RAW_TOKENS", "0") == "1"
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    return tiktoken.encoding_for_model("gpt-4o-mini")
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def strip_html(text) -> str:
+    """HTML 태그/엔티티 제거 + 공백 정리"""
+    return re.sub(r"\s+", " ", html.unescape(TAG_PATTERN.sub("", text or ""))).strip()
+
+
+def naver_items(payload: str) -> list[dict]:
+    """네이버 블로그 검색 JSON → [{"title", "snippet", "date", "url"}]"""
+    items = []
+    for item in json.loads(payload).get("items", []):
+        date = item.get("postdate", "")  # YYYYMMDD
+        items.append({
+            "title": strip_html(item.get("title")),
+            "snippet": strip_html(item.get("description")),
+            "date": f"{date[:4]}-{date[4:6]}-{date[6:]}" if len(date) == 8 else date,
+            "url": item.get("link", ""),
+        })
+    return items
+
+
+def tavily_items(results) -> list[dict]:
+    """Tavily 결과 리스트 → [{"title", "snippet", "date", "url"}] (오류 문자열이면 빈 리스트)"""
+    if not isinstance(results, list):
+        return []
+    return [
+        {
+            "title": strip_html(r.get("title")),
+            "snippet": strip_html(r.get("content")),
+            "date": r.get("published_date") or "",
+            "url": r.get("url", ""),
+        }
+        for r in results if isinstance(r, dict)
+    ]
+
+
+def _bigrams(text: str) -> set:
+    text = normalize_query(text).replace(" ", "")
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def relevance(query: str, item: dict) -> float:
+    """검색어 2-gram 중 제목/요약에 나오는 비율 (제목은 2배 가중)"""
+    terms = _bigrams(query)
+    if not terms:
+        return 0.0
+    return (2 * len(terms & _bigrams(item["title"])) + len(terms & _bigrams(item["snippet"]))) / (3 * len(terms))
+
+
+def compact_results(items, query, token_budget) -> str:
+    """관련도 순으로 정렬해 token_budget 안에 들어가는 만큼만 "[n] 제목 (날짜)\n요약\nURL" 형식으로"""
+    ranked = sorted(items, key=lambda item: relevance(query, item), reverse=True)
+    blocks, used = [], 0
+    for item in ranked:
+        header = f"[{len(blocks) + 1}] {item['title']}" + (f" ({item['date']})" if item["date"] else "")
+        block = f"{header}\n{item['snippet']}\n{item['url']}"
+        tokens = count_tokens(block) + 1  # 구분 줄바꿈
+        if used + tokens > token_budget:
+            # 남은 예산이 충분하면 요약을 잘라서 하나 더 넣는다.
+            room = token_budget - used - count_tokens(f"{header}\n...\n{item['url']}") - 1
+            if room >= 30:
+                encoding = get_encoding()
+                tokens = encoding.encode(item["snippet"], disallowed_special=())[:room]
+                # 바이트로 디코딩해 끝에 걸친 불완전한 글자만 버린다. (decode()는 U+FFFD로 바꿔 넣는다)
+                snippet = encoding.decode_bytes(tokens).decode("utf-8", errors="ignore").rstrip()
+                blocks.append(f"{header}\n{snippet}...\n{item['url']}")
+            break
+        blocks.append(block)
+        used += tokens
+    return "\n\n".join(blocks) if blocks else "검색 결과가 없습니다."
+
+
+def _compact(tool_name, raw_text, items, query) -> str:
+    text = compact_results(items, query, TOOL_TOKEN_BUDGETS[tool_name])
+    # 원본은 버릴 데이터라 통계를 위해 전부 토큰화하지 않는다. (UTF-8 약 4바이트 = 1토큰으로 어림)
+    raw_tokens = count_tokens(raw_text) if EXACT_RAW_TOKENS else len(raw_text.encode("utf-8")) // 4
+    compaction_stats[tool_name] = {
+        "raw_tokens": raw_tokens, "raw_exact": EXACT_RAW_TOKENS,
+        "compact_tokens": count_tokens(text), "results": len(items),
+    }
+    return text
+
+
 # ============================================================================
 # 도구 함수 정의
 # ============================================================================
@@ -36,22 +295,18 @@ def tavily_search(query: str) -> str:
     # 아래 부분이 description으로 LLM에 전달된다.
     """
     Search the web for information using Tavily search engine.
-    Returns search results as a formatted string.
+    Returns the most relevant results (title, snippet, date, url) as text.
     Use web search in English.    
     """
-    tavily_api_key = os.getenv("TAVILY_API_KEY")
-    tavily_client = TavilySearchResults(api_key=tavily_api_key, max_results=3)
-    results = tavily_client.invoke(query)
-    # 리스트를 문자열로 변환
-    if isinstance(results, list):
-        return "\n\n".join([str(result) for result in results])
-    return str(results)
+    results = search_cache.get_or_fetch("tavily_search", query, lambda: tavily_request(query))
+    raw_text = "\n\n".join([str(result) for result in results])
+    return _compact("tavily_search", raw_text, tavily_items(results), query)
 
 @tool
 def naver_search(query: str) -> str:
     """
     Search the web for information using Naver search API.
-    Returns blog search results as JSON string.
+    Returns the most relevant blog posts (title, snippet, date, url) as text.
     """
     url = "https://openapi.naver.com/v1/search/blog.json"
     naver_client_id = os.getenv("NAVER_CLIENT_ID")
@@ -65,9 +320,119 @@ def naver_search(query: str) -> str:
         "display": 10,
         "start": 1,
     }
-    response = requests.get(url, headers=headers, params=params)
-    return response.text
 
+    def fetch():
+        response = http_pool.get(url, headers=headers, params=params)
+        response.raise_for_status()  # 오류 응답은 캐시하지 않도록 예외로
+        return response.text
+
+    payload = search_cache.get_or_fetch("naver_search", query, fetch)
+    return _compact("naver_search", payload, naver_items(payload), query)
+
+
+
+# ============================================================================
+# 도구 실행기: 여러 도구 호출을 동시에 실행
+# ============================================================================
+# LLM이 한 번에 여러 도구(tavily_search + naver_search)를 요청하면 서로 독립적이다.
+# 하나씩 실행하면 전체 시간 = 도구 시간의 합 → 동시에 실행하면 가장 느린 도구의 시간
+# - 동기 실행(execute): 스레드 풀
+# - 비동기 실행(aexecute): asyncio.gather
+# - 도구별 timeout: 넘으면 기다리지 않고 "시간 초과" ToolMessage로 대신한다. (LLM이 나머지 결과로 답하도록)
+#   시간은 호출마다 실제로 실행을 시작한 시각부터 잰다. (스레드 풀에서 기다린 시간은 빼고)
+#   (스레드는 강제로 멈출 수 없으므로 초과된 호출은 백그라운드에서 끝날 때까지 실행된다)
+# - 결과 ToolMessage는 완료 순서와 관계없이 tool_calls 순서대로 만든다.
+# ============================================================================
+
+class ToolExecutor:
+    """
+    tool_calls → ToolMessage 리스트 (병렬 실행)
+
+    tools: 도구 리스트
+    timeouts: 도구 이름 → 제한 시간(초)
+    default_timeout: timeouts에 없는 도구의 제한 시간(초)
+    max_workers: 동시에 실행할 최대 도구 수 (스레드 풀 크기)
+    """
+
+    def __init__(self, tools, timeouts=None, default_timeout=15.0, max_workers=8):
+        self.tools = {t.name: t for t in tools}
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self.last_timings = []  # [(도구 이름, 초, 상태)] - 마지막 실행
+
+    def _timeout(self, name):
+        return self.timeouts.get(name, self.default_timeout)
+
+    def _message(self, tool_call, content, status="success"):
+        return ToolMessage(content=str(content), tool_call_id=tool_call["id"], name=tool_call["name"], status=status)
+
+    def _invoke_timed(self, name, args, started):
+        started.set_result(time.perf_counter())  # 풀에서 대기한 시간은 제한 시간에 넣지 않는다.
+        return self.tools[name].invoke(args), time.perf_counter() - started.result()
+
+    def execute(self, tool_calls) -> list[ToolMessage]:
+        calls = []
+        for call in tool_calls:
+            if call["name"] not in self.tools:
+                calls.append((call, None, None))
+                continue
+            started = Future()  # 실제로 실행을 시작한 시각
+            calls.append((call, started, self._pool.submit(self._invoke_timed, call["name"], call["args"], started)))
+        submitted_at = time.perf_counter()
+        messages, timings = [], []
+        for call, started, future in calls:
+            if future is None:
+                messages.append(self._message(call, f"도구 {call['name']}를 실행할 수 없습니다.", "error"))
+                timings.append((call["name"], 0.0, "unknown"))
+                continue
+            # 제한 시간은 호출마다 실제로 시작한 시각부터 잰다. (max_workers보다 많으면 일부는 풀에서 기다린다)
+            # 단, 풀이 (이전에 시간 초과된 채 계속 도는) 호출로 가득 차 있을 수 있으므로 대기도 제한 시간까지만 한다.
+            try:
+                queue_wait = self._timeout(call["name"]) - (time.perf_counter() - submitted_at)
+                started_at = started.result(timeout=max(queue_wait, 0))
+            except FutureTimeoutError:
+                if future.cancel():  # 아직 시작 전이면 취소 (그 사이 시작했다면 아래에서 평소처럼 기다린다)
+                    content = f"도구 {call['name']} 시간 초과 (실행 대기 중, {self._timeout(call['name'])}초)"
+                    messages.append(self._message(call, content, "error"))
+                    timings.append((call["name"], time.perf_counter() - submitted_at, "timeout"))
+                    continue
+                started_at = started.result()
+            remaining = self._timeout(call["name"]) - (time.perf_counter() - started_at)
+            try:
+                result, elapsed = future.result(timeout=max(remaining, 0))
+                messages.append(self._message(call, result))
+                status = "ok"
+            except FutureTimeoutError:
+                messages.append(self._message(call, f"도구 {call['name']} 시간 초과 ({self._timeout(call['name'])}초)", "error"))
+                elapsed, status = time.perf_counter() - started_at, "timeout"
+            except Exception as e:
+                messages.append(self._message(call, f"도구 {call['name']} 실행 오류: {e}", "error"))
+                elapsed, status = time.perf_counter() - started_at, "error"
+            timings.append((call["name"], elapsed, status))
+        self.last_timings = timings
+        return messages
+
+    async def aexecute(self, tool_calls) -> list[ToolMessage]:
+        async def _run(call):
+            started = time.perf_counter()
+            if call["name"] not in self.tools:
+                return self._message(call, f"도구 {call['name']}를 실행할 수 없습니다.", "error"), 0.0, "unknown"
+            task = asyncio.ensure_future(self.tools[call["name"]].ainvoke(call["args"]))
+            # wait_for와 달리 취소가 끝날 때까지 기다리지 않는다. (스레드에서 도는 동기 도구도 바로 반환)
+            done, _ = await asyncio.wait({task}, timeout=self._timeout(call["name"]))
+            if not done:
+                task.cancel()
+                content = f"도구 {call['name']} 시간 초과 ({self._timeout(call['name'])}초)"
+                return self._message(call, content, "error"), time.perf_counter() - started, "timeout"
+            try:
+                return self._message(call, task.result()), time.perf_counter() - started, "ok"
+            except Exception as e:
+                return self._message(call, f"도구 {call['name']} 실행 오류: {e}", "error"), time.perf_counter() - started, "error"
+
+        results = await asyncio.gather(*(_run(call) for call in tool_calls))  # gather는 입력 순서대로 반환
+        self.last_timings = [(call["name"], elapsed, status) for call, (_, elapsed, status) in zip(tool_calls, results)]
+        return [message for message, _, _ in results]
 
 
 # 러너블람다 사용하기
@@ -100,6 +465,7 @@ tools_dict = {
 }
 
 llm_with_tools = chat_llm.bind_tools([tavily_search, naver_search])
+tool_executor = ToolExecutor(list(tools_dict.values()), timeouts={"tavily_search": 20, "naver_search": 10})
 
 # 도구 호출 전에 먼저 LLM 응답 확인
 messages = prompt.format_messages(user_input=query, today_date=today_date)
@@ -118,35 +484,17 @@ if hasattr(llm_response, 'tool_calls') and llm_response.tool_calls:
         print(f"\n  {i}. 도구: {tool_call['name']}")
         print(f"     검색어: {tool_call['args'].get('query', tool_call['args'])}")
     
-    # 도구 실행
+    # 도구 실행 (동시에 실행, 결과는 tool_calls 순서대로 ToolMessage로)
     print("\n🔍 웹 검색 실행 중...")
-    tool_results = []
-    
-    for tool_call in llm_response.tool_calls:
-        tool_name = tool_call['name']
-        tool_args = tool_call['args']  # 도구 호출 인자 (딕셔너리)
-        
-        # 도구 객체의 invoke() 메서드 사용
-        if tool_name in tools_dict:
-            tool_obj = tools_dict[tool_name]
-            # 도구 객체에 인자 전달 (딕셔너리 형태)
-            search_result = tool_obj.invoke(tool_args)
-            tool_results.append(search_result)
-            print(f"  ✓ {tool_name} 검색 완료")
-        else:
-            print(f"  ✗ 알 수 없는 도구: {tool_name}")
-            tool_results.append(f"도구 {tool_name}를 실행할 수 없습니다.")
-    
-    # 도구 결과를 포함하여 다시 LLM 호출
-    # 도구 결과를 메시지에 추가
-    tool_messages = []
-    for tool_call, tool_result in zip(llm_response.tool_calls, tool_results):
-        tool_messages.append(
-            ToolMessage(
-                content=str(tool_result),
-                tool_call_id=tool_call['id']
-            )
-        )
+    tool_messages = tool_executor.execute(llm_response.tool_calls)
+    # 비동기 코드에서는: tool_messages = await tool_executor.aexecute(llm_response.tool_calls)
+    for tool_name, elapsed, status in tool_executor.last_timings:
+        mark = "✓" if status == "ok" else "✗"
+        print(f"  {mark} {tool_name} {status} ({elapsed:.2f}초)")
+    print(f"  검색 캐시: {search_cache.stats}")
+    for tool_name, stats in compaction_stats.items():
+        raw = f"{stats['raw_tokens']}" if stats["raw_exact"] else f"~{stats['raw_tokens']}"
+        print(f"  ✂️ {tool_name}: {raw} → {stats['compact_tokens']} 토큰 (결과 {stats['results']}개)")
     
     # LLM에 원본 메시지 + 도구 결과 전달
     final_messages = messages + [llm_response] + tool_messages
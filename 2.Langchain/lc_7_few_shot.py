@@ -1,7 +1,8 @@
 import os
+import sys
+from pathlib import Path
 
 from dotenv import load_dotenv
-from langchain_community.vectorstores import Chroma
 from langchain_core.example_selectors import SemanticSimilarityExampleSelector
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate, FewShotPromptTemplate, ChatPromptTemplate, \
@@ -9,6 +10,8 @@ from langchain_core.prompts import PromptTemplate, FewShotPromptTemplate, ChatPr
 from langchain_openai import ChatOpenAI
 from langchain_openai import OpenAIEmbeddings
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "3.RAG"))
+from rag_13_chroma_manager import ChromaManager, PERSIST_DIRECTORY
 
 # load env
 load_dotenv()
@@ -181,7 +184,20 @@ examples3 = [
 # 벡터 저장소 생성
 to_vectorize = [" ".join(example.values()) for example in examples3]
 embeddings = OpenAIEmbeddings()
-vectorstore = Chroma.from_texts(to_vectorize, embeddings, metadatas=examples3)
+# vectorstore = Chroma.from_texts(to_vectorize, embeddings, metadatas=examples3)  # 실행할 때마다 메모리에 새로 만들고 다시 임베딩
+
+# 디스크에 저장된 컬렉션을 열고, 아직 없는 예제만 임베딩해 추가한다. (3.RAG/rag_13_chroma_manager.py 참고)
+chroma_manager = ChromaManager(PERSIST_DIRECTORY, embeddings)
+chroma_manager.add_missing_texts("few_shot_examples", to_vectorize, metadatas=examples3)
+vectorstore = chroma_manager.get("few_shot_examples")
+
+# 예제가 수만 개 이상으로 늘어나면 Chroma 대신 IVF-PQ 근사 검색 VectorStore로 바꿀 수 있다.
+# (인터페이스가 같으므로 아래 SemanticSimilarityExampleSelector 코드는 그대로 사용, 3.RAG/rag_4_ann_index.py 참고)
+# from rag_4_ann_index import IVFPQVectorStore
+# vectorstore = IVFPQVectorStore.from_texts(to_vectorize, embeddings, metadatas=examples3)
+# 메모리가 문제라면 압축 벡터(int8: 1/4, binary: 1/32) + 원본 재계산 VectorStore (3.RAG/rag_14_quantized_vectors.py 참고)
+# from rag_14_quantized_vectors import QuantizedVectorStore
+# vectorstore = QuantizedVectorStore.from_texts(to_vectorize, embeddings, metadatas=examples3, codec="int8")
 
 # 예제 선택기 생성
 example_selector3 = SemanticSimilarityExampleSelector(
@@ -0,0 +1,406 @@
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from rag_1_hybrid_retriever import DATA_DIR
+from rag_5_incremental_indexer import file_sha256
+
+# ============================================================================
+# Loader Farm: 여러 형식의 문서를 프로세스 풀에서 병렬로 읽기
+# ============================================================================
+# 수천 개의 PDF/DOCX/XLSX/PPTX/HWP 파일을 한 프로세스에서 순서대로 읽으면
+# - CPU 코어 하나만 쓰고,
+# - 깨진 HWP 하나가 무한 루프에 빠지거나 메모리를 다 먹으면 전체 작업이 멈춘다.
+#
+# 1. 형식별 로더: 확장자 → 로더 함수 (LOADERS). 모르는 형식은 unstructured로 읽는다.
+# 2. 워커 프로세스: workers개의 프로세스가 파일을 하나씩 받아 읽는다.
+#    워커마다 전용 Pipe를 쓰므로, 워커 하나를 강제 종료해도 다른 워커의 통신은 깨지지 않는다.
+# 3. 파일별 제한
+#    - 시간: timeout초를 넘긴 워커는 kill하고 새 워커로 교체한다.
+#    - 메모리: 워커 시작 시 resource.setrlimit(RLIMIT_AS)로 주소 공간을 제한한다. (Linux)
+#      한도를 넘으면 해당 파일만 MemoryError로 실패한다.
+# 4. 스트리밍: 파일이 끝나는 대로 Document를 yield한다. (전체가 끝날 때까지 기다리지 않음)
+# 5. 캐시: 파일 sha256 → 추출 결과(JSONL). 같은 내용의 파일은 다시 파싱하지 않는다.
+# 6. 리포트: 형식별 파일 수 / 문서 수 / 실패 / 처리량(MB/s)
+# ============================================================================
+
+
+# ============================================================================
+# 형식별 로더 (워커 프로세스 안에서 실행, 무거운 라이브러리는 필요할 때만 import)
+# ============================================================================
+
+def load_pdf(path: Path) -> list[Document]:
+    import pymupdf
+
+    with pymupdf.open(path) as pdf:
+        return [
+            Document(page_content=text, metadata={"page": i + 1})
+            for i, page in enumerate(pdf)
+            if (text := page.get_text().strip())
+        ]
+
+
+def load_docx(path: Path) -> list[Document]:
+    import docx
+
+    document = docx.Document(str(path))
+    lines = [p.text for p in document.paragraphs if p.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            lines.append("\t".join(cell.text.strip() for cell in row.cells))
+    return [Document(page_content="\n".join(lines))]
+
+
+def load_xlsx(path: Path) -> list[Document]:
+    # 대용량/암호화 엑셀은 rag_12_excel_stream.py 참고 (read-only 스트리밍, 200행 단위 Document)
+    from rag_12_excel_stream import iter_documents
+
+    return [Document(page_content=doc.page_content, metadata={"sheet": doc.metadata["sheet"],
+                                                              "row_start": doc.metadata["row_start"]})
+            for doc in iter_documents(path)]
+
+
+def load_pptx(path: Path) -> list[Document]:
+    from pptx import Presentation
+
+    documents = []
+    for i, slide in enumerate(Presentation(str(path)).slides):
+        texts = [shape.text_frame.text for shape in slide.shapes if shape.has_text_frame and shape.text_frame.text.strip()]
+        if texts:
+            documents.append(Document(page_content="\n".join(texts), metadata={"slide": i + 1}))
+    return documents
+
+
+HWPTAG_PARA_TEXT = 67
+# HWP 본문의 제어 문자: 0, 10, 13, 24~31은 1글자, 나머지(1~31)는 8글자(16바이트)를 차지한다.
+HWP_CHAR_CONTROLS = {0, 10, 13, *range(24, 32)}
+
+
+def _hwp_para_text(data: bytes) -> str:
+    # 글자 단위(chr)로 바꾸면 보조 평면 문자(이모지, 일부 한자)가 서로게이트 쌍으로 쪼개지므로
+    # UTF-16 바이트를 모아 한 번에 디코딩한다.
+    text = bytearray()
+    i = 0
+    while i + 1 < len(data):
+        code = data[i] | (data[i + 1] << 8)
+        if code >= 32:
+            text += data[i:i + 2]
+            i += 2
+        elif code in HWP_CHAR_CONTROLS:
+            if code in (10, 13):
+                text += "\n".encode("utf-16-le")
+            i += 2
+        else:
+            if code == 9:
+                text += "\t".encode("utf-16-le")
+            i += 16
+    return text.decode("utf-16-le", errors="replace")
+
+
+def _hwp_section_text(data: bytes) -> str:
+    """BodyText/Section 레코드 스트림에서 문단 텍스트(HWPTAG_PARA_TEXT)만 꺼낸다."""
+    paragraphs = []
+    offset = 0
+    while offset + 4 <= len(data):
+        header, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        tag, size = header & 0x3FF, (header >> 20) & 0xFFF
+        if size == 0xFFF:
+            size, = struct.unpack_from("<I", data, offset)
+            offset += 4
+        if tag == HWPTAG_PARA_TEXT:
+            paragraphs.append(_hwp_para_text(data[offset:offset + size]).strip())
+        offset += size
+    return "\n".join(p for p in paragraphs if p)
+
+
+def load_hwp(path: Path) -> list[Document]:
+    """
+    HWP 5.0 (OLE 복합 문서)
+    본문(BodyText/SectionN)을 읽고, 배포용/암호화 문서라 본문을 못 읽으면 미리보기(PrvText)로 대신한다.
+    """
+    import olefile
+
+    with olefile.OleFileIO(str(path)) as ole:
+        properties, = struct.unpack_from("<I", ole.openstream("FileHeader").read(), 36)
+        compressed, encrypted = bool(properties & 0x1), bool(properties & 0x2)
+        sections = sorted(
+            (entry for entry in ole.listdir() if entry[0] == "BodyText" and entry[1].startswith("Section")),
+            key=lambda entry: int(entry[1][len("Section"):]),
+        )
+        documents = []
+        if not encrypted:
+            for entry in sections:
+                data = ole.openstream(entry).read()
+                if compressed:
+                    data = zlib.decompress(data, -15)
+                text = _hwp_section_text(data)
+                if text:
+                    documents.append(Document(page_content=text, metadata={"section": int(entry[1][len("Section"):])}))
+        if not documents and ole.exists("PrvText"):
+            text = ole.openstream("PrvText").read().decode("utf-16-le", errors="ignore").strip()
+            documents.append(Document(page_content=text, metadata={"preview": True}))
+        return documents
+
+
+def load_text(path: Path) -> list[Document]:
+    raw = path.read_bytes()
+    for encoding in ("utf-8", "cp949"):  # 공공데이터 CSV는 cp949인 경우가 많다.
+        try:
+            return [Document(page_content=raw.decode(encoding))]
+        except UnicodeDecodeError:
+            continue
+    return [Document(page_content=raw.decode("utf-8", errors="replace"))]
+
+
+def load_unstructured(path: Path) -> list[Document]:
+    from unstructured.partition.auto import partition
+
+    text = "\n\n".join(str(element) for element in partition(filename=str(path)))
+    return [Document(page_content=text)] if text.strip() else []
+
+
+LOADERS = {
+    ".pdf": load_pdf,
+    ".docx": load_docx,
+    ".xlsx": load_xlsx,
+    ".xlsm": load_xlsx,
+    ".pptx": load_pptx,
+    ".hwp": load_hwp,
+    ".txt": load_text,
+    ".md": load_text,
+    ".csv": load_text,
+    ".tsv": load_text,
+}
+
+
+# ============================================================================
+# 워커 프로세스
+# ============================================================================
+
+def _limit_memory(memory_limit_mb) -> None:
+    if memory_limit_mb is None:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows에는 resource 모듈이 없다. (시간 제한만 적용)
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _worker(conn, memory_limit_mb) -> None:
+    """Pipe로 파일 경로를 받아 (상태, 결과, 소요 시간)을 돌려준다. None을 받으면 종료한다."""
+    _limit_memory(memory_limit_mb)
+    while True:
+        path = conn.recv()
+        if path is None:
+            break
+        start = time.perf_counter()
+        try:
+            loader = LOADERS.get(path.suffix.lower(), load_unstructured)
+            records = [(doc.page_content, doc.metadata) for doc in loader(path)]
+            conn.send(("ok", records, time.perf_counter() - start))
+        except MemoryError:
+            conn.send(("error", "MemoryError: 메모리 한도 초과", time.perf_counter() - start))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", time.perf_counter() - start))
+
+
+class LoaderFarm:
+    """
+    프로세스 풀 기반 다형식 문서 로더
+
+    workers: 워커 프로세스 수
+    timeout: 파일당 최대 처리 시간 (초)
+    memory_limit_mb: 워커당 최대 주소 공간 (MB, None이면 제한 없음)
+    cache_dir: 추출 결과 캐시 디렉토리 (None이면 캐시 안 함)
+    """
+
+    def __init__(self, workers=None, timeout=60.0, memory_limit_mb=2048, cache_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.failures = []
+        self.stats = {}
+
+    # ------------------------------------------------------------------
+    # 캐시
+    # ------------------------------------------------------------------
+    def _cache_path(self, file_hash: str):
+        return self.cache_dir / f"{file_hash}.jsonl" if self.cache_dir else None
+
+    def _read_cache(self, file_hash: str):
+        cache_path = self._cache_path(file_hash)
+        if cache_path is None or not cache_path.exists():
+            return None
+        with open(cache_path, encoding="utf-8") as f:
+            return [tuple(json.loads(line)) for line in f]
+
+    def _write_cache(self, file_hash: str, records) -> None:
+        cache_path = self._cache_path(file_hash)
+        if cache_path is None:
+            return
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, cache_path)
+
+    # ------------------------------------------------------------------
+    # 통계
+    # ------------------------------------------------------------------
+    def _record(self, path: Path, status: str, n_docs=0, seconds=0.0) -> None:
+        row = self.stats.setdefault(path.suffix.lower() or "(none)", {
+            "files": 0, "documents": 0, "bytes": 0, "seconds": 0.0,
+            "cached": 0, "errors": 0, "timeouts": 0,
+        })
+        row["files"] += 1
+        row["documents"] += n_docs
+        row["bytes"] += path.stat().st_size
+        row["seconds"] += seconds
+        if status in ("cached", "timeouts", "errors"):
+            row[status] += 1
+
+    def report(self) -> dict:
+        """형식별 통계 + 처리량(MB/s, 워커 처리 시간 기준)"""
+        return {
+            suffix: {**row, "mb_per_s": row["bytes"] / 1e6 / row["seconds"] if row["seconds"] else None}
+            for suffix, row in sorted(self.stats.items())
+        }
+
+    # ------------------------------------------------------------------
+    # 실행
+    # ------------------------------------------------------------------
+    def _spawn(self):
+        parent_conn, child_conn = Pipe()
+        process = Process(target=_worker, args=(child_conn, self.memory_limit_mb), daemon=True)
+        process.start()
+        child_conn.close()
+        return {"process": process, "conn": parent_conn, "task": None, "started": 0.0}
+
+    @staticmethod
+    def _to_documents(path: Path, file_hash: str, records) -> list[Document]:
+        return [
+            Document(page_content=content, metadata={"source": path.name, "path": str(path),
+                                                     "file_hash": file_hash, **metadata})
+            for content, metadata in records
+        ]
+
+    def iter_documents(self, paths):
+        """
+        파일들을 병렬로 읽으며, 파일 하나가 끝날 때마다 그 파일의 Document들을 yield한다.
+        (순서는 완료 순서. 실패한 파일은 self.failures에 (경로, 사유)로 남는다)
+        """
+        # 해시는 파일을 워커에 넘기기 직전에 계산한다. (전체 해시가 끝날 때까지 파싱이 밀리지 않도록)
+        pending = list(map(Path, paths))
+        pending.reverse()  # pop()으로 입력 순서대로 꺼내기 위해
+
+        slots = []
+        try:
+            while pending or any(slot["task"] for slot in slots):
+                while pending:
+                    idle = next((slot for slot in slots if slot["task"] is None), None)
+                    if idle is None and len(slots) >= self.workers:
+                        break
+                    path = pending.pop()
+                    try:
+                        file_hash = file_sha256(path)
+                        cached = self._read_cache(file_hash)
+                    except Exception as e:  # 읽을 수 없는 파일, 깨진 캐시 등
+                        self.failures.append((str(path), f"{type(e).__name__}: {e}"))
+                        continue
+                    if cached is not None:
+                        self._record(path, "cached", len(cached))
+                        yield from self._to_documents(path, file_hash, cached)
+                        continue
+                    if idle is None:
+                        idle = self._spawn()
+                        slots.append(idle)
+                    idle["task"] = (path, file_hash)
+                    idle["started"] = time.perf_counter()
+                    idle["conn"].send(path)
+
+                busy = {slot["conn"]: slot for slot in slots if slot["task"]}
+                for conn in wait(list(busy), timeout=0.1):
+                    slot = busy[conn]
+                    path, file_hash = slot["task"]
+                    slot["task"] = None
+                    try:
+                        status, payload, seconds = conn.recv()
+                    except EOFError:  # 워커가 죽음 (OOM killer, segfault 등)
+                        status, payload, seconds = "error", "워커 프로세스 비정상 종료", time.perf_counter() - slot["started"]
+                        slot["process"].join()
+                        conn.close()
+                        slot.update(self._spawn())
+                    if status == "ok":
+                        try:
+                            self._write_cache(file_hash, payload)
+                            documents = self._to_documents(path, file_hash, payload)
+                        except Exception as e:  # 캐시 쓰기/변환 실패는 이 파일만 실패로 처리
+                            status, payload = "error", f"{type(e).__name__}: {e}"
+                        else:
+                            self._record(path, "ok", len(payload), seconds)
+                            yield from documents
+                    if status != "ok":
+                        self._record(path, "errors", seconds=seconds)
+                        self.failures.append((str(path), payload))
+
+                # 시간 초과한 워커는 강제 종료하고 새 워커로 교체한다.
+                now = time.perf_counter()
+                for slot in slots:
+                    if slot["task"] and now - slot["started"] > self.timeout:
+                        path, _ = slot["task"]
+                        slot["process"].kill()
+                        slot["process"].join()
+                        slot["conn"].close()
+                        self._record(path, "timeouts", seconds=now - slot["started"])
+                        self.failures.append((str(path), f"timeout ({self.timeout}s)"))
+                        slot.update(self._spawn())
+        finally:
+            for slot in slots:
+                if slot["task"] is None and slot["process"].is_alive():
+                    slot["conn"].send(None)
+                else:
+                    slot["process"].kill()
+                slot["process"].join(timeout=1)
+                slot["conn"].close()
+
+    def load(self, paths) -> list[Document]:
+        return list(self.iter_documents(paths))
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    input_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else DATA_DIR
+    paths = sorted(p for p in input_dir.rglob("*") if p.is_file())
+    cache_dir = Path(__file__).resolve().parent / ".index" / "loader_cache"
+
+    for attempt in ("첫 실행", "캐시 재실행"):
+        farm = LoaderFarm(timeout=30, memory_limit_mb=2048, cache_dir=cache_dir)
+        start = time.perf_counter()
+        n_docs = 0
+        for doc in farm.iter_documents(paths):
+            n_docs += 1
+            if attempt == "첫 실행" and n_docs <= 3:
+                print(f"  📄 {doc.metadata['source']} {doc.page_content[:40]!r}...")
+        print(f"\n⚙️ {attempt}: 파일 {len(paths)}개 → 문서 {n_docs}개 ({time.perf_counter() - start:.2f}초)")
+        for suffix, row in farm.report().items():
+            throughput = f"{row['mb_per_s']:.1f}MB/s" if row["mb_per_s"] else "-"
+            print(f"  {suffix:<6} 파일 {row['files']:>4} 문서 {row['documents']:>5} 캐시 {row['cached']:>4} "
+                  f"실패 {row['errors']} 시간초과 {row['timeouts']} {throughput}")
+        for path, reason in farm.failures:
+            print(f"  ❌ {Path(path).name}: {reason}")
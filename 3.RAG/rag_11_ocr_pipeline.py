@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from rag_1_hybrid_retriever import DATA_DIR
+
+# ============================================================================
+# OCR Pipeline: 텍스트 레이어가 없는 페이지만 골라 OCR 하기
+# ============================================================================
+# OCR(Tesseract)은 페이지당 수 초가 걸려, 텍스트 추출(페이지당 수 ms)보다 수백~수천 배 느리다.
+# 스캔본이 섞인 PDF 전체를 OCR 하는 대신
+#
+# 1. 페이지 분류 (pymupdf, 렌더링 없이)
+#    - 텍스트 레이어가 충분하면   → get_text() 결과를 그대로 사용 (OCR 안 함)
+#    - 텍스트도 이미지도 없으면   → 빈 페이지로 건너뜀
+#    - 그 외(스캔 이미지 페이지)  → OCR 대상
+# 2. 적응형 DPI: 페이지에 들어있는 스캔 이미지의 원본 해상도에 맞춰 렌더링한다.
+#    (원본보다 높은 DPI는 시간만 늘고 인식률은 그대로) min_dpi~max_dpi, 최대 픽셀 수로 제한
+# 3. 병렬 처리: 제한된 크기의 프로세스 풀에서 렌더링 + Tesseract를 실행한다.
+#    Tesseract 내부 스레드(OpenMP)는 1개로 제한해 워커끼리 CPU를 뺏지 않게 한다.
+# 4. 캐시: 페이지 내용(콘텐츠 스트림 + 이미지 원본 바이트) 해시 → OCR 결과.
+#    같은 페이지는 다른 파일에 들어 있어도 다시 OCR 하지 않는다.
+#
+# 렌더링은 pdf2image(poppler 필요) 대신 이미 사용 중인 pymupdf로 한다.
+# HWP는 먼저 PDF로 변환한 뒤 이 파이프라인에 넣는다. (변환은 한글 프로그램 필요, 범위 밖)
+# ============================================================================
+
+
+def page_image_dpi(page) -> float | None:
+    """페이지에 그려진 이미지들의 실제 해상도(DPI) 중 최댓값. 이미지가 없으면 None"""
+    best = None
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        if x1 - x0 <= 0 or y1 - y0 <= 0:
+            continue
+        # bbox는 포인트(1/72인치) 단위
+        dpi = max(info["width"] / ((x1 - x0) / 72), info["height"] / ((y1 - y0) / 72))
+        best = dpi if best is None else max(best, dpi)
+    return best
+
+
+def page_hash(doc, page) -> str:
+    """렌더링 없이 페이지 내용을 해시한다. (콘텐츠 스트림 + 이미지 원본 바이트)"""
+    digest = hashlib.sha256(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=4)
+def _open_pdf(path: str):
+    import pymupdf
+
+    return pymupdf.open(path)
+
+
+def _ocr_page(path: str, page_number: int, dpi: int, lang: str) -> tuple[str, float]:
+    """(워커 프로세스) 페이지를 흑백으로 렌더링해 Tesseract로 인식한다."""
+    import pytesseract
+    from PIL import Image
+
+    start = time.perf_counter()
+    page = _open_pdf(path)[page_number]
+    pixmap = page.get_pixmap(dpi=dpi, colorspace="gray")
+    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+    text = pytesseract.image_to_string(image, lang=lang)
+    return text.strip(), time.perf_counter() - start
+
+
+def _init_worker() -> None:
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+class OCRPipeline:
+    """
+    텍스트 레이어 우선 + 필요한 페이지만 OCR 하는 PDF 파이프라인
+
+    lang: Tesseract 언어 (한국어 + 영어: "kor+eng")
+    workers: OCR 프로세스 수
+    min_text_chars: 텍스트 레이어로 인정할 최소 글자 수
+    min_dpi, max_dpi, default_dpi: 렌더링 DPI 범위 / 이미지 해상도를 알 수 없을 때의 DPI
+    max_pixels: 렌더링 이미지 최대 픽셀 수 (큰 도면 페이지의 메모리 폭주 방지)
+    cache_dir: OCR 결과 캐시 디렉토리 (None이면 캐시 안 함)
+    """
+
+    def __init__(self, lang="kor+eng", workers=None, min_text_chars=30, min_dpi=150, max_dpi=400,
+                 default_dpi=300, max_pixels=40_000_000, cache_dir=None):
+        self.lang = lang
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.min_text_chars = min_text_chars
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.default_dpi = default_dpi
+        self.max_pixels = max_pixels
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.stats = {}
+        self.failures = []
+
+    def _choose_dpi(self, page, image_dpi) -> int:
+        dpi = min(self.max_dpi, max(self.min_dpi, image_dpi or self.default_dpi))
+        # 픽셀 수 = (가로 인치 * dpi) * (세로 인치 * dpi) <= max_pixels
+        area_inch2 = (page.rect.width / 72) * (page.rect.height / 72)
+        dpi = min(dpi, (self.max_pixels / area_inch2) ** 0.5)
+        return int(dpi)
+
+    def _cache_path(self, key: str):
+        return self.cache_dir / f"{key}.json" if self.cache_dir else None
+
+    def _read_cache(self, key: str):
+        cache_path = self._cache_path(key)
+        if cache_path is None or not cache_path.exists():
+            return None
+        return json.loads(cache_path.read_text(encoding="utf-8"))["text"]
+
+    def _write_cache(self, key: str, text: str) -> None:
+        cache_path = self._cache_path(key)
+        if cache_path is None:
+            return
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"text": text}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, cache_path)
+
+    def _classify(self, path: Path) -> list[dict]:
+        """모든 페이지를 text / blank / cache / ocr 로 분류한다. (렌더링 없음)"""
+        import pymupdf
+
+        pages = []
+        with pymupdf.open(path) as pdf:
+            for page in pdf:
+                row = {"page": page.number + 1, "text": page.get_text().strip()}
+                image_dpi = page_image_dpi(page)
+                if len(row["text"]) >= self.min_text_chars:
+                    row["method"] = "text"
+                elif image_dpi is None and not page.get_drawings():
+                    row["method"] = "blank"
+                else:
+                    row["key"] = f"{page_hash(pdf, page)}-{self.lang}"
+                    cached = self._read_cache(row["key"])
+                    if cached is not None:
+                        row.update(method="cache", text=cached)
+                    else:
+                        row.update(method="ocr", dpi=self._choose_dpi(page, image_dpi))
+                pages.append(row)
+        return pages
+
+    def process(self, paths) -> list[Document]:
+        """
+        PDF들을 페이지 단위 Document로 변환한다.
+        metadata: source, page, method(text/ocr/cache), dpi(OCR 페이지만)
+        OCR에 실패한 페이지는 건너뛰고 self.failures에 (경로, 페이지, 사유)로 남는다.
+        """
+        self.stats = {"pages": 0, "text": 0, "blank": 0, "cache": 0, "ocr": 0, "failed": 0, "ocr_seconds": 0.0}
+        self.failures = []
+        start = time.perf_counter()
+        results = {}
+        jobs = []
+        for path in map(Path, paths):
+            for row in self._classify(path):
+                self.stats["pages"] += 1
+                self.stats[row["method"]] += 1
+                if row["method"] == "ocr":
+                    jobs.append((path, row))
+                elif row["method"] != "blank":
+                    results[(path, row["page"])] = row
+
+        # OCR: 동시에 제출하는 작업 수를 워커 수의 2배로 제한 (대기 중인 작업이 메모리를 차지하지 않게)
+        if jobs:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as executor:
+                queue = iter(jobs)
+                running = {}
+                while True:
+                    while len(running) < self.workers * 2:
+                        job = next(queue, None)
+                        if job is None:
+                            break
+                        path, row = job
+                        future = executor.submit(_ocr_page, str(path), row["page"] - 1, row["dpi"], self.lang)
+                        running[future] = job
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, row = running.pop(future)
+                        try:
+                            row["text"], seconds = future.result()
+                            self.stats["ocr_seconds"] += seconds
+                            self._write_cache(row["key"], row["text"])
+                        except Exception as e:  # 페이지 하나(손상된 이미지, Tesseract 오류 등)가 전체를 멈추지 않게
+                            self.stats["failed"] += 1
+                            self.failures.append((str(path), row["page"], f"{type(e).__name__}: {e}"))
+                            continue
+                        results[(path, row["page"])] = row
+
+        documents = []
+        for (path, page), row in sorted(results.items()):
+            if not row["text"]:
+                continue
+            metadata = {"source": path.name, "page": page, "method": row["method"]}
+            if "dpi" in row:
+                metadata["dpi"] = row["dpi"]
+            documents.append(Document(page_content=row["text"], metadata=metadata))
+        self.stats["elapsed_s"] = time.perf_counter() - start
+        return documents
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    # 사용법: python rag_11_ocr_pipeline.py [스캔본.pdf ...]  (Tesseract + kor 언어팩 설치 필요)
+    paths = [Path(p) for p in sys.argv[1:]] or sorted(DATA_DIR.glob("*.pdf"))
+    pipeline = OCRPipeline(cache_dir=Path(__file__).resolve().parent / ".index" / "ocr_cache")
+
+    for attempt in ("첫 실행", "캐시 재실행"):
+        documents = pipeline.process(paths)
+        stats = pipeline.stats
+        print(f"\n🔎 {attempt}: 페이지 {stats['pages']}개 → 텍스트 레이어 {stats['text']}, 빈 페이지 {stats['blank']}, "
+              f"캐시 {stats['cache']}, OCR {stats['ocr']} (실패 {stats['failed']}) "
+              f"({stats['elapsed_s']:.2f}초, OCR 합계 {stats['ocr_seconds']:.1f}초)")
+        for path, page, reason in pipeline.failures:
+            print(f"  ❌ {path} p.{page}: {reason}")
+
+    for doc in documents[:3]:
+        print(f"  📄 {doc.metadata} {doc.page_content[:40]!r}...")
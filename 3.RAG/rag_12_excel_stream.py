@@ -0,0 +1,184 @@
+import datetime
+import io
+import sys
+import time
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+# ============================================================================
+# Excel Stream: 대용량 엑셀을 고정 메모리로 읽기
+# ============================================================================
+# openpyxl.load_workbook(path) 기본 모드는 모든 셀을 Cell 객체로 메모리에 올린다.
+# (셀 하나당 수백 바이트 → 수백 MB 엑셀은 수 GB 메모리)
+#
+# 1. read_only=True: 시트 XML을 필요한 만큼만 읽는 스트리밍 모드
+# 2. iter_rows(values_only=True): Cell 객체 없이 값 튜플만 받는다.
+# 3. batch_size행씩 모아 내보내고 버린다. → 시트 크기와 관계없이 메모리 사용량이 일정하다.
+#    - iter_row_batches(): 열 이름 → 값 리스트 (columnar, pandas/pyarrow로 바로 변환 가능)
+#    - iter_documents():   배치 하나를 Document 하나로 (RAG 색인용)
+# 4. 암호 걸린 파일: msoffcrypto로 메모리(BytesIO) 안에서 복호화한다. (복호화된 임시 파일을 디스크에 남기지 않음)
+# ============================================================================
+
+
+def open_workbook(path, password=None):
+    """
+    read-only 모드로 워크북을 연다. 암호화된 파일이면 password로 메모리에서 복호화한다.
+    호출한 쪽에서 workbook.close()를 해야 한다.
+    """
+    import msoffcrypto
+    import openpyxl
+
+    path = Path(path)
+    with open(path, "rb") as f:
+        office = msoffcrypto.OfficeFile(f)
+        if not office.is_encrypted():
+            source = path
+        elif password is None:
+            raise ValueError(f"암호로 보호된 파일입니다. password가 필요합니다: {path.name}")
+        else:
+            office.load_key(password=password)
+            source = io.BytesIO()
+            office.decrypt(source)
+            source.seek(0)
+    return openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+
+def _column_names(row) -> list[str]:
+    """헤더 행 → 중복/빈 이름을 정리한 열 이름 리스트"""
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = str(value).strip() if value is not None and str(value).strip() else f"column_{i + 1}"
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def _trim(row) -> tuple:
+    """끝쪽 빈 셀 제거 (서식만 있는 열 때문에 행이 수천 칸이 되는 경우가 있다)"""
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return row[:end]
+
+
+def iter_row_batches(path, sheets=None, batch_size=1000, header=True, password=None):
+    """
+    시트의 행을 batch_size개씩 열 단위(columnar)로 내보낸다.
+
+    Args:
+        sheets: 읽을 시트 이름 리스트 (None이면 전체)
+        header: 첫 번째 비어있지 않은 행을 열 이름으로 쓸지 여부
+
+    Yields:
+        {"sheet", "row_start", "row_end", "columns": {열 이름: [값, ...]}}  (row 번호는 엑셀 기준 1부터)
+    """
+    workbook = open_workbook(path, password)
+    try:
+        for sheet in workbook.worksheets:
+            if sheets is not None and sheet.title not in sheets:
+                continue
+            names = None
+            rows, row_start, row_end = [], None, None
+            for row_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                row = _trim(row)
+                if not row:
+                    continue
+                if names is None and header:
+                    names = _column_names(row)
+                    continue
+                if row_start is None:
+                    row_start = row_number
+                rows.append(row)
+                row_end = row_number
+                if len(rows) >= batch_size:
+                    yield _to_batch(sheet.title, names, rows, row_start, row_end)
+                    rows, row_start = [], None
+            if rows:
+                yield _to_batch(sheet.title, names, rows, row_start, row_end)
+    finally:
+        workbook.close()
+
+
+def _to_batch(sheet_name, names, rows, row_start, row_end) -> dict:
+    width = max(len(row) for row in rows)
+    names = list(names or [])
+    names += [f"column_{i + 1}" for i in range(len(names), width)]
+    columns = {name: [row[i] if i < len(row) else None for row in rows] for i, name in enumerate(names)}
+    return {"sheet": sheet_name, "row_start": row_start, "row_end": row_end, "columns": columns}
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.date().isoformat()
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_documents(path, sheets=None, batch_size=200, password=None):
+    """
+    배치 하나를 Document 하나로 만든다. 본문은 "열1\t열2..." 헤더 + 행들 (TSV)
+    metadata: source, sheet, row_start, row_end
+    """
+    path = Path(path)
+    for batch in iter_row_batches(path, sheets, batch_size, password=password):
+        names = list(batch["columns"])
+        lines = ["\t".join(names)]
+        lines += ["\t".join(_format_value(v) for v in values) for values in zip(*batch["columns"].values())]
+        yield Document(
+            page_content="\n".join(lines),
+            metadata={"source": path.name, "sheet": batch["sheet"],
+                      "row_start": batch["row_start"], "row_end": batch["row_end"]},
+        )
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+def _make_sample_workbook(path, n_rows) -> None:
+    """write_only 모드로 대용량 샘플 엑셀 생성 (이것도 고정 메모리)"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("거래내역")
+    sheet.append(["일자", "계좌", "적요", "입금", "출금", "잔액"])
+    balance = 0
+    for i in range(n_rows):
+        amount = (i * 7919) % 1_000_000
+        balance += amount if i % 3 else -amount
+        sheet.append([datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 365), f"110-{i % 1000:03d}",
+                      "급여 이체" if i % 3 else "카드 대금", amount if i % 3 else None, None if i % 3 else amount, balance])
+    workbook.save(path)
+
+
+if __name__ == "__main__":
+    import resource
+
+    if len(sys.argv) > 1:
+        path, password = Path(sys.argv[1]), (sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        path, password = Path(__file__).resolve().parent / ".index" / "sample_large.xlsx", None
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            print("📝 샘플 엑셀 생성 중 (300,000행)...")
+            _make_sample_workbook(path, 300_000)
+
+    print(f"📊 {path.name} ({path.stat().st_size / 1e6:.1f}MB)")
+    start = time.perf_counter()
+    n_rows = n_batches = 0
+    for batch in iter_row_batches(path, batch_size=5000, password=password):
+        n_batches += 1
+        n_rows += len(next(iter(batch["columns"].values())))
+        if n_batches == 1:
+            print(f"  첫 배치 열: {list(batch['columns'])}")
+    elapsed = time.perf_counter() - start
+    # ru_maxrss: Linux는 KB, macOS는 바이트 단위
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 ** 2)
+    print(f"  행 {n_rows:,}개 / 배치 {n_batches}개, {elapsed:.1f}초 ({n_rows / elapsed:,.0f}행/초), 최대 메모리 {peak_mb:.0f}MB")
+
+    first = next(iter_documents(path, batch_size=5, password=password))
+    print(f"\n📄 Document 예시 {first.metadata}\n{first.page_content}")
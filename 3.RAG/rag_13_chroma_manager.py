@@ -0,0 +1,389 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import chromadb
+from chromadb.config import Settings
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from rag_1_hybrid_retriever import load_corpus
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 쓰기 잠금 없이 동작 (쓰기는 한 프로세스에서만 할 것)
+    fcntl = None
+
+# ============================================================================
+# Chroma Manager: 디스크에 저장된 이름 있는 컬렉션을 여러 프로세스에서 재사용하기
+# ============================================================================
+# Chroma.from_texts(...)는 매번 메모리에 새 컬렉션을 만들고 모든 문서를 다시 임베딩한다.
+# → 프로세스가 재시작될 때마다 수 분 + 임베딩 비용
+#
+# 1. 영구 컬렉션: persist_directory 아래 이름 있는 컬렉션을 열기만 한다. (재임베딩 없음)
+# 2. 스키마 검증: 컬렉션 metadata에 schema_version / embedding_model을 기록해 두고,
+#    열 때 현재 설정과 다르면 ValueError. (다른 모델로 만든 벡터와 섞여 검색이 조용히 망가지는 것 방지)
+# 3. 지연 워밍업: 첫 검색 때 HNSW 인덱스를 디스크에서 읽어오므로, warm()으로 미리(백그라운드) 읽어 둔다.
+#    이미 저장된 벡터 하나로 질의하므로 임베딩 API는 호출하지 않는다.
+# 4. 다중 프로세스: 읽기는 여러 워커 프로세스가 동시에 해도 되고,
+#    쓰기는 fcntl 파일 잠금으로 한 번에 하나만 한다. 쓰기 후 generation 파일을 올려
+#    다른 프로세스가 다음 호출 때 클라이언트를 다시 열어 변경 내용을 보게 한다.
+#    get()은 Chroma 객체 대신 ManagedChroma(프록시)를 돌려준다. 호출할 때마다 최신 클라이언트의
+#    Chroma로 연결되므로, 예전에 받아 둔 객체(예: example selector에 넘긴 것)도 오래된 데이터를 보지 않는다.
+# ============================================================================
+
+SCHEMA_VERSION = 1
+
+
+def embedding_model_name(embeddings) -> str:
+    """임베딩 객체의 모델 식별자 (예: OpenAIEmbeddings/text-embedding-ada-002)"""
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    return f"{type(embeddings).__name__}/{model}" if model else type(embeddings).__name__
+
+
+def text_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _close_system(client) -> None:
+    """
+    클라이언트의 Chroma 시스템을 멈추고(sqlite 연결, 세그먼트 스레드 정리) 시스템 캐시에서 뺀다.
+    다음 PersistentClient가 디스크에서 새로 연다. clear_system_cache()와 달리 다른 경로의 클라이언트는 그대로 둔다.
+    주의: 시스템 캐시(SharedSystemClient 클래스 dict)는 Chroma의 공개 API가 아니라, 버전을 올리면 확인이 필요하다.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    identifier, system = client._identifier, client._system
+    if SharedSystemClient._identifier_to_system.get(identifier) is system:
+        del SharedSystemClient._identifier_to_system[identifier]
+        SharedSystemClient._identifier_to_refcount.pop(identifier, None)
+    system.stop()
+
+
+class ChromaManager:
+    """
+    영구 Chroma 컬렉션 관리자
+
+    persist_directory: 컬렉션 저장 디렉토리
+    embeddings: LangChain Embeddings 객체
+    embedding_model: 컬렉션에 기록/검증할 모델 식별자 (None이면 embeddings에서 추출)
+    schema_version: 문서/metadata 구조 버전 (구조를 바꾸면 올린다)
+    """
+
+    _shared = {}  # 경로 -> {"client", "generation"} (프로세스 안의 모든 ChromaManager가 공유)
+    _shared_lock = threading.Lock()
+
+    def __init__(self, persist_directory, embeddings, embedding_model=None, schema_version=SCHEMA_VERSION):
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model or embedding_model_name(embeddings)
+        self.schema_version = schema_version
+        self._client = None
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 클라이언트 / 세대(generation)
+    # ------------------------------------------------------------------
+    @property
+    def _generation_path(self) -> Path:
+        return self.persist_directory / ".generation"
+
+    def _read_generation(self) -> int:
+        try:
+            return int(self._generation_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _shared_entry(self) -> dict:
+        return ChromaManager._shared.setdefault(str(self.persist_directory.resolve()), {"client": None, "generation": None})
+
+    def _get_client(self):
+        """
+        다른 프로세스가 쓴 뒤(generation 변경)라면 클라이언트를 다시 연다.
+        Chroma는 같은 경로의 클라이언트가 시스템 하나를 공유하므로, 같은 프로세스의 ChromaManager들도
+        경로별 클라이언트/세대(_shared)를 함께 쓴다. (한 쪽이 다시 열면서 다른 쪽의 시스템을 멈추지 않게)
+        """
+        generation = self._read_generation()
+        with ChromaManager._shared_lock:
+            entry = self._shared_entry()
+            if entry["client"] is None or entry["generation"] != generation:
+                if entry["client"] is not None:
+                    _close_system(entry["client"])
+                entry["client"] = chromadb.PersistentClient(
+                    path=str(self.persist_directory), settings=Settings(anonymized_telemetry=False)
+                )
+                entry["generation"] = generation
+        if entry["client"] is not self._client:
+            self._stores.clear()  # 예전 클라이언트에 묶인 Chroma 객체는 버린다.
+            self._client = entry["client"]
+        return self._client
+
+    @contextmanager
+    def write_lock(self, name: str):
+        """컬렉션 쓰기 잠금 (프로세스 간). 끝나면 generation을 올린다."""
+        lock_path = self.persist_directory / f".{name}.lock"
+        with open(lock_path, "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+                self._bump_generation()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _bump_generation(self) -> None:
+        """
+        generation 읽기-증가-교체는 모든 컬렉션이 공유하므로 별도의 전역 잠금 안에서 한다.
+        (다른 컬렉션 쓰기와 동시에 올리면 한쪽 증가가 사라진다)
+        """
+        with open(self.persist_directory / ".generation.lock", "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                previous = self._read_generation()
+                tmp_path = self._generation_path.with_suffix(".tmp")
+                tmp_path.write_text(str(previous + 1))
+                os.replace(tmp_path, self._generation_path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        # 이 프로세스가 마지막으로 연 세대 바로 다음일 때만 "최신"으로 본다.
+        # 그 사이 다른 프로세스가 썼다면 다음 호출 때 다시 연다.
+        with ChromaManager._shared_lock:
+            entry = self._shared_entry()
+            if previous == entry["generation"]:
+                entry["generation"] = previous + 1
+
+    # ------------------------------------------------------------------
+    # 컬렉션 열기
+    # ------------------------------------------------------------------
+    def _verify(self, name: str, metadata: dict | None) -> None:
+        metadata = metadata or {}
+        expected = {"schema_version": self.schema_version, "embedding_model": self.embedding_model}
+        actual = {key: metadata.get(key) for key in expected}
+        if actual != expected:
+            raise ValueError(
+                f"컬렉션 '{name}'의 설정이 다릅니다. 저장됨={actual}, 현재={expected}. "
+                f"drop('{name}') 후 다시 색인하거나 같은 임베딩 모델을 사용하세요."
+            )
+
+    def _resolve(self, name: str, create=True) -> Chroma:
+        """현재 클라이언트 기준의 Chroma 객체 (클라이언트를 다시 열었으면 새로 만든다)"""
+        with self._lock:
+            client = self._get_client()
+            store = self._stores.get(name)
+            if store is None:
+                existing = {c.name for c in client.list_collections()}
+                if name in existing:
+                    self._verify(name, client.get_collection(name).metadata)
+                elif not create:
+                    raise ValueError(f"컬렉션 '{name}'이(가) 없습니다: {self.persist_directory}")
+                store = Chroma(
+                    collection_name=name,
+                    embedding_function=self.embeddings,
+                    client=client,
+                    collection_metadata={
+                        "schema_version": self.schema_version,
+                        "embedding_model": self.embedding_model,
+                        "hnsw:space": "cosine",
+                    },
+                )
+                self._stores[name] = store
+            return store
+
+    def get(self, name: str, create=True, warm=False) -> "ManagedChroma":
+        """
+        이름 있는 영구 컬렉션을 연다. (LangChain VectorStore로 사용)
+
+        Args:
+            create: 없으면 새로 만들지 여부 (False면 ValueError)
+            warm: True면 백그라운드에서 인덱스를 미리 메모리로 읽는다.
+        """
+        self._resolve(name, create)
+        if warm:
+            self.warm(name)
+        return ManagedChroma(self, name)
+
+    def warm(self, name: str, background=True):
+        """저장된 벡터 하나로 질의해 HNSW 인덱스를 메모리에 올린다. (임베딩 API 호출 없음)"""
+        def _warm():
+            collection = self._resolve(name)._collection
+            sample = collection.get(limit=1, include=["embeddings"])
+            if len(sample["embeddings"]):
+                collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+
+        if not background:
+            _warm()
+            return None
+        thread = threading.Thread(target=_warm, name=f"warm-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def count(self, name: str) -> int:
+        return self._resolve(name)._collection.count()
+
+    # ------------------------------------------------------------------
+    # 쓰기 (잠금)
+    # ------------------------------------------------------------------
+    def add_documents(self, name: str, documents: list[Document], ids=None) -> list[str]:
+        with self.write_lock(name):
+            return self._resolve(name).add_documents(documents, ids=ids)
+
+    def add_missing_texts(self, name: str, texts: list[str], metadatas=None) -> int:
+        """
+        내용 해시를 id로 써서, 컬렉션에 아직 없는 텍스트만 임베딩해 추가한다.
+        재시작할 때마다 호출해도 이미 있는 텍스트는 다시 임베딩하지 않는다.
+
+        Returns:
+            새로 추가한 텍스트 수
+        """
+        ids = [text_id(text) for text in texts]
+        unique_ids = list(dict.fromkeys(ids))  # 입력 안의 중복 텍스트 (get/add 모두 중복 id를 거부한다)
+        existing = set(self._resolve(name)._collection.get(ids=unique_ids, include=[])["ids"])
+        missing, seen = [], set(existing)
+        for i, id_ in enumerate(ids):
+            if id_ not in seen:
+                seen.add(id_)
+                missing.append(i)
+        if missing:
+            with self.write_lock(name):
+                self._resolve(name).add_texts(
+                    [texts[i] for i in missing],
+                    metadatas=[metadatas[i] for i in missing] if metadatas else None,
+                    ids=[ids[i] for i in missing],
+                )
+        return len(missing)
+
+    def delete(self, name: str, ids: list[str]) -> None:
+        with self.write_lock(name):
+            self._resolve(name).delete(ids=ids)
+
+    def drop(self, name: str) -> None:
+        with self.write_lock(name):
+            client = self._get_client()
+            if name in {c.name for c in client.list_collections()}:
+                client.delete_collection(name)
+            self._stores.pop(name, None)
+
+
+class ManagedChroma(VectorStore):
+    """
+    ChromaManager 컬렉션의 VectorStore 프록시
+    호출할 때마다 manager에서 최신 Chroma를 찾아 위임한다. (다른 프로세스가 쓴 뒤에도 최신 데이터)
+    """
+
+    def __init__(self, manager: ChromaManager, name: str):
+        self.manager = manager
+        self.name = name
+
+    @property
+    def store(self) -> Chroma:
+        return self.manager._resolve(self.name)
+
+    def __getattr__(self, attr):  # _collection 등 나머지 Chroma 속성
+        if attr in ("manager", "name"):
+            raise AttributeError(attr)
+        return getattr(self.store, attr)
+
+    @property
+    def embeddings(self):
+        return self.manager.embeddings
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs) -> list[str]:
+        with self.manager.write_lock(self.name):
+            return self.store.add_texts(texts, metadatas=metadatas, ids=ids, **kwargs)
+
+    def delete(self, ids=None, **kwargs):
+        with self.manager.write_lock(self.name):
+            return self.store.delete(ids=ids, **kwargs)
+
+    def get_by_ids(self, ids, /) -> list[Document]:
+        return self.store.get_by_ids(ids)
+
+    def similarity_search(self, query, k=4, **kwargs) -> list[Document]:
+        return self.store.similarity_search(query, k=k, **kwargs)
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.store.similarity_search_with_score(query, k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs) -> list[Document]:
+        return self.store.similarity_search_by_vector(embedding, k=k, **kwargs)
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, **kwargs):
+        return self.store.max_marginal_relevance_search(query, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        return self.store._select_relevance_score_fn()
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, persist_directory, collection_name="langchain",
+                   ids=None, **manager_kwargs) -> "ManagedChroma":
+        """
+        ChromaManager로 이름 있는 영구 컬렉션을 열고(없으면 생성) 텍스트를 넣는다.
+        ids가 없으면 add_missing_texts()로 아직 없는 텍스트만 임베딩한다. (다시 실행해도 중복 없음)
+        manager_kwargs: ChromaManager 인자 (embedding_model, schema_version)
+        """
+        manager = ChromaManager(persist_directory, embedding, **manager_kwargs)
+        if ids is None:
+            manager.add_missing_texts(collection_name, list(texts), metadatas)
+            return manager.get(collection_name)
+        store = manager.get(collection_name)
+        store.add_texts(list(texts), metadatas=metadatas, ids=ids)
+        return store
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+PERSIST_DIRECTORY = Path(__file__).resolve().parent / ".index" / "chroma_collections"
+
+
+def _reader(query: str):
+    """(워커 프로세스) 컬렉션을 열고 첫 검색까지 걸린 시간을 잰다."""
+    from langchain_openai import OpenAIEmbeddings
+
+    start = time.perf_counter()
+    manager = ChromaManager(PERSIST_DIRECTORY, OpenAIEmbeddings())
+    store = manager.get("data_corpus", create=False)
+    manager.warm("data_corpus", background=False)
+    opened = time.perf_counter() - start
+    docs = store.similarity_search(query, k=1)
+    return os.getpid(), opened, time.perf_counter() - start, docs[0].page_content[:30]
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    from dotenv import load_dotenv
+    from langchain_openai import OpenAIEmbeddings
+
+    load_dotenv()
+    manager = ChromaManager(PERSIST_DIRECTORY, OpenAIEmbeddings())
+
+    # 1. 최초 1회만 임베딩 (두 번째 실행부터는 추가 0개)
+    corpus = load_corpus()
+    start = time.perf_counter()
+    added = manager.add_missing_texts("data_corpus", [d.page_content for d in corpus], [d.metadata for d in corpus])
+    print(f"📚 data_corpus: 새로 추가 {added}개 / 전체 {manager.count('data_corpus')}개 ({time.perf_counter() - start:.2f}초)")
+
+    # 2. 여러 워커 프로세스가 동시에 같은 컬렉션을 읽는다.
+    # Chroma 클라이언트는 fork에 안전하지 않다. (부모가 연 시스템을 물려받은 자식이 멈춘다) → spawn으로 새로 시작
+    with ProcessPoolExecutor(max_workers=4, mp_context=get_context("spawn")) as executor:
+        queries = ["경복궁", "와인 추천", "스테이크", "조선 왕조"]
+        for pid, opened, total, preview in executor.map(_reader, queries):
+            print(f"  👷 pid={pid} 열기+워밍업 {opened * 1000:.0f}ms, 첫 검색까지 {total * 1000:.0f}ms → {preview!r}")
+
+    # 3. 다른 임베딩 모델로 열면 거부된다.
+    try:
+        ChromaManager(PERSIST_DIRECTORY, OpenAIEmbeddings(model="text-embedding-3-small")).get("data_corpus")
+    except ValueError as e:
+        print(f"\n🚫 {e}")
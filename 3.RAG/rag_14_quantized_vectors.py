@@ -0,0 +1,287 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+from rag_1_hybrid_retriever import DATA_DIR, CORPUS_FILES
+from rag_4_ann_index import IVFPQVectorStore, _normalize, make_clustered_vectors
+from rag_6_token_chunker import TokenChunker
+
+# ============================================================================
+# Quantized Vectors: 임베딩을 압축해 메모리에 올리고, 상위 후보만 원본으로 다시 계산하기
+# ============================================================================
+# float32 임베딩(1536차원 = 6KB)을 수백만 개 메모리에 올리면 검색 노드 메모리의 대부분을 차지한다.
+#
+# codec (벡터 하나당 크기, 1536차원 기준)
+# - float32: 6,144 byte  (기준)
+# - float16: 3,072 byte  (1/2) 정밀도 손실 거의 없음
+# - int8:    1,540 byte  (1/4) 벡터별 scale로 -127~127 양자화
+# - binary:    192 byte  (1/32) 부호 비트만 저장, float 질의와 ±1 부호의 내적으로 비교
+#
+# 2단계 검색
+# 1. 근사 스캔: 메모리의 압축 코드 전체를 chunk_size씩 훑어 상위 rerank_k 후보를 고른다.
+# 2. 재계산: 후보만 원본 float32 벡터(디스크 mmap)로 정확한 코사인 유사도를 계산해 상위 k개를 고른다.
+#    → 원본은 디스크에만 있고, 질의마다 rerank_k개 행만 읽는다.
+#    (float32 codec은 압축 코드가 곧 원본이므로 원본을 메모리에 한 벌만 둔다)
+#
+# IVFPQIndex(rag_4)와 같은 인터페이스(add/remove/search/save/load)이므로
+# IVFPQVectorStore의 index_class만 바꿔 VectorStore로 쓴다. (QuantizedVectorStore)
+# ============================================================================
+
+CODECS = ("float32", "float16", "int8", "binary")
+
+
+class QuantizedIndex:
+    """
+    압축 코드 근사 스캔 + 원본 재계산 2단계 전수 검색 인덱스 (코사인 유사도)
+
+    codec: "float32" | "float16" | "int8" | "binary"
+    rerank_k: 원본 벡터로 다시 계산할 후보 수 (0이면 근사 점수 그대로 사용)
+    chunk_size: 근사 스캔 시 한 번에 계산할 벡터 수 (임시 메모리 제한)
+    """
+
+    def __init__(self, dim: int, codec: str = "int8", rerank_k: int = 100, chunk_size: int = 65_536):
+        if codec not in CODECS:
+            raise ValueError(f"지원하지 않는 codec입니다: {codec} (가능: {CODECS})")
+        self.dim = dim
+        self.codec = codec
+        self.rerank_k = rerank_k
+        self.chunk_size = chunk_size
+
+        self.vectors = np.zeros((0, dim), dtype=np.float32)  # 원본(정규화) 벡터, 로드 시 mmap (float32 제외)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.codes, self.scales = self._encode(self.vectors)  # scales: int8 전용 벡터별 scale
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    # ------------------------------------------------------------------
+    # 인코딩
+    # ------------------------------------------------------------------
+    def _encode(self, x: np.ndarray):
+        """정규화된 벡터 → (압축 코드, int8 scale 또는 빈 배열)"""
+        no_scales = np.zeros(0, dtype=np.float32)
+        if self.codec == "float32":
+            return x, no_scales
+        if self.codec == "float16":
+            return x.astype(np.float16), no_scales
+        if self.codec == "int8":
+            scales = np.maximum(np.abs(x).max(axis=1), 1e-12).astype(np.float32) / 127
+            return np.round(x / scales[:, None]).astype(np.int8), scales
+        return np.packbits(x > 0, axis=1), no_scales
+
+    def add(self, x: np.ndarray) -> np.ndarray:
+        """벡터를 추가하고 부여된 내부 번호를 반환한다."""
+        x = _normalize(x).reshape(-1, self.dim)
+        start = len(self.vectors)
+        self.vectors = np.concatenate([self.vectors, x])
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(x), dtype=bool)])
+        codes, scales = self._encode(x)
+        # float32는 코드 = 원본이므로 같은 배열을 가리키게 해 두 벌을 만들지 않는다.
+        self.codes = self.vectors if self.codec == "float32" else np.concatenate([self.codes, codes])
+        self.scales = np.concatenate([self.scales, scales])
+        return np.arange(start, start + len(x))
+
+    def remove(self, positions) -> None:
+        self.deleted[np.asarray(positions, dtype=np.int64)] = True
+
+    # ------------------------------------------------------------------
+    # 검색
+    # ------------------------------------------------------------------
+    def _approximate_scores(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """압축 코드로 계산한 (질의 수, end - start) 근사 점수 (클수록 가까움)"""
+        codes = self.codes[start:end]
+        if self.codec in ("float32", "float16"):
+            return queries @ codes.T.astype(np.float32)
+        if self.codec == "int8":
+            return (queries @ codes.T.astype(np.float32)) * self.scales[start:end]
+        # binary: 부호 비트를 ±1로 풀어 float 질의와 내적한다. (비대칭 거리: 질의는 양자화하지 않아 해밍 거리보다 정확)
+        # 풀어낸 ±1 행렬이 커지지 않도록 8192개씩 나눠 계산한다.
+        scores = np.empty((len(queries), end - start), dtype=np.float32)
+        for s in range(0, end - start, 8192):
+            signs = np.unpackbits(codes[s:s + 8192], axis=1, count=self.dim).astype(np.float32) * 2 - 1
+            scores[:, s:s + 8192] = queries @ signs.T
+        return scores
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int):
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def search(self, queries: np.ndarray, k: int = 4, rerank_k=None):
+        """
+        질의 벡터 배치에 대해 (내부 번호, 유사도) 배열을 반환한다. 결과가 k개보다 적으면 -1로 채운다.
+        """
+        queries = _normalize(queries).reshape(-1, self.dim)
+        rerank_k = self.rerank_k if rerank_k is None else rerank_k
+        n_candidates = max(k, rerank_k)
+        n = len(self.vectors)
+        if n == 0:
+            return self._pad(np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0)), k)
+
+        # 1단계: chunk_size씩 근사 스캔하며 chunk별 상위 후보만 남긴다.
+        cand_ids, cand_scores = [], []
+        for start in range(0, n, self.chunk_size):
+            end = min(start + self.chunk_size, n)
+            scores = self._approximate_scores(queries, start, end)
+            scores[:, self.deleted[start:end]] = -np.inf
+            ids, top_scores = self._top(scores, n_candidates)
+            cand_ids.append(ids + start)
+            cand_scores.append(top_scores)
+        ids, scores = self._top(np.concatenate(cand_scores, axis=1), n_candidates)
+        ids = np.take_along_axis(np.concatenate(cand_ids, axis=1), ids, axis=1)
+
+        # 2단계: 후보만 원본 벡터로 정확히 다시 계산
+        if rerank_k and self.codec != "float32":
+            valid = np.isfinite(scores)
+            exact = np.einsum("qd,qcd->qc", queries, np.asarray(self.vectors[ids]))
+            scores = np.where(valid, exact, -np.inf)
+        top, scores = self._top(scores, k)
+        return self._pad(np.take_along_axis(ids, top, axis=1), scores, k)
+
+    @staticmethod
+    def _pad(ids, scores, k):
+        if ids.shape[1] < k:
+            pad = k - ids.shape[1]
+            ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        ids[~np.isfinite(scores)] = -1
+        return ids, scores
+
+    def memory_bytes(self) -> dict:
+        """
+        지금 메모리에 올라와 있는 배열(in_memory)과 mmap으로 열어 필요한 부분만 디스크에서 읽는 배열(mmap)의 크기
+        add() 직후에는 원본 벡터도 메모리에 있다. save() 후 load(mmap=True)로 열어야 mmap 쪽으로 빠진다.
+        """
+        in_memory = mapped = 0
+        arrays = {id(array): array for array in (self.vectors, self.codes, self.scales, self.deleted)}  # 같은 배열은 한 번만
+        for array in arrays.values():
+            if isinstance(array, np.memmap):
+                mapped += array.nbytes
+            else:
+                in_memory += array.nbytes
+        return {"in_memory": int(in_memory), "mmap": int(mapped)}
+
+    # ------------------------------------------------------------------
+    # 저장 / 로드
+    # ------------------------------------------------------------------
+    def save(self, path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", np.asarray(self.vectors))
+        np.save(path / "deleted.npy", self.deleted)
+        if self.codec != "float32":  # float32는 vectors.npy가 곧 코드
+            np.save(path / "codes.npy", np.asarray(self.codes))
+        np.save(path / "scales.npy", self.scales)
+        config = {"dim": self.dim, "codec": self.codec, "rerank_k": self.rerank_k, "chunk_size": self.chunk_size}
+        (path / "config.json").write_text(json.dumps(config), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "QuantizedIndex":
+        """
+        압축 코드는 메모리로 읽고, 원본 벡터는 mmap으로 열어 재계산할 행만 디스크에서 읽는다.
+        float32 codec은 전수 스캔에 원본이 필요하므로 원본을 메모리로 읽어 코드로 같이 쓴다.
+        """
+        path = Path(path)
+        index = cls(**json.loads((path / "config.json").read_text(encoding="utf-8")))
+        index.deleted = np.load(path / "deleted.npy")
+        if index.codec == "float32":
+            index.vectors = index.codes = np.load(path / "vectors.npy")
+        else:
+            index.vectors = np.load(path / "vectors.npy", mmap_mode="r" if mmap else None)
+            index.codes = np.load(path / "codes.npy")
+        index.scales = np.load(path / "scales.npy")
+        return index
+
+
+class QuantizedVectorStore(IVFPQVectorStore):
+    """
+    QuantizedIndex를 쓰는 VectorStore (문서/ID 관리는 IVFPQVectorStore와 같다)
+    예) QuantizedVectorStore.from_texts(texts, embeddings, codec="binary", rerank_k=200)
+    """
+
+    index_class = QuantizedIndex
+
+
+# ============================================================================
+# 벤치마크: codec별 recall / 지연 시간 / 메모리
+# ============================================================================
+
+def benchmark(data: np.ndarray, queries: np.ndarray, k: int = 10, rerank_ks=(0, 50, 200, 1000)) -> list[dict]:
+    """
+    float32 전수 비교를 정답으로 codec × rerank_k 조합의 recall@k, 질의당 지연 시간, 메모리를 비교한다.
+    실제 사용 형태(원본 벡터는 mmap)로 재기 위해 codec마다 저장 후 다시 열어서 검색/측정한다.
+    """
+    data, queries = _normalize(data), _normalize(queries)
+    exact = np.argsort(-(queries @ data.T), axis=1)[:, :k]
+    results = []
+    for codec in CODECS:
+        index = QuantizedIndex(data.shape[1], codec=codec)
+        index.add(data)
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            index.save(tmp)
+            index = QuantizedIndex.load(tmp, mmap=True)
+            for rerank_k in (0,) if codec == "float32" else rerank_ks:
+                index.search(queries[:1], k=k, rerank_k=rerank_k)  # 워밍업
+                start = time.perf_counter()
+                found, _ = index.search(queries, k=k, rerank_k=rerank_k)
+                ms = (time.perf_counter() - start) * 1000 / len(queries)
+                recall = float(np.mean([len(set(f) & set(e)) / k for f, e in zip(found, exact)]))
+                results.append({"codec": codec, "rerank_k": rerank_k, "recall@k": recall, "ms_per_query": ms,
+                                "memory_bytes": index.memory_bytes()["in_memory"]})
+            del index  # mmap을 닫고 임시 디렉토리를 지운다.
+    return results
+
+
+def _print_results(title: str, results: list[dict]) -> None:
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    for row in results:
+        print(f"  {row['codec']:<8} rerank_k={row['rerank_k']:<4} recall@10={row['recall@k']:.3f}  "
+              f"{row['ms_per_query']:.2f}ms/query  mem={row['memory_bytes'] / 1e6:.2f}MB")
+
+
+def embed_data_corpus(embeddings, cache_path) -> np.ndarray:
+    """data/ 텍스트 + PDF를 256토큰 청크로 나눠 임베딩한다. (결과를 npy로 캐시해 재실행 시 API 호출 없음)"""
+    cache_path = Path(cache_path)
+    if cache_path.exists():
+        return np.load(cache_path)
+    texts = [(DATA_DIR / name).read_text(encoding="utf-8") for name in CORPUS_FILES]
+    for pdf_path in sorted(DATA_DIR.glob("*.pdf")):
+        from rag_6_token_chunker import load_pdf_text
+
+        texts.append(load_pdf_text(pdf_path))
+    chunks = [doc.page_content for doc in TokenChunker(chunk_size=256, chunk_overlap=32).create_documents(texts)]
+    vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(cache_path, vectors)
+    return vectors
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    from langchain_openai import OpenAIEmbeddings
+
+    load_dotenv()
+
+    # 1. data/ 코퍼스 (실제 OpenAI 임베딩, 1536차원): 청크 자신을 살짝 흔든 벡터를 질의로 사용
+    corpus = embed_data_corpus(OpenAIEmbeddings(), Path(__file__).resolve().parent / ".index" / "data_corpus_vectors.npy")
+    rng = np.random.default_rng(0)
+    picked = corpus[rng.choice(len(corpus), min(100, len(corpus)), replace=False)]
+    queries = picked + 0.02 * rng.normal(size=picked.shape).astype(np.float32)
+    _print_results(f"📊 data/ 코퍼스 (청크 {len(corpus)}개, {corpus.shape[1]}차원)", benchmark(corpus, queries))
+
+    # 2. 규모 확장: 합성 벡터 50,000개 × 768차원
+    synthetic = make_clustered_vectors(50_000, 768)
+    _print_results("📊 합성 벡터 (50,000개, 768차원)",
+                   benchmark(synthetic, make_clustered_vectors(100, 768, seed=1)))
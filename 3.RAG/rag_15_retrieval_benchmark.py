@@ -0,0 +1,286 @@
+import json
+import re
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_1_hybrid_retriever import DATA_DIR, HybridRetriever, load_corpus
+from rag_2_bm25_index import KoreanBM25Index, tokenize_korean
+from rag_3_reranker import CrossEncoderReranker, with_reranker
+from rag_10_loader_farm import load_pdf
+from rag_14_quantized_vectors import QuantizedVectorStore
+
+# ============================================================================
+# Retrieval Benchmark: 검색 설정을 같은 질문 세트로 비교하기 (오프라인, CI용)
+# ============================================================================
+# "BM25를 바꿨더니 좋아졌나?", "리랭커가 지연 시간만큼의 값어치를 하나?"를 숫자로 답하기 위한 벤치마크
+#
+# 1. 정답 질문 세트(LABELED_QUERIES): data/의 역사/명소/메뉴/와인/PDF 보고서에 대한 질문 +
+#    정답 청크에 반드시 들어있는 근거 문자열(evidence). 청크 분할 방식이 바뀌어도 정답 판정이 유지된다.
+# 2. 설정별 검색: bm25 / dense / hybrid(RRF) / hybrid+rerank
+# 3. 지표: recall@k(상위 k개 안에 정답 청크가 있는 질문 비율), MRR, 질의 지연 p50/p95,
+#    인덱스 구축 시간, 인덱스 크기 → JSON
+# 4. 완전 오프라인: 임베딩은 해싱 임베딩(HashingEmbeddings, 외부 모델 없음)이 기본이고,
+#    리랭커 모델이 로컬에 없으면 어휘 겹침 점수(LexicalOverlapScorer)로 대신한다. (리포트에 기록)
+#    해싱 임베딩은 토큰 해시라서 "dense"라도 실제로는 어휘 기반 검색이다. 의미 검색 성능을 재려면
+#    로컬 sentence-transformers 모델을 인자로 준다. (리포트의 embedding_kind: lexical / semantic)
+#
+# CI에서는 MIN_RECALL 아래로 떨어지면 종료 코드 1로 실패시킨다.
+# ============================================================================
+
+LABELED_QUERIES = [
+    # history.txt
+    {"query": "한국 최초의 국가는 누가 세웠나요?", "source": "history.txt", "evidence": ["단군왕검"]},
+    {"query": "한글을 만든 왕은?", "source": "history.txt", "evidence": ["세종대왕"]},
+    {"query": "신라가 삼국을 통일할 때 손잡은 나라", "source": "history.txt", "evidence": ["당나라와 연합"]},
+    {"query": "한국전쟁이 일어난 해", "source": "history.txt", "evidence": ["1950년"]},
+    {"query": "고려 시대에 꽃피운 문화", "source": "history.txt", "evidence": ["청자"]},
+    # places.txt
+    {"query": "서울 시내를 한눈에 내려다볼 수 있는 전망대", "source": "places.txt", "evidence": ["남산 서울타워"]},
+    {"query": "화산섬 여행지 추천", "source": "places.txt", "evidence": ["한라산"]},
+    {"query": "불국사와 석굴암이 있는 도시", "source": "places.txt", "evidence": ["석굴암"]},
+    {"query": "전통 찻집과 공예품 가게가 많은 거리", "source": "places.txt", "evidence": ["인사동은"]},
+    {"query": "여름에 불꽃놀이 축제를 볼 수 있는 곳", "source": "places.txt", "evidence": ["불꽃놀이"]},
+    {"query": "습지 생태 관광지", "source": "places.txt", "evidence": ["순천만 습지"]},
+    # restaurant_menu.txt
+    {"query": "한우 등심으로 만든 스테이크", "source": "restaurant_menu.txt", "evidence": ["시그니처 스테이크"]},
+    {"query": "블랙 트러플 리조또 가격", "source": "restaurant_menu.txt", "evidence": ["트러플 리조또"]},
+    {"query": "새우와 홍합이 들어간 파스타", "source": "restaurant_menu.txt", "evidence": ["해산물 파스타"]},
+    {"query": "랍스터로 만든 수프", "source": "restaurant_menu.txt", "evidence": ["랍스터 비스크"]},
+    {"query": "닭고기 요리 있나요?", "source": "restaurant_menu.txt", "evidence": ["치킨 콘피"]},
+    # restaurant_wine.txt
+    {"query": "캘리포니아 나파 밸리 와인", "source": "restaurant_wine.txt", "evidence": ["오퍼스 원", "클로 뒤 발"]},
+    {"query": "달콤한 디저트 와인", "source": "restaurant_wine.txt", "evidence": ["샤토 디켐"]},
+    {"query": "샴페인 있어요?", "source": "restaurant_wine.txt", "evidence": ["돔 페리뇽"]},
+    {"query": "네비올로 품종 레드 와인", "source": "restaurant_wine.txt", "evidence": ["바롤로"]},
+    {"query": "호주 시라 와인", "source": "restaurant_wine.txt", "evidence": ["그랜지"]},
+    {"query": "소비뇽 블랑으로 만든 화이트 와인", "source": "restaurant_wine.txt", "evidence": ["푸이 퓌세", "샤토 디켐"]},
+    # 300720_한일시멘트_2023.pdf
+    {"query": "한일시멘트 안전보건경영시스템 인증", "source": "300720_한일시멘트_2023.pdf", "evidence": ["KOSHA18001"]},
+    {"query": "컴플라이언스 레터 발행 주기", "source": "300720_한일시멘트_2023.pdf", "evidence": ["컴플라이언스 레터"]},
+    {"query": "포틀랜드 시멘트 생산능력 순위", "source": "300720_한일시멘트_2023.pdf", "evidence": ["국내 2위 생산능력"]},
+    {"query": "한일 창업주는 누구인가", "source": "300720_한일시멘트_2023.pdf", "evidence": ["허채경"]},
+    {"query": "탄소 감축 로드맵", "source": "300720_한일시멘트_2023.pdf", "evidence": ["탄소 감축 로드맵"]},
+]
+
+# CI 기준선: 설정별 최소 recall@k (이보다 낮아지면 실패)
+MIN_RECALL = {"bm25": 0.9, "dense": 0.85, "hybrid": 0.9, "hybrid_rerank": 0.9}
+
+
+# ============================================================================
+# 오프라인 임베딩 / 리랭커
+# ============================================================================
+
+class HashingEmbeddings(Embeddings):
+    """
+    한국어 토큰(tokenize_korean)을 해시로 dim차원에 흩뿌리는 임베딩 (외부 모델/네트워크 없음)
+    의미 유사도가 아니라 어휘 겹침을 재는 대체품이다. 결정적이고 빨라서, 파이프라인 회귀 테스트 기준선으로 쓴다.
+    """
+
+    kind = "lexical"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize_korean(text):
+            h = zlib.crc32(token.encode("utf-8"))  # 실행마다 같은 값 (hash()는 프로세스마다 다름)
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """로컬에 받아 둔 sentence-transformers 모델 (예: 캐시된 다국어 임베딩 모델, 네트워크 접근 없음)"""
+
+    kind = "semantic"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = model_name
+        self._model = SentenceTransformer(model_name, device="cpu", local_files_only=True)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._model.encode(texts, normalize_embeddings=True, batch_size=32).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class LexicalOverlapScorer:
+    """CrossEncoder.predict와 같은 인터페이스의 어휘 겹침 점수 (리랭커 모델이 없을 때의 대체품)"""
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        scores = []
+        for query, passage in pairs:
+            query_tokens = set(tokenize_korean(query))
+            passage_tokens = set(tokenize_korean(passage))
+            scores.append(len(query_tokens & passage_tokens) / (np.sqrt(len(passage_tokens)) + 1))
+        return np.asarray(scores)
+
+
+def local_reranker(k: int, top_n: int = 20):
+    """로컬 캐시에 있는 Cross-Encoder를 쓰고, 없으면 어휘 겹침 점수로 대체한다."""
+    try:
+        from sentence_transformers import CrossEncoder
+
+        from rag_3_reranker import DEFAULT_RERANKER_MODEL
+
+        model = CrossEncoder(DEFAULT_RERANKER_MODEL, device="cpu", local_files_only=True)
+        return CrossEncoderReranker(k=k, top_n=top_n, model=model), DEFAULT_RERANKER_MODEL
+    except Exception:
+        return CrossEncoderReranker(model_name="lexical-overlap", k=k, top_n=top_n,
+                                    model=LexicalOverlapScorer()), "lexical-overlap"
+
+
+# ============================================================================
+# 코퍼스 / 정답 판정
+# ============================================================================
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text)
+
+
+def load_benchmark_corpus() -> list[Document]:
+    """data/ 텍스트(문단 단위) + PDF(페이지 단위). 토크나이저 파일 다운로드 없이 만들 수 있는 청크만 쓴다."""
+    documents = load_corpus()
+    for pdf_path in sorted(DATA_DIR.glob("*.pdf")):
+        for page in load_pdf(pdf_path):
+            page.metadata.update(source=pdf_path.name, chunk=page.metadata["page"])
+            documents.append(page)
+    return [Document(id=f"{doc.metadata['source']}#{doc.metadata['chunk']}", page_content=doc.page_content,
+                     metadata=doc.metadata) for doc in documents]
+
+
+def is_relevant(doc: Document, label: dict) -> bool:
+    content = _squash(doc.page_content)
+    return doc.metadata.get("source") == label["source"] and any(_squash(e) in content for e in label["evidence"])
+
+
+def check_labels(corpus: list[Document], labels: list[dict]) -> None:
+    """모든 질문에 정답 청크가 하나 이상 있는지 확인한다. (데이터/분할 변경으로 정답이 사라지는 것 방지)"""
+    missing = [label["query"] for label in labels if not any(is_relevant(doc, label) for doc in corpus)]
+    if missing:
+        raise ValueError(f"정답 청크를 찾을 수 없는 질문이 있습니다: {missing}")
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+# ============================================================================
+# 벤치마크
+# ============================================================================
+
+def evaluate(search, labels: list[dict], k: int) -> dict:
+    """search(query) -> list[Document] 를 질문마다 실행해 recall@k, MRR, 지연 시간을 계산한다."""
+    search(labels[0]["query"])  # 워밍업
+    hits, reciprocal_ranks, latencies = [], [], []
+    for label in labels:
+        start = time.perf_counter()
+        docs = search(label["query"])[:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+        rank = next((i for i, doc in enumerate(docs, start=1) if is_relevant(doc, label)), None)
+        hits.append(rank is not None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    return {
+        f"recall@{k}": float(np.mean(hits)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "latency_ms": {"p50": float(np.percentile(latencies, 50)), "p95": float(np.percentile(latencies, 95))},
+        "misses": [label["query"] for label, hit in zip(labels, hits) if not hit],
+    }
+
+
+def run_benchmark(embeddings=None, k: int = 5, fetch_k: int = 20, labels=LABELED_QUERIES) -> dict:
+    embeddings = embeddings or HashingEmbeddings()
+    corpus = load_benchmark_corpus()
+    check_labels(corpus, labels)
+    report = {"corpus": {"documents": len(corpus), "queries": len(labels)},
+              "embedding_model": getattr(embeddings, "model", type(embeddings).__name__),
+              "embedding_kind": getattr(embeddings, "kind", "semantic"), "k": k, "configs": {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        bm25 = KoreanBM25Index()
+        bm25.add_documents(corpus)
+        bm25_build_s = time.perf_counter() - start
+        bm25.save(Path(tmp) / "bm25")
+        bm25_bytes = _dir_size(Path(tmp) / "bm25")
+
+        start = time.perf_counter()
+        dense = QuantizedVectorStore(embeddings, codec="float32")
+        dense.add_documents(corpus, ids=[doc.id for doc in corpus])
+        dense_build_s = time.perf_counter() - start
+        dense.save(Path(tmp) / "dense")
+        dense_bytes = _dir_size(Path(tmp) / "dense")
+
+    hybrid = HybridRetriever(bm25.as_retriever(k=fetch_k), dense, k=fetch_k, fetch_k=fetch_k)
+    reranker, reranker_model = local_reranker(k=k, top_n=fetch_k)
+    reranked = with_reranker(hybrid.as_runnable(), reranker)
+
+    configs = {
+        "bm25": (lambda q: bm25.search(q, k=k), bm25_build_s, bm25_bytes),
+        "dense": (lambda q: dense.similarity_search(q, k=k), dense_build_s, dense_bytes),
+        "hybrid": (hybrid.invoke, bm25_build_s + dense_build_s, bm25_bytes + dense_bytes),
+        "hybrid_rerank": (reranked.invoke, bm25_build_s + dense_build_s, bm25_bytes + dense_bytes),
+    }
+    for name, (search, build_s, size_bytes) in configs.items():
+        report["configs"][name] = {**evaluate(search, labels, k), "build_s": build_s, "index_bytes": size_bytes}
+    report["configs"]["hybrid_rerank"]["reranker_model"] = reranker_model
+    return report
+
+
+def check_thresholds(report: dict, min_recall=MIN_RECALL) -> list[str]:
+    """기준선 아래로 떨어진 설정 목록 (비어 있으면 통과)"""
+    key = f"recall@{report['k']}"
+    return [
+        f"{name}: {report['configs'][name][key]:.3f} < {threshold}"
+        for name, threshold in min_recall.items()
+        if name in report["configs"] and report["configs"][name][key] < threshold
+    ]
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    # 사용법: python rag_15_retrieval_benchmark.py [결과.json] [로컬 sentence-transformers 모델 이름]
+    output_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent / ".index" / "retrieval_benchmark.json"
+    embeddings = SentenceTransformerEmbeddings(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    report = run_benchmark(embeddings)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"📊 문서 {report['corpus']['documents']}개 / 질문 {report['corpus']['queries']}개, "
+          f"임베딩: {report['embedding_model']} ({report['embedding_kind']})")
+    if report["embedding_kind"] == "lexical":
+        print("  ⚠️ dense/hybrid는 해싱 임베딩(어휘 기반 대체품) 결과입니다. 의미 검색 성능이 아닙니다.")
+    recall_key = f"recall@{report['k']}"
+    for name, row in report["configs"].items():
+        print(f"  {name:<14} {recall_key}={row[recall_key]:.3f}  mrr={row['mrr']:.3f}  "
+              f"p50={row['latency_ms']['p50']:.2f}ms  p95={row['latency_ms']['p95']:.2f}ms  "
+              f"build={row['build_s']:.2f}s  size={row['index_bytes'] / 1e3:.0f}KB")
+    print(f"💾 {output_path}")
+
+    failures = check_thresholds(report)
+    if failures:
+        print(f"❌ recall 기준 미달: {failures}")
+        sys.exit(1)
@@ -0,0 +1,220 @@
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+from langchain_community.retrievers import BM25Retriever
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+from langchain_openai import OpenAIEmbeddings
+
+# ============================================================================
+# Hybrid Retriever: BM25(키워드) + 벡터(의미) 검색을 병렬로 실행하고 RRF로 결합
+# ============================================================================
+# 왜 필요한가?
+# 1. BM25는 고유명사/숫자("1392년", "경복궁")처럼 정확히 일치하는 단어에 강하다.
+# 2. 벡터 검색은 표현이 달라도 의미가 비슷한 문서("왕궁" ↔ "궁궐")를 잘 찾는다.
+# 3. 두 검색기를 동시에(RunnableParallel) 실행하면 지연 시간은 max(BM25, 벡터) 수준이다.
+# 4. 점수 스케일이 서로 달라 직접 더할 수 없으므로, 순위만 사용하는
+#    RRF(Reciprocal Rank Fusion)로 결합한다: score(d) = Σ 1 / (rrf_k + rank(d))
+#
+# 단계별 지연 시간(bm25 / embed / vector_search / fusion / total)을 매 호출마다 기록하고,
+# 단계별 예산(budget_ms)을 넘은 횟수를 리포트한다.
+# ============================================================================
+
+# 단계별 지연 예산 (밀리초). embed는 보통 임베딩 API 왕복이라 가장 크게 잡는다.
+STAGE_BUDGETS_MS = {"bm25": 10.0, "embed": 30.0, "vector_search": 10.0, "fusion": 1.0, "total": 50.0}
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+CORPUS_FILES = ["history.txt", "places.txt", "restaurant_menu.txt", "restaurant_wine.txt"]
+
+
+def load_corpus(data_dir=DATA_DIR, file_names=CORPUS_FILES) -> list[Document]:
+    """data/ 텍스트 파일들을 빈 줄 기준 문단 단위 Document 리스트로 읽는다."""
+    documents = []
+    for file_name in file_names:
+        text = (Path(data_dir) / file_name).read_text(encoding="utf-8")
+        paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+        for i, paragraph in enumerate(paragraphs):
+            documents.append(
+                Document(page_content=paragraph, metadata={"source": file_name, "chunk": i})
+            )
+    return documents
+
+
+def format_docs(docs: list[Document]) -> str:
+    """검색된 문서들을 프롬프트의 {context}에 넣을 문자열로 합친다."""
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def _doc_key(doc: Document):
+    # 같은 문서가 BM25/벡터 양쪽에서 나오면 하나로 합쳐야 하므로 안정적인 키를 만든다.
+    if doc.id:
+        return doc.id
+    return (doc.metadata.get("source"), doc.metadata.get("chunk"), doc.page_content)
+
+
+def reciprocal_rank_fusion(ranked_lists: list[list[Document]], k: int = 4, rrf_k: int = 60) -> list[Document]:
+    """
+    여러 검색 결과(순위 리스트)를 RRF로 합쳐 상위 k개 문서를 반환한다.
+
+    Args:
+        ranked_lists: 검색기별 결과 리스트 (앞쪽일수록 높은 순위)
+        k: 반환할 문서 수
+        rrf_k: 순위 완화 상수 (클수록 하위 순위의 영향이 커진다, 보통 60)
+
+    Returns:
+        metadata["rrf_score"]가 추가된 문서 리스트
+    """
+    scores = {}
+    docs = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+
+    top_keys = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [
+        Document(
+            id=docs[key].id,
+            page_content=docs[key].page_content,
+            metadata={**docs[key].metadata, "rrf_score": scores[key]},
+        )
+        for key in top_keys
+    ]
+
+
+class HybridRetriever:
+    """
+    BM25 검색기와 벡터 저장소를 병렬로 실행하고 RRF로 결합하는 리트리버
+
+    bm25: query(str) -> list[Document] 를 반환하는 Runnable (BM25Retriever 등)
+    vectorstore: LangChain VectorStore (Chroma 등)
+    k: 최종 반환 문서 수
+    fetch_k: 각 검색기에서 가져올 후보 수
+    budget_ms: 단계별 지연 예산 dict (밀리초, 일부 단계만 주면 나머지는 STAGE_BUDGETS_MS),
+               숫자 하나면 전체(total) 예산만 바꾼다. 넘은 횟수가 리포트에 표시된다
+    """
+
+    def __init__(self, bm25, vectorstore, k=4, fetch_k=10, rrf_k=60, budget_ms=None, history_size=1000):
+        self.bm25 = bm25
+        self.vectorstore = vectorstore
+        self.k = k
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+        if budget_ms is not None and not isinstance(budget_ms, dict):
+            budget_ms = {"total": budget_ms}
+        self.budget_ms = {**STAGE_BUDGETS_MS, **(budget_ms or {})}
+        self.timings = deque(maxlen=history_size)  # 최근 호출들의 단계별 지연 시간
+        self._parallel = RunnableParallel(
+            bm25=RunnableLambda(self._bm25_search),
+            vector=RunnableLambda(self._vector_search),
+        )
+
+    def _bm25_search(self, query: str) -> dict:
+        start = time.perf_counter()
+        docs = self.bm25.invoke(query)[: self.fetch_k]
+        return {"docs": docs, "ms": {"bm25": (time.perf_counter() - start) * 1000}}
+
+    def _vector_search(self, query: str) -> dict:
+        embeddings = self.vectorstore.embeddings
+        if embeddings is None:
+            start = time.perf_counter()
+            docs = self.vectorstore.similarity_search(query, k=self.fetch_k)
+            return {"docs": docs, "ms": {"vector_search": (time.perf_counter() - start) * 1000}}
+
+        # 질의 임베딩(보통 네트워크 호출)과 실제 인덱스 검색을 나눠서 측정한다.
+        start = time.perf_counter()
+        query_vector = embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        docs = self.vectorstore.similarity_search_by_vector(query_vector, k=self.fetch_k)
+        done = time.perf_counter()
+        return {
+            "docs": docs,
+            "ms": {"embed": (embedded - start) * 1000, "vector_search": (done - embedded) * 1000},
+        }
+
+    def invoke(self, query: str, config=None) -> list[Document]:
+        start = time.perf_counter()
+        branches = self._parallel.invoke(query, config=config)
+
+        fusion_start = time.perf_counter()
+        docs = reciprocal_rank_fusion(
+            [branches["bm25"]["docs"], branches["vector"]["docs"]], k=self.k, rrf_k=self.rrf_k
+        )
+        end = time.perf_counter()
+
+        timing = {**branches["bm25"]["ms"], **branches["vector"]["ms"]}
+        timing["fusion"] = (end - fusion_start) * 1000
+        timing["total"] = (end - start) * 1000
+        self.timings.append(timing)
+        return docs
+
+    def as_runnable(self):
+        """query(str) -> list[Document] Runnable로 변환한다. (체인에 | 로 연결 가능)"""
+        return RunnableLambda(self.invoke, name="hybrid_retriever")
+
+    def latency_report(self) -> dict:
+        """단계별 p50/p95/max 지연 시간(ms)과 예산, 예산 초과 횟수를 반환한다."""
+        report = {}
+        stages = {stage for timing in self.timings for stage in timing}
+        for stage in sorted(stages):
+            values = sorted(t[stage] for t in self.timings if stage in t)
+            budget = self.budget_ms.get(stage)
+            report[stage] = {
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1],
+                "budget_ms": budget,
+                "over_budget": sum(1 for v in values if v > budget) if budget is not None else 0,
+            }
+        report["budget"] = {
+            "calls": len(self.timings),
+            "over_budget": {stage: report[stage]["over_budget"] for stage in sorted(stages) if report[stage]["over_budget"]},
+        }
+        return report
+
+
+def build_hybrid_retriever(documents: list[Document], embeddings, k=4, fetch_k=10, bm25=None, **kwargs) -> HybridRetriever:
+    """
+    문서 리스트로 BM25 인덱스와 Chroma 벡터 인덱스를 만들어 HybridRetriever를 반환한다.
+    bm25를 넘기지 않으면 rank_bm25 기반 BM25Retriever를 사용한다.
+    (한국어 문서는 rag_2_bm25_index.KoreanBM25Index.as_retriever() 권장)
+    """
+    if bm25 is None:
+        bm25 = BM25Retriever.from_documents(documents, k=fetch_k)
+    # 영구 디렉토리 없이 만든 Chroma는 프로세스 전체가 같은 메모리 클라이언트를 쓴다.
+    # 고정 이름이면 두 번째 호출이 앞 컬렉션에 문서를 또 넣어 같은 결과가 중복되므로, 호출마다 새 이름을 쓴다.
+    vectorstore = Chroma.from_documents(documents, embeddings, collection_name=f"hybrid_corpus_{uuid.uuid4().hex[:8]}")
+    return HybridRetriever(bm25, vectorstore, k=k, fetch_k=fetch_k, **kwargs)
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    corpus = load_corpus()
+    print(f"📚 문서 수: {len(corpus)}개 ({', '.join(CORPUS_FILES)})")
+
+    hybrid = build_hybrid_retriever(corpus, OpenAIEmbeddings(), k=3)
+    retriever = hybrid.as_runnable()
+
+    queries = ["조선은 언제 건국되었나요?", "서울에서 야경을 볼 수 있는 곳", "메를로 품종 와인 추천"]
+    for query in queries:
+        print("\n" + "=" * 60)
+        print(f"🔍 질문: {query}")
+        for doc in retriever.invoke(query):
+            print(f"  - [{doc.metadata['source']}#{doc.metadata['chunk']}] "
+                  f"(rrf={doc.metadata['rrf_score']:.4f}) {doc.page_content[:40]}...")
+        print(f"  ⏱  단계별 지연(ms): { {k: round(v, 1) for k, v in hybrid.timings[-1].items()} }")
+
+    print("\n" + "=" * 60)
+    print("📊 지연 시간 리포트")
+    for stage, stats in hybrid.latency_report().items():
+        print(f"  {stage}: {stats}")
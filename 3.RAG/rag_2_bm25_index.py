@@ -0,0 +1,349 @@
+import json
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from rag_1_hybrid_retriever import load_corpus
+
+# ============================================================================
+# Korean BM25 Index: 한국어 토큰화 + 역색인(Inverted Index) + 디스크 영속화
+# ============================================================================
+# rank_bm25의 한계
+# 1. 공백 기준 토큰화 → "경복궁은" 과 "경복궁" 이 서로 다른 단어로 취급된다. (조사 문제)
+# 2. 문서를 추가/삭제할 때마다 전체 코퍼스로 다시 만들어야 한다.
+# 3. 질의마다 모든 문서를 순회하며 점수를 계산한다.
+#
+# 이 인덱스는
+# 1. 조사를 떼어낸 어간 + 글자 2-gram으로 토큰화한다. ("경복궁은" → 경복궁, 경복, 복궁, 궁은)
+# 2. 단어별 posting(문서 번호, 빈도)을 CSR 배열로 저장하고 np.load(mmap_mode="r")로 읽는다.
+# 3. 추가된 문서는 메모리의 delta 세그먼트에, 삭제된 문서는 tombstone 마스크에 기록한다.
+#    compact()에서 한 번에 합친다. (전체 재구성 없음)
+# 4. 질의 단어의 posting만 꺼내 numpy 벡터 연산으로 BM25 점수를 계산한다.
+# ============================================================================
+
+# 자주 쓰이는 조사/어미 (긴 것부터 매칭)
+JOSA = sorted(
+    ["은", "는", "이", "가", "을", "를", "에", "에서", "에게", "께서", "의", "와", "과", "도", "로", "으로",
+     "만", "까지", "부터", "보다", "처럼", "이나", "나", "이다", "입니다", "이며", "이고", "하고", "랑", "이랑"],
+    key=len,
+    reverse=True,
+)
+TOKEN_PATTERN = re.compile(r"[가-힣]+|[a-z0-9]+")
+
+
+def strip_josa(word: str) -> str:
+    """한글 단어 끝의 조사를 떼어낸다. 남는 어간이 1글자 이하면 원형을 유지한다."""
+    for josa in JOSA:
+        if word.endswith(josa) and len(word) - len(josa) >= 2:
+            return word[: -len(josa)]
+    return word
+
+
+def tokenize_korean(text: str) -> list[str]:
+    """
+    한국어 인식 토큰화
+
+    - 영문/숫자: 소문자 단어 그대로
+    - 한글: 조사를 뗀 어간 + 원형 단어의 글자 2-gram
+      2-gram 덕분에 사전에 없는 복합어나 어미 변화도 부분 일치로 잡힌다.
+    """
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        if not ("가" <= word[0] <= "힣"):
+            tokens.append(word)
+            continue
+        tokens.append(strip_josa(word))
+        tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class KoreanBM25Index:
+    """
+    증분 업데이트와 mmap 로딩을 지원하는 BM25 역색인
+
+    base 세그먼트 (CSR, 디스크에서 mmap 가능)
+        indptr[t] ~ indptr[t+1] 구간이 단어 t의 posting
+        postings_doc: 문서 번호 (int32), postings_tf: 단어 빈도 (float32)
+    delta 세그먼트 (메모리)
+        compact() 이후 추가된 문서의 posting
+    deleted (bool 배열)
+        삭제된 문서의 tombstone
+    path: persist()가 저장할 디렉토리 (load/save한 경로로 갱신된다)
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, tokenizer=tokenize_korean, path=None):
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.vocab = {}  # term -> term_id
+        self.df = np.zeros(0, dtype=np.int32)  # 살아있는 문서 기준 document frequency
+        # base 세그먼트
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.postings_doc = np.zeros(0, dtype=np.int32)
+        self.postings_tf = np.zeros(0, dtype=np.float32)
+        # delta 세그먼트: term_id -> ([doc, ...], [tf, ...])
+        self.delta = {}
+        # 문서 정보 (내부 번호 순서)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.doc_ids = []
+        self.documents = []
+        self.id_to_doc = {}  # 외부 id -> 내부 번호
+        self.next_id = 0  # 기본 id("doc-N") 카운터. 삭제/compact 후에도 줄지 않아 id가 재사용되지 않는다.
+        self.path = Path(path) if path else None
+
+    # ------------------------------------------------------------------
+    # 추가 / 삭제
+    # ------------------------------------------------------------------
+    @property
+    def num_live_docs(self) -> int:
+        return int(len(self.deleted) - self.deleted.sum())
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            term_id = self.vocab[term] = len(self.vocab)
+            if term_id >= len(self.df):
+                # 단어가 늘어날 때마다 복사하지 않도록 용량을 두 배씩 늘린다.
+                self.df = np.concatenate([self.df, np.zeros(max(1024, len(self.df)), dtype=np.int32)])
+        return term_id
+
+    def _new_id(self) -> str:
+        doc_id = f"doc-{self.next_id}"
+        self.next_id += 1
+        return doc_id
+
+    def add_documents(self, documents: list[Document], ids: list[str] | None = None) -> list[str]:
+        """문서를 delta 세그먼트에 추가한다. 이미 있는 id는 삭제 후 다시 추가(upsert)한다."""
+        ids = ids or [doc.id or self._new_id() for doc in documents]
+        self.delete([doc_id for doc_id in ids if doc_id in self.id_to_doc])
+
+        new_len = []
+        for doc_id, doc in zip(ids, documents):
+            doc_num = len(self.doc_ids)
+            counts = Counter(self.tokenizer(doc.page_content))
+            for term, tf in counts.items():
+                term_id = self._term_id(term)
+                docs, tfs = self.delta.setdefault(term_id, ([], []))
+                docs.append(doc_num)
+                tfs.append(tf)
+                self.df[term_id] += 1
+            new_len.append(sum(counts.values()))
+            self.doc_ids.append(doc_id)
+            self.documents.append(Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata))
+            self.id_to_doc[doc_id] = doc_num
+
+        self.doc_len = np.concatenate([self.doc_len, np.asarray(new_len, dtype=np.float32)])
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(new_len), dtype=bool)])
+        return ids
+
+    def delete(self, ids: list[str]) -> None:
+        """문서를 tombstone 처리한다. posting은 compact() 때 실제로 제거된다."""
+        for doc_id in ids:
+            doc_num = self.id_to_doc.pop(doc_id, None)
+            if doc_num is None:
+                continue
+            self.deleted[doc_num] = True
+            for term in set(self.tokenizer(self.documents[doc_num].page_content)):
+                self.df[self.vocab[term]] -= 1
+
+    def compact(self) -> None:
+        """base + delta 세그먼트를 합치고 삭제된 문서를 제거해 새 base 세그먼트를 만든다."""
+        live = np.flatnonzero(~self.deleted)
+        remap = np.full(len(self.deleted), -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+
+        # 모든 posting을 (term, doc, tf) 배열로 펼친 뒤 term 순서로 정렬해 CSR을 다시 만든다.
+        base_terms = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        delta_terms, delta_docs, delta_tfs = [], [], []
+        for term_id, (docs, tfs) in self.delta.items():
+            delta_terms.extend([term_id] * len(docs))
+            delta_docs.extend(docs)
+            delta_tfs.extend(tfs)
+        terms = np.concatenate([base_terms, np.asarray(delta_terms, dtype=np.int64)])
+        docs = remap[np.concatenate([self.postings_doc, np.asarray(delta_docs, dtype=np.int32)])]
+        tfs = np.concatenate([self.postings_tf, np.asarray(delta_tfs, dtype=np.float32)])
+
+        keep = docs >= 0
+        terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+        order = np.lexsort((docs, terms))
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=self.indptr[1:])
+        self.postings_doc = docs[order].astype(np.int32)
+        self.postings_tf = tfs[order].astype(np.float32)
+        self.delta = {}
+
+        self.doc_len = np.asarray(self.doc_len)[live]
+        self.deleted = np.zeros(len(live), dtype=bool)
+        self.doc_ids = [self.doc_ids[i] for i in live]
+        self.documents = [self.documents[i] for i in live]
+        self.id_to_doc = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+
+    # ------------------------------------------------------------------
+    # 검색
+    # ------------------------------------------------------------------
+    def _postings(self, term_id: int):
+        docs, tfs = [], []
+        if term_id < len(self.indptr) - 1:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs.append(self.postings_doc[start:end])
+            tfs.append(self.postings_tf[start:end])
+        if term_id in self.delta:
+            delta_docs, delta_tfs = self.delta[term_id]
+            docs.append(np.asarray(delta_docs, dtype=np.int32))
+            tfs.append(np.asarray(delta_tfs, dtype=np.float32))
+        return np.concatenate(docs), np.concatenate(tfs)
+
+    def get_scores(self, query: str) -> np.ndarray:
+        """모든 문서(내부 번호 순서)에 대한 BM25 점수 배열을 반환한다. 삭제된 문서는 0점."""
+        scores = np.zeros(len(self.deleted), dtype=np.float32)
+        n_live = self.num_live_docs
+        if n_live == 0:
+            return scores
+
+        avgdl = float(self.doc_len[~self.deleted].mean())
+        norm = self.k1 * (1 - self.b + self.b * np.asarray(self.doc_len) / avgdl)
+        for term, query_tf in Counter(self.tokenizer(query)).items():
+            term_id = self.vocab.get(term)
+            if term_id is None or self.df[term_id] <= 0:
+                continue
+            docs, tfs = self._postings(term_id)
+            df = float(self.df[term_id])
+            idf = np.log1p((n_live - df + 0.5) / (df + 0.5))
+            weights = idf * tfs * (self.k1 + 1) / (tfs + norm[docs]) * query_tf
+            scores += np.bincount(docs, weights=weights, minlength=len(scores)).astype(np.float32)
+        scores[self.deleted] = 0.0
+        return scores
+
+    def search(self, query: str, k: int = 4) -> list[Document]:
+        """BM25 상위 k개 문서를 반환한다. (metadata["bm25_score"] 포함)"""
+        scores = self.get_scores(query)
+        k = min(k, int((scores > 0).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            Document(
+                id=self.documents[i].id,
+                page_content=self.documents[i].page_content,
+                metadata={**self.documents[i].metadata, "bm25_score": float(scores[i])},
+            )
+            for i in top
+        ]
+
+    def as_retriever(self, k: int = 4):
+        """query(str) -> list[Document] Runnable (HybridRetriever의 bm25 자리에 그대로 사용 가능)"""
+        return RunnableLambda(lambda query: self.search(query, k=k), name="korean_bm25")
+
+    # ------------------------------------------------------------------
+    # 저장 / 로드
+    # ------------------------------------------------------------------
+    def save(self, path) -> None:
+        """compact 후 CSR 배열은 .npy, 단어 사전/문서는 JSON으로 저장한다."""
+        self.compact()
+        path = self.path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "indptr.npy", self.indptr)
+        np.save(path / "postings_doc.npy", self.postings_doc)
+        np.save(path / "postings_tf.npy", self.postings_tf)
+        np.save(path / "doc_len.npy", self.doc_len)
+        meta = {"k1": self.k1, "b": self.b, "vocab": self.vocab, "next_id": self.next_id}
+        (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        with open(path / "docs.jsonl", "w", encoding="utf-8") as f:
+            for doc in self.documents:
+                f.write(json.dumps({"id": doc.id, "text": doc.page_content, "metadata": doc.metadata},
+                                   ensure_ascii=False) + "\n")
+
+    def persist(self) -> None:
+        """self.path에 저장한다. (rag_5 IncrementalIndexer가 manifest 저장 전에 호출)"""
+        if self.path is None:
+            raise ValueError("저장 경로가 없습니다. KoreanBM25Index(path=...)로 만들거나 save(path)를 먼저 호출하세요.")
+        self.save(self.path)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "KoreanBM25Index":
+        """
+        저장된 인덱스를 읽는다.
+        mmap=True 이면 posting 배열을 메모리 맵으로 열어, 실제로 조회하는 부분만 디스크에서 읽힌다.
+        """
+        path = Path(path)
+        mmap_mode = "r" if mmap else None
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        index = cls(k1=meta["k1"], b=meta["b"], path=path)
+        index.vocab = meta["vocab"]
+        index.indptr = np.load(path / "indptr.npy", mmap_mode=mmap_mode)
+        index.postings_doc = np.load(path / "postings_doc.npy", mmap_mode=mmap_mode)
+        index.postings_tf = np.load(path / "postings_tf.npy", mmap_mode=mmap_mode)
+        index.doc_len = np.load(path / "doc_len.npy")
+        index.df = np.diff(index.indptr).astype(np.int32)
+        with open(path / "docs.jsonl", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                index.documents.append(Document(id=row["id"], page_content=row["text"], metadata=row["metadata"]))
+        index.doc_ids = [doc.id for doc in index.documents]
+        index.id_to_doc = {doc_id: i for i, doc_id in enumerate(index.doc_ids)}
+        index.deleted = np.zeros(len(index.documents), dtype=bool)
+        # next_id가 없는 예전 인덱스: 저장된 "doc-N" 중 가장 큰 N 다음부터
+        used = [int(doc_id[4:]) for doc_id in index.doc_ids if re.fullmatch(r"doc-\d+", doc_id or "")]
+        index.next_id = meta.get("next_id", max(used, default=-1) + 1)
+        return index
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    print("토큰화 비교")
+    print(f"  공백 기준: {'경복궁은 조선 시대의 왕궁으로'.split()}")
+    print(f"  한국어 인식: {tokenize_korean('경복궁은 조선 시대의 왕궁으로')}")
+
+    corpus = load_corpus()
+    ids = [f"{doc.metadata['source']}#{doc.metadata['chunk']}" for doc in corpus]
+
+    index = KoreanBM25Index()
+    start = time.perf_counter()
+    index.add_documents(corpus, ids=ids)
+    index.compact()
+    print(f"\n📚 인덱스 구축: 문서 {index.num_live_docs}개, 단어 {len(index.vocab)}개, "
+          f"{(time.perf_counter() - start) * 1000:.1f}ms")
+
+    for query in ["경복궁", "조선은 언제 건국되었나요?", "트러플 요리"]:
+        start = time.perf_counter()
+        results = index.search(query, k=3)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\n🔍 {query} ({elapsed:.2f}ms)")
+        for doc in results:
+            print(f"  - [{doc.id}] {doc.metadata['bm25_score']:.3f} {doc.page_content[:40]}...")
+
+    # 증분 업데이트: 전체 재구성 없이 추가/삭제
+    index.add_documents(
+        [Document(page_content="창덕궁은 조선의 이궁으로, 후원이 아름다운 유네스코 세계유산입니다.",
+                  metadata={"source": "places.txt"})],
+        ids=["places.txt#new"],
+    )
+    index.delete(["places.txt#0"])
+    print(f"\n➕ 추가/➖ 삭제 후 '조선의 궁궐' 검색: {[doc.id for doc in index.search('조선의 궁궐', k=3)]}")
+
+    # 기본 id는 삭제 + compact 후에도 재사용되지 않는다. (살아있는 문서를 덮어쓰지 않음)
+    check = KoreanBM25Index()
+    check.add_documents([Document(page_content=text) for text in ["경복궁 궁궐", "남산 타워", "한강 공원"]])
+    check.delete(["doc-0"])
+    check.compact()
+    check.add_documents([Document(page_content="창덕궁 후원")])
+    assert check.doc_ids == ["doc-1", "doc-2", "doc-3"], check.doc_ids
+    assert [doc.id for doc in check.search("한강", k=1)] == ["doc-2"]
+    print("✅ 삭제 → compact → 추가 후 기본 id 중복 없음")
+
+    # 저장 후 mmap으로 다시 로드
+    index_dir = Path(__file__).resolve().parent / ".index" / "bm25"
+    index.save(index_dir)
+    loaded = KoreanBM25Index.load(index_dir, mmap=True)
+    print(f"💾 mmap 로드: 문서 {loaded.num_live_docs}개, postings 타입 {type(loaded.postings_doc).__name__}")
+    print(f"   '조선의 궁궐' 검색: {[doc.id for doc in loaded.search('조선의 궁궐', k=3)]}")
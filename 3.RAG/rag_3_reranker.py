@@ -0,0 +1,158 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
+
+from rag_1_hybrid_retriever import load_corpus
+from rag_2_bm25_index import KoreanBM25Index
+
+# ============================================================================
+# Reranker: 검색 결과를 Cross-Encoder로 다시 정렬하기
+# ============================================================================
+# 1차 검색(BM25/벡터)은 질문과 문서를 따로 인코딩하므로 빠르지만 정밀도가 낮다.
+# Cross-Encoder는 (질문, 문서) 쌍을 함께 모델에 넣어 관련도를 직접 계산하므로 정확하지만 느리다.
+#
+# 느린 모델을 필요한 만큼만 쓰기 위한 장치
+# 1. top_n 컷: 1차 검색 상위 top_n개만 점수를 매긴다.
+# 2. 배치 추론: (질문, 문서) 쌍을 batch_size 단위로 묶어 CPU에서 한 번에 계산한다.
+# 3. 점수 캐시: (모델, 질문, 문서) 해시 → 점수. 같은 쌍은 다시 계산하지 않는다.
+# 4. 시간 예산: budget_ms를 넘기면 남은 배치는 건너뛰고 지금까지의 결과로 바로 반환한다.
+#    (점수를 못 받은 문서는 1차 검색 순서 그대로 뒤에 붙는다)
+# ============================================================================
+
+# 한국어를 지원하는 가벼운 다국어 Cross-Encoder (CPU 추론용)
+DEFAULT_RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class CrossEncoderReranker:
+    """
+    배치 추론 + 점수 캐시 + 시간 예산을 지원하는 Cross-Encoder 리랭커
+
+    model_name: sentence-transformers CrossEncoder 모델 이름
+    k: 최종 반환 문서 수
+    top_n: 점수를 매길 후보 수 (1차 검색 상위 top_n개)
+    batch_size: 한 번에 추론할 (질문, 문서) 쌍 수
+    budget_ms: 리랭킹 시간 예산 (None이면 제한 없음)
+    cache_size: 캐시할 최대 점수 수 (LRU)
+    """
+
+    def __init__(self, model_name=DEFAULT_RERANKER_MODEL, k=4, top_n=20, batch_size=16,
+                 budget_ms=None, cache_size=10_000, model=None):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, device="cpu")
+        self.model = model
+        self.model_name = model_name
+        self.k = k
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.last_stats = {}
+
+    def _pair_key(self, query: str, passage: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{query}\0{passage}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key):
+        with self._lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, key, score: float) -> None:
+        with self._lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rerank(self, query: str, documents: list[Document]) -> list[Document]:
+        """
+        문서를 (질문, 문서) 관련도 순으로 다시 정렬해 상위 k개를 반환한다.
+
+        Returns:
+            metadata["rerank_score"]가 추가된 문서 리스트
+            (시간 예산 때문에 점수를 못 받은 문서는 rerank_score=None)
+        """
+        start = time.perf_counter()
+        deadline = None if self.budget_ms is None else start + self.budget_ms / 1000
+        candidates = documents[: self.top_n]
+
+        keys = [self._pair_key(query, doc.page_content) for doc in candidates]
+        scores = [self._cache_get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        cache_hits = len(candidates) - len(missing)
+
+        # 1차 검색 순위가 높은 후보부터 배치로 점수를 매긴다.
+        scored_batches = 0
+        budget_exhausted = False
+        for batch_start in range(0, len(missing), self.batch_size):
+            if deadline is not None and time.perf_counter() >= deadline:
+                budget_exhausted = True
+                break
+            batch = missing[batch_start:batch_start + self.batch_size]
+            pairs = [(query, candidates[i].page_content) for i in batch]
+            batch_scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self._cache_put(keys[i], scores[i])
+            scored_batches += 1
+
+        scored = sorted((i for i, s in enumerate(scores) if s is not None), key=lambda i: scores[i], reverse=True)
+        unscored = [i for i, s in enumerate(scores) if s is None]
+        ranked = [
+            Document(
+                id=candidates[i].id,
+                page_content=candidates[i].page_content,
+                metadata={**candidates[i].metadata, "rerank_score": scores[i]},
+            )
+            for i in (scored + unscored)[: self.k]
+        ]
+
+        self.last_stats = {
+            "candidates": len(candidates),
+            "cache_hits": cache_hits,
+            "batches": scored_batches,
+            "budget_exhausted": budget_exhausted,
+            "ms": (time.perf_counter() - start) * 1000,
+        }
+        return ranked
+
+    def as_runnable(self):
+        """{"question": str, "documents": list[Document]} -> list[Document] Runnable"""
+        return RunnableLambda(lambda x: self.rerank(x["question"], x["documents"]), name="cross_encoder_reranker")
+
+
+def with_reranker(retriever, reranker: CrossEncoderReranker):
+    """
+    query(str) -> list[Document] 리트리버 뒤에 리랭커를 붙인다.
+    질문을 잃어버리지 않도록 RunnableParallel로 질문과 검색 결과를 함께 넘긴다.
+    """
+    return RunnableParallel(question=RunnablePassthrough(), documents=retriever) | reranker.as_runnable()
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    index = KoreanBM25Index()
+    index.add_documents(load_corpus())
+
+    reranker = CrossEncoderReranker(k=3, top_n=10, batch_size=8, budget_ms=500)
+    chain = with_reranker(index.as_retriever(k=10), reranker)
+
+    for query in ["해산물 요리와 어울리는 화이트 와인", "해산물 요리와 어울리는 화이트 와인", "조선을 세운 사람은?"]:
+        print("\n" + "=" * 60)
+        print(f"🔍 질문: {query}")
+        for doc in chain.invoke(query):
+            print(f"  - [{doc.metadata['source']}#{doc.metadata['chunk']}] "
+                  f"rerank={doc.metadata['rerank_score']} {doc.page_content[:40]}...")
+        # 두 번째 같은 질문은 캐시 적중으로 모델을 호출하지 않는다.
+        print(f"  📊 {reranker.last_stats}")
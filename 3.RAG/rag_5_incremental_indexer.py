@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+
+from rag_1_hybrid_retriever import DATA_DIR, CORPUS_FILES
+from rag_2_bm25_index import KoreanBM25Index
+
+# ============================================================================
+# Incremental Indexer: 바뀐 청크만 다시 임베딩/색인하기
+# ============================================================================
+# data/ 파일이 조금만 바뀌어도 전체를 다시 임베딩하면 코퍼스가 클수록 시간과 비용이 커진다.
+#
+# 1. 결정적 청크 분할: 같은 파일 내용이면 항상 같은 청크가 나온다.
+# 2. 청크 해시: 청크 id = hash(파일, 청크 내용). 내용이 바뀌면 id도 바뀐다.
+# 3. manifest(이전 실행의 파일별 청크 id 목록)와 비교해
+#    - 새 id      → 임베딩 후 추가
+#    - 사라진 id  → 인덱스에서 삭제 (stale 청크 정리)
+#    - 같은 id    → 아무것도 하지 않음
+# 4. 파일 해시가 manifest와 같으면 청크 분할조차 건너뛴다.
+#
+# 색인 대상(targets)은 add_documents(docs, ids=...) / delete(ids) 를 가진 객체면 된다.
+# (Chroma 등 VectorStore, rag_2의 KoreanBM25Index)
+# persist()가 있는 대상은 manifest를 저장하기 전에 호출한다. (색인 저장 전에 죽으면 manifest도 옛 상태로 남아
+# 다음 실행에서 같은 변경을 다시 반영한다. 반대 순서면 manifest만 앞서가 변경분이 영영 빠진다)
+# ============================================================================
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def paragraph_chunks(text: str) -> list[str]:
+    """빈 줄 기준 문단 분할 (결정적)"""
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+
+def chunk_file(path, chunker=paragraph_chunks) -> list[Document]:
+    """
+    파일을 청크로 나누고 내용 해시 기반 id를 붙인다.
+    같은 내용의 청크가 여러 번 나오면 id 뒤에 순번을 붙여 구분한다.
+    """
+    path = Path(path)
+    documents = []
+    seen = {}
+    for i, chunk in enumerate(chunker(path.read_text(encoding="utf-8"))):
+        digest = hashlib.sha256(f"{path.name}\0{chunk}".encode("utf-8")).hexdigest()[:16]
+        seen[digest] = seen.get(digest, -1) + 1
+        chunk_id = f"{path.name}:{digest}" + (f"-{seen[digest]}" if seen[digest] else "")
+        documents.append(Document(id=chunk_id, page_content=chunk, metadata={"source": path.name, "chunk": i}))
+    return documents
+
+
+class IncrementalIndexer:
+    """
+    manifest를 기준으로 변경된 청크만 targets에 반영하는 색인 작업
+
+    targets: add_documents(docs, ids=...) / delete(ids) (+ 선택적으로 persist()) 를 가진 색인 객체 리스트
+    manifest_path: 파일별 {"file_hash": ..., "chunk_ids": [...]} 를 저장할 JSON 경로
+    chunker: text -> list[str] 청크 분할 함수
+    """
+
+    def __init__(self, targets, manifest_path, chunker=paragraph_chunks):
+        self.targets = targets
+        self.manifest_path = Path(manifest_path)
+        self.chunker = chunker
+        self.manifest = {}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def _save_manifest(self) -> None:
+        # 임시 파일에 쓰고 교체해, 중간에 죽어도 manifest가 깨지지 않게 한다.
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+
+    def sync(self, paths) -> dict:
+        """
+        파일들을 manifest와 비교해 색인을 갱신하고 리포트를 반환한다.
+        manifest에는 있지만 paths에 없는(삭제된) 파일의 청크도 모두 삭제한다.
+
+        Returns:
+            {"files": {파일명: {"status", "added", "deleted", "unchanged"}}, "totals": {...}, "elapsed_s": ...}
+        """
+        start = time.perf_counter()
+        paths = {Path(p).name: Path(p) for p in paths if Path(p).exists()}
+        report = {}
+        to_add, to_delete = [], []
+
+        for name in sorted(set(self.manifest) | set(paths)):
+            old = self.manifest.get(name, {"file_hash": None, "chunk_ids": []})
+            if name not in paths:
+                to_delete.extend(old["chunk_ids"])
+                report[name] = {"status": "removed", "added": 0, "deleted": len(old["chunk_ids"]), "unchanged": 0}
+                del self.manifest[name]
+                continue
+
+            file_hash = file_sha256(paths[name])
+            if file_hash == old["file_hash"]:
+                report[name] = {"status": "unchanged", "added": 0, "deleted": 0, "unchanged": len(old["chunk_ids"])}
+                continue
+
+            documents = chunk_file(paths[name], self.chunker)
+            new_ids = {doc.id for doc in documents}
+            old_ids = set(old["chunk_ids"])
+            added = [doc for doc in documents if doc.id not in old_ids]
+            stale = [chunk_id for chunk_id in old["chunk_ids"] if chunk_id not in new_ids]
+            to_add.extend(added)
+            to_delete.extend(stale)
+            self.manifest[name] = {"file_hash": file_hash, "chunk_ids": [doc.id for doc in documents]}
+            report[name] = {
+                "status": "new" if old["file_hash"] is None else "changed",
+                "added": len(added),
+                "deleted": len(stale),
+                "unchanged": len(new_ids & old_ids),
+            }
+
+        # 모든 파일의 변경분을 모아 색인 대상마다 한 번씩만 호출한다. (임베딩 배치 효율)
+        for target in self.targets:
+            if to_delete:
+                target.delete(ids=to_delete)
+            if to_add:
+                target.add_documents(to_add, ids=[doc.id for doc in to_add])
+        if to_add or to_delete:
+            for target in self.targets:
+                if hasattr(target, "persist"):
+                    target.persist()
+        self._save_manifest()
+
+        totals = {key: sum(r[key] for r in report.values()) for key in ("added", "deleted", "unchanged")}
+        return {"files": report, "totals": totals, "elapsed_s": time.perf_counter() - start}
+
+    def watch(self, paths, interval: float = 2.0, on_report=print) -> None:
+        """
+        파일의 (수정 시각, 크기)를 주기적으로 확인하다가 바뀌면 sync()를 실행한다.
+        (외부 의존성 없이 polling으로 구현, Ctrl+C로 종료)
+        """
+        paths = [Path(p) for p in paths]
+
+        def snapshot():
+            return {p: (p.stat().st_mtime_ns, p.stat().st_size) if p.exists() else None for p in paths}
+
+        on_report(self.sync(paths))
+        last = snapshot()
+        try:
+            while True:
+                time.sleep(interval)
+                current = snapshot()
+                if current != last:
+                    on_report(self.sync(paths))
+                    last = current
+        except KeyboardInterrupt:
+            pass
+
+
+def print_report(report: dict) -> None:
+    print(f"\n🔄 동기화 완료 ({report['elapsed_s'] * 1000:.1f}ms) - 합계 {report['totals']}")
+    for name, row in report["files"].items():
+        print(f"  - {name:<25} {row['status']:<10} +{row['added']} -{row['deleted']} ={row['unchanged']}")
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    index_dir = Path(__file__).resolve().parent / ".index"
+    bm25_dir = index_dir / "bm25_incremental"
+    bm25_index = KoreanBM25Index.load(bm25_dir) if bm25_dir.exists() else KoreanBM25Index(path=bm25_dir)
+    vectorstore = Chroma(
+        collection_name="data_corpus",
+        embedding_function=OpenAIEmbeddings(),
+        persist_directory=str(index_dir / "chroma"),
+    )
+
+    indexer = IncrementalIndexer([vectorstore, bm25_index], manifest_path=index_dir / "manifest.json")
+    paths = [DATA_DIR / name for name in CORPUS_FILES]
+
+    # 처음에는 모든 청크가 new, 다음 실행부터는 바뀐 청크만 반영된다.
+    # 감시 중 data/*.txt를 수정하면 바뀐 문단만 다시 임베딩된다. (Ctrl+C로 종료)
+    # BM25 인덱스는 sync() 안에서 manifest보다 먼저 persist()로 저장된다.
+    print("👀 data/ 파일 감시 중... (Ctrl+C로 종료)")
+    indexer.watch(paths, interval=2.0, on_report=print_report)
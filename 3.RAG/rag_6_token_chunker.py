@@ -0,0 +1,193 @@
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+import tiktoken
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+from rag_1_hybrid_retriever import DATA_DIR, CORPUS_FILES
+
+# ============================================================================
+# Token Chunker: 토큰 오프셋 기반 청크 분할 (한국어 문서용)
+# ============================================================================
+# 문자 수 기준 분할기(RecursiveCharacterTextSplitter 등)의 문제
+# - 한국어는 같은 글자 수라도 영어보다 토큰 수가 훨씬 많다. (1.LLM/llm_4_token_counting.py 참고)
+#   → chunk_size=500(글자)이 실제로는 수백~천 토큰이 되어 임베딩/프롬프트 한도를 넘기기 쉽다.
+# - 토큰 기준으로 맞추려고 후보 분할마다 토크나이저를 다시 호출하면 CPU 시간이 폭증한다.
+#
+# 이 분할기는
+# 1. 문서마다 딱 한 번 인코딩한다. (여러 문서는 encode_batch로 한꺼번에)
+# 2. 토큰 id → 글자 수 조회표로 각 토큰의 글자 오프셋을 numpy cumsum으로 한 번에 계산한다.
+# 3. 정확히 chunk_size 토큰 단위로 자르되, 끝 부분 snap_window 토큰 안에 문장 경계가 있으면 그곳에서 자른다.
+# 4. 청크 텍스트는 디코딩 없이 원문에서 글자 오프셋으로 잘라낸다.
+# 5. 메타데이터에 token_count를 남겨 이후 단계(컨텍스트 패킹 등)가 다시 토큰화하지 않게 한다.
+# ============================================================================
+
+# 문장 경계: 마침표/물음표/느낌표 뒤 공백, 또는 줄바꿈 (경계 위치 = 다음 문장 시작)
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。…])[\"'”’)\]]*\s+|\n+")
+
+
+def get_encoding(model_name: str):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=None)
+def _token_char_tables(encoding):
+    """
+    토큰 id별 (시작하는 글자 수, UTF-8 연속 바이트로 시작하는지) 조회표
+    인코딩마다 한 번만 만들고, 이후에는 배열 인덱싱으로 오프셋을 계산한다.
+    """
+    char_count = np.zeros(encoding.n_vocab, dtype=np.int64)
+    starts_mid_char = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            token_bytes = encoding.decode_single_token_bytes(token)
+        except KeyError:
+            continue
+        # UTF-8에서 0x80~0xBF는 연속 바이트 → 그 외 바이트 수 = 이 토큰에서 시작하는 글자 수
+        char_count[token] = sum(1 for b in token_bytes if not 0x80 <= b < 0xC0)
+        starts_mid_char[token] = int(bool(token_bytes) and 0x80 <= token_bytes[0] < 0xC0)
+    return char_count, starts_mid_char
+
+
+def token_char_offsets(encoding, tokens) -> np.ndarray:
+    """
+    각 토큰의 시작 글자 오프셋 + 마지막에 전체 글자 수를 붙인 (len(tokens) + 1,) 배열
+    (tiktoken의 decode_with_offsets와 같은 규칙을 벡터 연산으로 계산)
+    """
+    char_count, starts_mid_char = _token_char_tables(encoding)
+    tokens = np.asarray(tokens, dtype=np.int64)
+    ends = np.cumsum(char_count[tokens])
+    starts = np.maximum(0, ends - char_count[tokens] - starts_mid_char[tokens])
+    return np.concatenate([starts, ends[-1:] if len(ends) else [0]])
+
+
+class TokenChunker(TextSplitter):
+    """
+    토큰 수 기준으로 자르고 문장 경계에 맞추는 TextSplitter
+
+    model_name: 토큰 수를 맞출 모델 (tiktoken 인코딩 선택)
+    chunk_size: 청크당 최대 토큰 수
+    chunk_overlap: 이웃 청크와 겹치는 토큰 수
+    snap_window: 청크 끝에서 문장 경계를 찾을 토큰 범위
+    """
+
+    def __init__(self, model_name="gpt-4o-mini", chunk_size=256, chunk_overlap=32, snap_window=64, **kwargs):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self.encoding = get_encoding(model_name)
+        self.snap_window = snap_window
+
+    def _split_tokens(self, text: str, tokens) -> list[dict]:
+        """하나의 문서를 (글자 구간, 토큰 구간) 청크로 나눈다."""
+        n_tokens = len(tokens)
+        if n_tokens == 0:
+            return []
+        offsets = token_char_offsets(self.encoding, tokens)
+        # 문장 경계(글자 위치) → 그 위치에서 시작하는 토큰 번호
+        boundary_chars = [m.end() for m in SENTENCE_BOUNDARY.finditer(text)]
+        boundaries = np.unique(np.searchsorted(offsets[:-1], boundary_chars))
+
+        chunks = []
+        start = 0
+        while start < n_tokens:
+            end = min(start + self._chunk_size, n_tokens)
+            if end < n_tokens:
+                lo = np.searchsorted(boundaries, max(start + 1, end - self.snap_window))
+                hi = np.searchsorted(boundaries, end, side="right")
+                if hi > lo:
+                    end = int(boundaries[hi - 1])
+            chunks.append({
+                "char_start": int(offsets[start]),
+                "char_end": int(offsets[end]),
+                "token_start": start,
+                "token_end": end,
+            })
+            if end >= n_tokens:
+                break
+            # 다음 청크는 overlap만큼 앞에서 시작하되, 그 구간에 문장 시작이 있으면 거기서 시작한다.
+            next_start = max(start + 1, end - self._chunk_overlap)
+            i = np.searchsorted(boundaries, next_start)
+            if i < len(boundaries) and boundaries[i] < end:
+                next_start = int(boundaries[i])
+            start = next_start
+        return chunks
+
+    def split_text(self, text: str) -> list[str]:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return [text[c["char_start"]:c["char_end"]].strip() for c in self._split_tokens(text, tokens)]
+
+    def create_documents(self, texts: list[str], metadatas: list[dict] | None = None) -> list[Document]:
+        """
+        모든 문서를 encode_batch로 한 번에 인코딩한 뒤 청크로 나눈다.
+        metadata에 chunk / token_count / char_start / char_end가 추가된다.
+        """
+        metadatas = metadatas or [{} for _ in texts]
+        all_tokens = self.encoding.encode_batch(texts, disallowed_special=())
+        documents = []
+        for text, tokens, metadata in zip(texts, all_tokens, metadatas):
+            for i, chunk in enumerate(self._split_tokens(text, tokens)):
+                content = text[chunk["char_start"]:chunk["char_end"]].strip()
+                if not content:
+                    continue
+                documents.append(Document(
+                    page_content=content,
+                    metadata={
+                        **metadata,
+                        "chunk": i,
+                        "token_count": chunk["token_end"] - chunk["token_start"],
+                        "char_start": chunk["char_start"],
+                        "char_end": chunk["char_end"],
+                    },
+                ))
+        return documents
+
+
+def load_pdf_text(path) -> str:
+    """pymupdf로 PDF 전체 텍스트를 페이지 순서대로 추출한다."""
+    import pymupdf
+
+    with pymupdf.open(path) as pdf:
+        return "\n".join(page.get_text() for page in pdf)
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    chunker = TokenChunker(chunk_size=128, chunk_overlap=16)
+    encoding = chunker.encoding
+
+    # 1. 문자 기준 분할기와 비교: 같은 "128"이라도 실제 토큰 수는 크게 다르다.
+    history = (DATA_DIR / "history.txt").read_text(encoding="utf-8")
+    char_chunks = RecursiveCharacterTextSplitter(chunk_size=128, chunk_overlap=16).split_text(history)
+    token_chunks = chunker.create_documents([history])
+    print("=" * 60)
+    print("문자 기준 vs 토큰 기준 (chunk_size=128)")
+    print("=" * 60)
+    print(f"  문자 기준: {len(char_chunks)}개, 토큰 수 {[len(encoding.encode(c)) for c in char_chunks][:6]} ...")
+    print(f"  토큰 기준: {len(token_chunks)}개, 토큰 수 {[d.metadata['token_count'] for d in token_chunks][:6]} ...")
+    print(f"  첫 청크 끝부분: ...{token_chunks[0].page_content[-30:]!r}")
+
+    # 2. data/ 텍스트 + PDF 일괄 처리
+    texts = [(DATA_DIR / name).read_text(encoding="utf-8") for name in CORPUS_FILES]
+    metadatas = [{"source": name} for name in CORPUS_FILES]
+    for pdf_path in sorted(DATA_DIR.glob("*.pdf")):
+        texts.append(load_pdf_text(pdf_path))
+        metadatas.append({"source": pdf_path.name})
+
+    start = time.perf_counter()
+    documents = TokenChunker(chunk_size=512, chunk_overlap=64).create_documents(texts, metadatas)
+    elapsed = time.perf_counter() - start
+    total_chars = sum(len(t) for t in texts)
+    print("\n" + "=" * 60)
+    print(f"일괄 분할: 문서 {len(texts)}개 ({total_chars:,}자) → 청크 {len(documents)}개, {elapsed:.2f}초")
+    print("=" * 60)
+    for source in {m["source"] for m in metadatas}:
+        counts = [d.metadata["token_count"] for d in documents if d.metadata["source"] == source]
+        print(f"  {source}: 청크 {len(counts)}개, 최대 {max(counts)} 토큰")
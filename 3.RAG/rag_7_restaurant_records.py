@@ -0,0 +1,253 @@
+import re
+import time
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Literal, Optional, TypedDict
+
+from dotenv import load_dotenv
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import tool
+from langchain_openai import ChatOpenAI
+
+from rag_1_hybrid_retriever import DATA_DIR
+
+# ============================================================================
+# Structured Records: 메뉴/와인 텍스트를 레코드로 파싱하고 LLM 없이 필터링하기
+# ============================================================================
+# restaurant_menu.txt / restaurant_wine.txt 는 정해진 형식의 번호 목록이다.
+#   1. 시그니처 스테이크
+#      • 가격: ₩35,000
+#      • 주요 식재료: 최상급 한우 등심, 로즈메리 감자, ...
+#      • 설명: ...
+#
+# "10만원 이하 메를로 와인" 같은 질문은 조건 검색이므로, 원문 전체를 프롬프트에 넣어
+# LLM에게 고르게 할 필요가 없다. 레코드로 파싱해 두고
+# - 가격: 정렬된 배열 + 이분 탐색(bisect)으로 범위 검색
+# - 식재료/품종: 단어 → 레코드 번호 집합(역색인)
+# 을 만들어 두면 마이크로초 단위로 답할 수 있다. LLM은 Tool로 호출만 한다.
+# ============================================================================
+
+ITEM_PATTERN = re.compile(r"^\s*(\d+)\.\s+(.+?)\s*$")
+FIELD_PATTERN = re.compile(r"^\s*•\s*([^:]+):\s*(.*?)\s*$")
+PRICE_PATTERN = re.compile(r"₩\s*([\d,]+)\s*(?:\((.+?)\))?")
+VINTAGE_PATTERN = re.compile(r"\b(19|20)\d{2}$")
+
+
+class MenuItem(TypedDict):
+    id: int
+    name: str
+    price: int
+    ingredients: list[str]
+    description: str
+
+
+class Wine(TypedDict):
+    id: int
+    name: str
+    vintage: Optional[int]
+    price: int
+    volume: Optional[str]
+    varieties: list[str]
+    description: str
+
+
+def _parse_blocks(text: str) -> list[dict]:
+    """번호 목록을 {"id", "name", 필드명: 값} 딕셔너리 리스트로 나눈다."""
+    blocks = []
+    for line in text.splitlines():
+        item = ITEM_PATTERN.match(line)
+        if item:
+            blocks.append({"id": int(item.group(1)), "name": item.group(2)})
+            continue
+        field = FIELD_PATTERN.match(line)
+        if field and blocks:
+            blocks[-1][field.group(1).strip()] = field.group(2)
+    return blocks
+
+
+def _parse_price(value: str):
+    match = PRICE_PATTERN.search(value or "")
+    if not match:
+        raise ValueError(f"가격 형식을 해석할 수 없습니다: {value!r}")
+    return int(match.group(1).replace(",", "")), match.group(2)
+
+
+def _split_list(value: str) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def parse_menu(text: str) -> list[MenuItem]:
+    items = []
+    for block in _parse_blocks(text):
+        price, _ = _parse_price(block.get("가격"))
+        items.append(MenuItem(
+            id=block["id"],
+            name=block["name"],
+            price=price,
+            ingredients=_split_list(block.get("주요 식재료")),
+            description=block.get("설명", ""),
+        ))
+    return items
+
+
+def parse_wines(text: str) -> list[Wine]:
+    wines = []
+    for block in _parse_blocks(text):
+        price, volume = _parse_price(block.get("가격"))
+        vintage = VINTAGE_PATTERN.search(block["name"])
+        wines.append(Wine(
+            id=block["id"],
+            name=block["name"],
+            vintage=int(vintage.group(0)) if vintage else None,
+            price=price,
+            volume=volume,
+            varieties=_split_list(block.get("주요 품종")),
+            description=block.get("설명", ""),
+        ))
+    return wines
+
+
+def _normalize(term: str) -> str:
+    return re.sub(r"\s+", "", term).lower()
+
+
+class RecordIndex:
+    """
+    레코드 리스트에 대한 메모리 인덱스
+
+    records: 파싱된 레코드 리스트
+    attribute: 역색인을 만들 리스트 필드 (메뉴: "ingredients", 와인: "varieties")
+    """
+
+    def __init__(self, records: list[dict], attribute: str):
+        self.records = records
+        self.attribute = attribute
+        # 가격 범위 검색용: 가격 오름차순으로 정렬된 (가격 배열, 레코드 번호 배열)
+        order = sorted(range(len(records)), key=lambda i: records[i]["price"])
+        self._prices = [records[i]["price"] for i in order]
+        self._price_order = order
+        # 속성 역색인: 전체 값("블랙 트러플")과 단어("트러플") 모두 키로 등록
+        self._inverted = {}
+        for i, record in enumerate(records):
+            for value in record[attribute]:
+                for key in {_normalize(value), *(_normalize(w) for w in value.split())}:
+                    self._inverted.setdefault(key, set()).add(i)
+
+    def filter(self, min_price=None, max_price=None, contains=None, sort_by="price",
+               descending=False, limit=None) -> list[dict]:
+        """
+        가격 범위 + 속성 포함 조건으로 레코드를 찾는다.
+
+        Args:
+            min_price, max_price: 가격 범위 (원, 양 끝 포함)
+            contains: 모두 포함해야 하는 식재료/품종 리스트 (예: ["메를로"])
+            sort_by: 정렬 기준 필드 (price, vintage, name ...)
+            descending: 내림차순 여부
+            limit: 최대 반환 개수
+        """
+        lo = 0 if min_price is None else bisect_left(self._prices, min_price)
+        hi = len(self._prices) if max_price is None else bisect_right(self._prices, max_price)
+        matched = set(self._price_order[lo:hi])
+        for term in contains or []:
+            matched &= self._inverted.get(_normalize(term), set())
+            if not matched:
+                return []
+
+        # 정렬 값이 없는 레코드(빈티지 없는 와인 등)는 정렬 방향과 관계없이 뒤로 보낸다.
+        present = [self.records[i] for i in matched if self.records[i].get(sort_by) is not None]
+        missing = [self.records[i] for i in sorted(matched) if self.records[i].get(sort_by) is None]
+        records = sorted(present, key=lambda r: r[sort_by], reverse=descending) + missing
+        return records[:limit] if limit else records
+
+
+@lru_cache(maxsize=1)
+def get_restaurant_indexes() -> tuple[RecordIndex, RecordIndex]:
+    """data/ 의 메뉴/와인 파일을 파싱해 (메뉴 인덱스, 와인 인덱스)를 만든다. (최초 1회)"""
+    menu = parse_menu((DATA_DIR / "restaurant_menu.txt").read_text(encoding="utf-8"))
+    wines = parse_wines((DATA_DIR / "restaurant_wine.txt").read_text(encoding="utf-8"))
+    return RecordIndex(menu, "ingredients"), RecordIndex(wines, "varieties")
+
+
+def _format_price(record: dict) -> str:
+    volume = f" ({record['volume']})" if record.get("volume") else ""
+    return f"₩{record['price']:,}{volume}"
+
+
+# ============================================================================
+# Tool 정의 (LLM이 조건 검색이 필요할 때 호출)
+# ============================================================================
+
+@tool
+def search_wines(
+    max_price: Optional[int] = None,
+    min_price: Optional[int] = None,
+    variety: Optional[str] = None,
+    sort_by: Literal["price", "vintage"] = "price",
+    descending: bool = False,
+    limit: int = 5,
+) -> str:
+    """
+    Search the restaurant wine list by price range (KRW) and grape variety (Korean name, e.g. 메를로, 샤르도네).
+    Returns matching wines with price and grape varieties.
+    """
+    _, wine_index = get_restaurant_indexes()
+    wines = wine_index.filter(min_price, max_price, [variety] if variety else None, sort_by, descending, limit)
+    if not wines:
+        return "조건에 맞는 와인이 없습니다."
+    return "\n".join(f"- {w['name']}: {_format_price(w)}, 품종: {', '.join(w['varieties'])}" for w in wines)
+
+
+@tool
+def search_menu(
+    max_price: Optional[int] = None,
+    min_price: Optional[int] = None,
+    ingredient: Optional[str] = None,
+    sort_by: Literal["price"] = "price",
+    descending: bool = False,
+    limit: int = 5,
+) -> str:
+    """
+    Search the restaurant menu by price range (KRW) and main ingredient (Korean name, e.g. 트러플, 연어).
+    Returns matching dishes with price and main ingredients.
+    """
+    menu_index, _ = get_restaurant_indexes()
+    items = menu_index.filter(min_price, max_price, [ingredient] if ingredient else None, sort_by, descending, limit)
+    if not items:
+        return "조건에 맞는 메뉴가 없습니다."
+    return "\n".join(f"- {m['name']}: {_format_price(m)}, 식재료: {', '.join(m['ingredients'])}" for m in items)
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    menu_index, wine_index = get_restaurant_indexes()
+    print(f"📋 메뉴 {len(menu_index.records)}개, 🍷 와인 {len(wine_index.records)}개 파싱 완료")
+
+    # 1. 직접 조회 (LLM 없음)
+    n = 10_000
+    start = time.perf_counter()
+    for _ in range(n):
+        result = wine_index.filter(max_price=500_000, contains=["메를로"])
+    elapsed_us = (time.perf_counter() - start) / n * 1e6
+    print(f"\n50만원 이하 + 메를로: {[w['name'] for w in result]} ({elapsed_us:.1f}µs/query)")
+    print(f"메를로 와인 가격순: {[(w['name'], w['price']) for w in wine_index.filter(contains=['메를로'])]}")
+    print(f"트러플 메뉴: {[m['name'] for m in menu_index.filter(contains=['트러플'])]}")
+    print(f"2만원 이하 메뉴 비싼 순: {[m['name'] for m in menu_index.filter(max_price=20_000, descending=True)]}")
+
+    # 2. LLM Tool Calling: 조건 검색은 도구가, 답변 문장은 LLM이
+    load_dotenv()
+    llm = ChatOpenAI(model="gpt-4o-mini")
+    tools_dict = {"search_wines": search_wines, "search_menu": search_menu}
+    llm_with_tools = llm.bind_tools(list(tools_dict.values()))
+
+    question = "30만원 이하 와인 중에 메를로가 들어간 게 있어? 가격 낮은 순으로 알려줘."
+    messages = [("system", "You answer questions about a restaurant's menu and wine list."), ("user", question)]
+    ai_message = llm_with_tools.invoke(messages)
+    tool_messages = [
+        ToolMessage(content=tools_dict[call["name"]].invoke(call["args"]), tool_call_id=call["id"])
+        for call in ai_message.tool_calls
+    ]
+    print(f"\n🔧 도구 호출: {[(c['name'], c['args']) for c in ai_message.tool_calls]}")
+    print(f"💬 {llm.invoke(messages + [ai_message] + tool_messages).content}")
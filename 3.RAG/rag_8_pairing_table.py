@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.tools import tool
+from langchain_openai import OpenAIEmbeddings
+
+from rag_1_hybrid_retriever import DATA_DIR
+from rag_7_restaurant_records import parse_menu, parse_wines
+
+# ============================================================================
+# Pairing Table: 메뉴-와인 페어링을 미리 계산해 두고 O(1)로 조회하기
+# ============================================================================
+# "시그니처 스테이크에 어울리는 와인은?" 을 매번 메뉴판 + 와인 리스트 전체(약 2천 토큰)를
+# 프롬프트에 넣어 LLM에게 묻는 대신, 오프라인 작업으로 페어링 표를 만들어 둔다.
+#
+# 점수 = RULE_WEIGHT * 규칙 점수 + (1 - RULE_WEIGHT) * 임베딩 유사도
+# - 규칙: 식재료 카테고리(붉은 고기, 해산물, 버섯/트러플 ...) × 와인 스타일(풀바디 레드, 산뜻한 화이트 ...)
+# - 임베딩: 메뉴 설명과 와인 설명의 코사인 유사도 (텍스트 해시 기준으로 캐시)
+#
+# 증분 갱신: 레코드(메뉴/와인 한 항목)마다 해시를 저장해 두고
+# - 바뀐/새 메뉴 → 그 행(모든 와인과의 점수)만 다시 계산
+# - 바뀐/새 와인 → 그 열(모든 메뉴와의 점수)만 다시 계산
+# - 사라진 항목 → 행/열 삭제
+# ============================================================================
+
+RULE_WEIGHT = 0.6
+TOP_K = 3
+
+# 식재료 키워드 → 요리 카테고리
+DISH_CATEGORIES = {
+    "red_meat": ["한우", "등심", "소고기", "안심", "스테이크", "양고기"],
+    "poultry": ["닭", "오리", "치킨"],
+    "seafood": ["연어", "새우", "홍합", "오징어", "랍스터", "굴", "해산물", "생선"],
+    "earthy": ["트러플", "버섯", "양송이", "표고"],
+    "creamy": ["생크림", "크림", "치즈", "버터", "마스카포네"],
+    "fresh": ["샐러드", "그린", "채소", "토마토", "오이", "아보카도"],
+    "dessert": ["티라미수", "에스프레소", "카카오", "초콜릿", "비스킷"],
+}
+
+# 품종/설명 키워드 → 와인 스타일
+WINE_STYLES = {
+    "sparkling": ["샴페인", "스파클링", "버블"],
+    "sweet": ["디저트 와인", "세미용", "소테른"],
+    "red_full": ["카베르네 소비뇽", "시라", "네비올로", "쁘띠 베르도", "메를로"],
+    "red_light": ["피노 누아"],
+    "white_rich": ["샤르도네"],
+    "white_crisp": ["소비뇽 블랑"],
+}
+
+# 카테고리 × 스타일 궁합 (0 ~ 1, 표에 없으면 0)
+PAIRING_RULES = {
+    "red_meat": {"red_full": 1.0, "red_light": 0.5},
+    "poultry": {"red_light": 0.9, "white_rich": 0.8, "sparkling": 0.4},
+    "seafood": {"white_crisp": 1.0, "sparkling": 0.9, "white_rich": 0.7},
+    "earthy": {"red_full": 0.8, "red_light": 0.9, "white_rich": 0.5},
+    "creamy": {"white_rich": 1.0, "sparkling": 0.7},
+    "fresh": {"white_crisp": 0.9, "sparkling": 0.6},
+    "dessert": {"sweet": 1.0, "sparkling": 0.4},
+}
+
+
+def _record_hash(record: dict) -> str:
+    return hashlib.sha256(json.dumps(record, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _menu_text(item: dict) -> str:
+    return f"{item['name']}. 식재료: {', '.join(item['ingredients'])}. {item['description']}"
+
+
+def _wine_text(wine: dict) -> str:
+    return f"{wine['name']}. 품종: {', '.join(wine['varieties'])}. {wine['description']}"
+
+
+def dish_categories(item: dict) -> set[str]:
+    text = f"{item['name']} {' '.join(item['ingredients'])}"
+    return {category for category, keywords in DISH_CATEGORIES.items() if any(k in text for k in keywords)}
+
+
+def wine_styles(wine: dict) -> set[str]:
+    # 스파클링/디저트 와인은 품종이 같아도 스타일이 다르므로 설명까지 본다.
+    text = f"{' '.join(wine['varieties'])} {wine['description']}"
+    styles = {style for style, keywords in WINE_STYLES.items() if any(k in text for k in keywords)}
+    if styles & {"sparkling", "sweet"}:
+        styles &= {"sparkling", "sweet"}
+    return styles
+
+
+def rule_score(item: dict, wine: dict) -> float:
+    scores = [PAIRING_RULES.get(c, {}).get(s, 0.0) for c in dish_categories(item) for s in wine_styles(wine)]
+    return max(scores, default=0.0)
+
+
+class EmbeddingCache:
+    """텍스트 해시 → 임베딩 벡터 캐시 (바뀐 텍스트만 임베딩 API를 호출한다)"""
+
+    def __init__(self, embeddings, path):
+        self.embeddings = embeddings
+        self.path = Path(path)
+        self._vectors = {}
+        if self.path.exists():
+            self._vectors = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        keys = [hashlib.sha256(t.encode("utf-8")).hexdigest() for t in texts]
+        missing = list({key: text for key, text in zip(keys, texts) if key not in self._vectors}.items())
+        if missing:
+            vectors = self.embeddings.embed_documents([text for _, text in missing])
+            self._vectors.update({key: vector for (key, _), vector in zip(missing, vectors)})
+        matrix = np.asarray([self._vectors[key] for key in keys], dtype=np.float32)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self._vectors), encoding="utf-8")
+
+
+class PairingTable:
+    """
+    메뉴 × 와인 점수표와 메뉴별 추천 목록을 관리한다.
+
+    table_path: 점수표 JSON 경로
+    embeddings: LangChain Embeddings (임베딩 캐시는 table_path 옆에 저장)
+    """
+
+    def __init__(self, table_path, embeddings):
+        self.table_path = Path(table_path)
+        self.embedding_cache = EmbeddingCache(embeddings, self.table_path.with_name("pairing_embeddings.json"))
+        self.table = {"menu": {}, "wines": {}, "scores": {}, "pairings": {}}
+        if self.table_path.exists():
+            self.table = json.loads(self.table_path.read_text(encoding="utf-8"))
+
+    def _score(self, items: list[dict], wines: list[dict]) -> np.ndarray:
+        if not items or not wines:
+            return np.zeros((len(items), len(wines)), dtype=np.float32)
+        item_vectors = self.embedding_cache.embed([_menu_text(item) for item in items])
+        wine_vectors = self.embedding_cache.embed([_wine_text(wine) for wine in wines])
+        similarity = (item_vectors @ wine_vectors.T + 1) / 2
+        rules = np.asarray([[rule_score(item, wine) for wine in wines] for item in items], dtype=np.float32)
+        return RULE_WEIGHT * rules + (1 - RULE_WEIGHT) * similarity
+
+    def refresh(self, menu: list[dict], wines: list[dict]) -> dict:
+        """
+        바뀐 행/열만 다시 계산해 점수표와 추천 목록을 갱신한다.
+
+        Returns:
+            {"menu_changed", "wines_changed", "menu_removed", "wines_removed", "cells_computed"}
+        """
+        menu_hashes = {item["name"]: _record_hash(item) for item in menu}
+        wine_hashes = {wine["name"]: _record_hash(wine) for wine in wines}
+        changed_menu = [item for item in menu if self.table["menu"].get(item["name"]) != menu_hashes[item["name"]]]
+        changed_wines = [wine for wine in wines if self.table["wines"].get(wine["name"]) != wine_hashes[wine["name"]]]
+        removed_menu = set(self.table["menu"]) - set(menu_hashes)
+        removed_wines = set(self.table["wines"]) - set(wine_hashes)
+
+        scores = self.table["scores"]
+        for name in removed_menu:
+            scores.pop(name, None)
+        for row in scores.values():
+            for name in removed_wines:
+                row.pop(name, None)
+
+        # 바뀐 메뉴 행: 모든 와인과 계산
+        for item, row in zip(changed_menu, self._score(changed_menu, wines)):
+            scores[item["name"]] = {wine["name"]: float(s) for wine, s in zip(wines, row)}
+        # 바뀐 와인 열: 바뀌지 않은 메뉴와만 계산 (바뀐 메뉴 행에는 이미 포함)
+        changed_menu_names = {item["name"] for item in changed_menu}
+        unchanged_menu = [item for item in menu if item["name"] not in changed_menu_names]
+        for item, row in zip(unchanged_menu, self._score(unchanged_menu, changed_wines)):
+            scores.setdefault(item["name"], {}).update({wine["name"]: float(s) for wine, s in zip(changed_wines, row)})
+
+        if changed_menu or changed_wines or removed_menu or removed_wines:
+            wine_by_name = {wine["name"]: wine for wine in wines}
+            self.table["pairings"] = {
+                menu_name: [
+                    {"wine": wine_name, "score": round(score, 4), "price": wine_by_name[wine_name]["price"],
+                     "varieties": wine_by_name[wine_name]["varieties"]}
+                    for wine_name, score in sorted(row.items(), key=lambda kv: kv[1], reverse=True)[:TOP_K]
+                ]
+                for menu_name, row in scores.items()
+            }
+        self.table["menu"] = menu_hashes
+        self.table["wines"] = wine_hashes
+        self._save()
+        return {
+            "menu_changed": len(changed_menu),
+            "wines_changed": len(changed_wines),
+            "menu_removed": len(removed_menu),
+            "wines_removed": len(removed_wines),
+            "cells_computed": len(changed_menu) * len(wines) + len(unchanged_menu) * len(changed_wines),
+        }
+
+    def _save(self) -> None:
+        self.table_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.table_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.table, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.table_path)
+        self.embedding_cache.save()
+
+    def lookup(self, menu_name: str) -> list[dict]:
+        """메뉴 이름으로 추천 와인 목록을 조회한다. (딕셔너리 조회 O(1))"""
+        return self.table["pairings"].get(menu_name.strip(), [])
+
+
+TABLE_PATH = Path(__file__).resolve().parent / ".index" / "pairing_table.json"
+_pairings = None  # recommend_wine이 읽어 둔 추천 목록
+MIN_PARTIAL_MATCH = 2  # 부분 일치로 인정할 최소 글자 수 (공백 제외)
+
+
+def _partial_match(menu_name: str, names) -> str | None:
+    """
+    한쪽 이름이 다른 쪽에 포함되는 메뉴 중 겹치는 비율이 가장 큰 것을 찾는다.
+    겹치는 부분(짧은 쪽)이 MIN_PARTIAL_MATCH글자 미만이면 일치로 보지 않는다. ("" 은 모든 이름에 포함되므로)
+    """
+    query = "".join(menu_name.split())
+    best, best_ratio = None, 0.0
+    for name in names:
+        compact = "".join(name.split())
+        if query in compact or compact in query:
+            overlap = min(len(query), len(compact))
+            ratio = overlap / max(len(query), len(compact))
+            if overlap >= MIN_PARTIAL_MATCH and ratio > best_ratio:
+                best, best_ratio = name, ratio
+    return best
+
+
+def refresh_pairing_table(embeddings=None, table_path=TABLE_PATH) -> dict:
+    """data/ 의 메뉴/와인 파일로 페어링 표를 (증분) 갱신하는 오프라인 작업"""
+    global _pairings
+    _pairings = None  # 같은 프로세스의 recommend_wine이 갱신된 표를 다시 읽도록
+    table = PairingTable(table_path, embeddings or OpenAIEmbeddings())
+    menu = parse_menu((DATA_DIR / "restaurant_menu.txt").read_text(encoding="utf-8"))
+    wines = parse_wines((DATA_DIR / "restaurant_wine.txt").read_text(encoding="utf-8"))
+    return table.refresh(menu, wines)
+
+
+@tool
+def recommend_wine(menu_name: str) -> str:
+    """
+    Look up precomputed wine pairings for a dish on the restaurant menu (Korean dish name, e.g. 시그니처 스테이크).
+    Returns the top matching wines with price and grape varieties.
+    """
+    global _pairings
+    if _pairings is None:
+        # 서빙 시에는 미리 계산된 표만 읽는다. (임베딩/LLM 호출 없음)
+        _pairings = json.loads(TABLE_PATH.read_text(encoding="utf-8"))["pairings"]
+    menu_name = menu_name.strip()
+    if not menu_name:
+        return "메뉴 이름을 입력해 주세요."
+    pairings = _pairings.get(menu_name)
+    if pairings is None:
+        # 정확히 일치하지 않으면 부분 일치하는 메뉴 이름으로 한 번 더 찾는다.
+        name = _partial_match(menu_name, _pairings)
+        pairings = _pairings.get(name) if name else None
+    if not pairings:
+        return f"'{menu_name}' 메뉴의 페어링 정보가 없습니다."
+    return "\n".join(
+        f"- {p['wine']}: ₩{p['price']:,}, 품종: {', '.join(p['varieties'])} (점수 {p['score']:.2f})" for p in pairings
+    )
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    # 1. 오프라인 작업: 처음에는 전체 계산, 이후에는 바뀐 행/열만 계산
+    start = time.perf_counter()
+    print(f"🔄 1차 갱신: {refresh_pairing_table()} ({time.perf_counter() - start:.2f}초)")
+    start = time.perf_counter()
+    print(f"🔄 2차 갱신(변경 없음): {refresh_pairing_table()} ({time.perf_counter() - start:.3f}초)")
+
+    # 2. 서빙: O(1) 조회 도구
+    for dish in ["시그니처 스테이크", "연어 타르타르", "트러플 리조또", "티라미수"]:
+        start = time.perf_counter()
+        answer = recommend_wine.invoke({"menu_name": dish})
+        print(f"\n🍽  {dish} ({(time.perf_counter() - start) * 1e6:.0f}µs)\n{answer}")
@@ -0,0 +1,182 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from rag_1_hybrid_retriever import format_docs, load_corpus
+from rag_2_bm25_index import KoreanBM25Index
+from rag_6_token_chunker import get_encoding
+
+# ============================================================================
+# Context Packing: 토큰 예산 안에서 가장 관련도 높은 청크 조합 고르기
+# ============================================================================
+# 검색 결과를 {context}에 그대로 붙이면
+# - 청크가 많을수록 프롬프트가 길어져 지연 시간과 비용이 늘고,
+# - 비슷한 내용의 청크가 중복으로 들어가 토큰을 낭비한다.
+#
+# 1. 중복 제거: 글자 3-gram 집합의 Jaccard 유사도가 dedup_threshold 이상이면 점수 낮은 쪽을 버린다.
+# 2. 0/1 배낭 문제(knapsack): 토큰 수를 무게, 관련도를 가치로 보고
+#    token_budget 안에서 관련도 합이 최대가 되는 청크 조합을 동적 계획법(numpy)으로 고른다.
+# 3. 정렬: 고른 청크를 (source, 문서 내 위치) 순으로 놓는다.
+#    같은 청크 조합이면 항상 같은 프롬프트가 되어 LLM 제공자의 prompt cache 적중률이 높아진다.
+# 4. 토큰 수는 청크 분할 시 저장한 metadata["token_count"] (rag_6_token_chunker)를 쓰고,
+#    없으면 내용 해시 기준 캐시에서 꺼낸다. → 질의 시점에는 토큰화를 하지 않는다.
+# ============================================================================
+
+SCORE_KEYS = ("rerank_score", "rrf_score", "bm25_score", "score")
+
+
+class ContextPacker:
+    """
+    토큰 예산 기반 컨텍스트 패킹
+
+    token_budget: {context}에 쓸 최대 토큰 수
+    model_name: 토큰 수 계산용 모델 (metadata에 token_count가 없을 때만 사용)
+    dedup_threshold: 중복으로 볼 Jaccard 유사도 기준
+    granularity: 배낭 DP의 토큰 단위 (클수록 빠르고 조금 덜 정확)
+    separator_tokens: 청크 사이 구분자("\n\n")에 드는 토큰 수
+    """
+
+    def __init__(self, token_budget=1000, model_name="gpt-4o-mini", dedup_threshold=0.8,
+                 granularity=4, separator_tokens=1, cache_size=100_000):
+        self.token_budget = token_budget
+        self.model_name = model_name
+        self.dedup_threshold = dedup_threshold
+        self.granularity = granularity
+        self.separator_tokens = separator_tokens
+        self.cache_size = cache_size
+        self._encoding = None
+        self._token_cache = OrderedDict()  # 내용 해시 -> 토큰 수
+        self.last_stats = {}
+
+    # ------------------------------------------------------------------
+    # 토큰 수 (캐시)
+    # ------------------------------------------------------------------
+    def _count_tokens(self, doc: Document) -> int:
+        if "token_count" in doc.metadata:
+            return int(doc.metadata["token_count"])
+        key = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        count = self._token_cache.get(key)
+        if count is None:
+            if self._encoding is None:
+                self._encoding = get_encoding(self.model_name)
+            count = len(self._encoding.encode(doc.page_content, disallowed_special=()))
+            self._token_cache[key] = count
+            if len(self._token_cache) > self.cache_size:
+                self._token_cache.popitem(last=False)
+        return count
+
+    def warm(self, documents: list[Document]) -> None:
+        """색인 시점에 문서들의 토큰 수를 미리 계산해 둔다. (질의 시점 토큰화 방지)"""
+        for doc in documents:
+            self._count_tokens(doc)
+
+    # ------------------------------------------------------------------
+    # 패킹
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _relevance(documents: list[Document]) -> np.ndarray:
+        """metadata의 점수를 (0, 1] 로 정규화한다. 점수가 없으면 검색 순위로 대신한다."""
+        key = next((k for k in SCORE_KEYS if all(doc.metadata.get(k) is not None for doc in documents)), None)
+        if key is None:
+            return 1.0 / (np.arange(len(documents)) + 1)
+        scores = np.asarray([doc.metadata[key] for doc in documents], dtype=np.float64)
+        spread = scores.max() - scores.min()
+        if spread == 0:
+            return np.ones(len(documents))
+        return 0.01 + 0.99 * (scores - scores.min()) / spread
+
+    def _deduplicate(self, documents, relevance):
+        kept, shingles = [], []
+        for i in np.argsort(-relevance, kind="stable"):
+            text = documents[i].page_content
+            grams = {text[j:j + 3] for j in range(max(1, len(text) - 2))}
+            if any(len(grams & other) / len(grams | other) >= self.dedup_threshold for other in shingles):
+                continue
+            kept.append(int(i))
+            shingles.append(grams)
+        return sorted(kept)
+
+    def _knapsack(self, weights: np.ndarray, values: np.ndarray) -> list[int]:
+        """0/1 배낭 문제: 무게 합 <= capacity 에서 가치 합 최대인 항목 번호들"""
+        unit = self.granularity
+        capacity = self.token_budget // unit
+        weights = np.ceil(weights / unit).astype(np.int64)
+        best = np.zeros(capacity + 1)
+        take = np.zeros((len(weights), capacity + 1), dtype=bool)
+        for i, (w, v) in enumerate(zip(weights, values)):
+            if w > capacity:
+                continue
+            candidate = best[:capacity + 1 - w] + v
+            improved = candidate > best[w:]
+            take[i, w:] = improved
+            best[w:] = np.where(improved, candidate, best[w:])
+
+        chosen, c = [], int(best.argmax())
+        for i in range(len(weights) - 1, -1, -1):
+            if take[i, c]:
+                chosen.append(i)
+                c -= weights[i]
+        return chosen[::-1]
+
+    def pack(self, documents: list[Document]) -> list[Document]:
+        """토큰 예산 안에서 관련도 합이 최대인 청크를 골라 안정적인 순서로 반환한다."""
+        start = time.perf_counter()
+        if not documents:
+            self.last_stats = {"candidates": 0, "selected": 0, "duplicates": 0, "tokens": 0}
+            return []
+
+        relevance = self._relevance(documents)
+        kept = self._deduplicate(documents, relevance)
+        tokens = np.asarray([self._count_tokens(documents[i]) + self.separator_tokens for i in kept])
+        chosen = [kept[i] for i in self._knapsack(tokens, relevance[kept])]
+
+        def position(i):
+            metadata = documents[i].metadata
+            return (str(metadata.get("source", "")), metadata.get("char_start", metadata.get("chunk", 0)), i)
+
+        packed = [documents[i] for i in sorted(chosen, key=position)]
+        self.last_stats = {
+            "candidates": len(documents),
+            "selected": len(packed),
+            "duplicates": len(documents) - len(kept),
+            "tokens": int(sum(self._count_tokens(doc) + self.separator_tokens for doc in packed)),
+            "budget": self.token_budget,
+            "ms": (time.perf_counter() - start) * 1000,
+        }
+        return packed
+
+    def as_runnable(self):
+        """list[Document] -> list[Document] Runnable (retriever와 format_docs 사이에 연결)"""
+        return RunnableLambda(self.pack, name="context_packer")
+
+
+# ============================================================================
+# 실행 예제
+# ============================================================================
+
+if __name__ == "__main__":
+    corpus = load_corpus()
+    index = KoreanBM25Index()
+    index.add_documents(corpus)
+
+    packer = ContextPacker(token_budget=400)
+    packer.warm(corpus)  # 색인 시점에 토큰 수 계산
+
+    # 중복 청크가 섞인 검색 결과를 흉내낸다.
+    candidates = index.search("조선 시대 궁궐과 역사", k=10)
+    candidates.insert(1, Document(page_content=candidates[0].page_content + " ",
+                                  metadata={**candidates[0].metadata, "chunk": -1}))
+
+    packed = packer.pack(candidates)
+    print(f"📦 후보 {len(candidates)}개 → {packer.last_stats}")
+    for doc in packed:
+        print(f"  - [{doc.metadata['source']}#{doc.metadata['chunk']}] "
+              f"bm25={doc.metadata['bm25_score']:.2f} {doc.page_content[:40]}...")
+
+    chain = index.as_retriever(k=10) | packer.as_runnable() | RunnableLambda(format_docs)
+    context = chain.invoke("해산물과 어울리는 와인")
+    print(f"\n🧾 컨텍스트 ({packer.last_stats['tokens']} 토큰):\n{context[:200]}...")